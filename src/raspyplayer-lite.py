@@ -79,7 +79,7 @@ def play(file):
     
     """Play a movie"""
     
-    sub = file[0:-3] + "srt"
+    sub = file.rpartition(".")[0] + ".srt"
     if isfile(sub):
         cmd = OMXCMD2.format(OPTIONS, sub, file)
     else:
@@ -37,14 +37,75 @@ DEBUG = False
 # MODULES
 #-------------------------------------------------------------------------#
 
-from os import listdir
-from os import system
+from os import read
+from os import close
+from os import scandir
+from os import stat
+from os import fstat
+from os import killpg
+from os import makedirs
+from os import remove
+from os import rename
+from os import utime
 from os.path import isdir
 from os.path import isfile
 from os.path import basename
 from os.path import expanduser
+from os.path import realpath
+from stat import S_ISDIR
+from sys import argv
+from signal import SIGTERM
+from subprocess import Popen
+from subprocess import PIPE
+from subprocess import TimeoutExpired
+from subprocess import DEVNULL
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import wait
+from socket import socket
+from socket import AF_UNIX
+from socket import SOCK_STREAM
+from json import dumps
+from json import loads
+from hashlib import sha1
+from base64 import b64encode
+from time import time
+from time import sleep
+from shutil import rmtree
+from shutil import which
+from tempfile import mkdtemp
+from re import sub
+from re import findall
+from re import match
+from array import array
+from bisect import bisect_left
+from bisect import insort
+from collections import Counter
+from collections import OrderedDict
+from collections import deque
+from unicodedata import combining
+from unicodedata import normalize
 from sqlite3 import connect
+from sqlite3 import OperationalError
+from queue import Queue
+from queue import LifoQueue
+from threading import Lock
+from threading import Event
+from threading import Thread
+from threading import Condition
+from http.server import ThreadingHTTPServer
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import quote
+from select import select
+from struct import unpack_from
+from ctypes import CDLL
+from ctypes import get_errno
+from ctypes.util import find_library
 from tkinter import Tk
+from tkinter import PhotoImage
+from tkinter import Toplevel
 from tkinter import Frame
 from tkinter import Label
 from tkinter import Entry
@@ -69,21 +130,117 @@ from tkinter.filedialog import askopenfilename
 # FUNCTIONS
 #-------------------------------------------------------------------------#
 
-def scanFiles(db, cfg, path):
+def splitPath(path):
 
-    """Look for movies in path to add in DB."""
+    """Split a path in (directory, file name)."""
 
-    if DEBUG:
-        print("Scan {0}".format(path))
-    for file in listdir(path):
-        filepath = path+"/"+file
-        if len(file) > 4 and file[-4: len(file)] in cfg.EXT and file[0:1] != ".":
-            # File
-            db.addMovie(basename(file), filepath)
-        elif isdir(filepath) and not file in cfg.EXC \
-            and file[0:1] != ".":
-            # Directory
-            scanFiles(db, cfg, filepath)
+    head, sep, tail = path.rpartition("/")
+    return((head, tail))
+
+#-------------------------------------------------------------------------#
+
+def isMovie(cfg, file):
+
+    """Is file a movie according to the configured extensions ?"""
+
+    return(len(file) > 4 and file[-4: len(file)] in cfg.EXT \
+        and file[0:1] != ".")
+
+#-------------------------------------------------------------------------#
+
+def isScanDir(cfg, file):
+
+    """Is file a directory name we have to scan ?"""
+
+    return(not file in cfg.EXC and file[0:1] != ".")
+
+#-------------------------------------------------------------------------#
+
+def isNetworkFs(path, netfs):
+
+    """Is path on a network filesystem ?"""
+
+    path = realpath(path)
+    best = ""
+    fstype = None
+    try:
+        f = open('/proc/mounts', 'r')
+        for l in f.readlines():
+            mnt = l.split()
+            if len(mnt) < 3:
+                continue
+            point = mnt[1].replace("\\040", " ")
+            if (path == point or path.startswith(point.rstrip("/") + "/")) \
+                and len(point) >= len(best):
+                best = point
+                fstype = mnt[2]
+        f.close()
+    except OSError:
+        return(False)
+    return(fstype in netfs)
+
+#-------------------------------------------------------------------------#
+
+def subName(file):
+
+    """Return (stem, lang) of a subtitles file : 'Movie.en.srt' ->
+    ('Movie', 'en'), 'Movie.srt' -> ('Movie', None)."""
+
+    stem = file[0:-4]
+    m = match(r"^(.+)\.([A-Za-z]{2,3}([-_][A-Za-z]{2})?)$", stem)
+    if m:
+        return((m.group(1), m.group(2).lower()))
+    return((stem, None))
+
+#-------------------------------------------------------------------------#
+
+def decodeText(data):
+
+    """Decode subtitles : UTF-8 or UTF-16 (with a BOM), else CP1252 (the
+    Latin-1 of Windows), else Latin-1"""
+
+    if data[0:2] in [b'\xff\xfe', b'\xfe\xff']:
+        return(data.decode('utf-16', 'replace'))
+    for encoding in ['utf-8-sig', 'cp1252']:
+        try:
+            return(data.decode(encoding))
+        except UnicodeDecodeError:
+            pass
+    return(data.decode('latin-1'))
+
+#-------------------------------------------------------------------------#
+
+def isSubsDir(name):
+
+    """Is name a folder of subtitles of the movies of its parent ?"""
+
+    return(name.lower() in ['subs', 'sub', 'subtitles'])
+
+#-------------------------------------------------------------------------#
+
+def normTitle(file, ext=True):
+
+    """Normalize a file name for fuzzy matching : 'Amélie.Poulain.avi'
+    -> 'amelie poulain'."""
+
+    if ext and file[-4:-3] == ".":
+        file = file[0:-4]
+    file = normalize('NFKD', file.casefold())
+    file = "".join([c for c in file if not combining(c)])
+    return(sub(r"[\W_]+", " ", file).strip())
+
+#-------------------------------------------------------------------------#
+
+def trigrams(title):
+
+    """Return the set of trigrams of a normalized title."""
+
+    res = set()
+    for word in title.split():
+        word = "  " + word + " "
+        for i in range(len(word) - 2):
+            res.add(word[i:i+3])
+    return(res)
 
 #-------------------------------------------------------------------------#
 
@@ -109,6 +266,16 @@ def str2lst(s):
 
 #-------------------------------------------------------------------------#
 
+def str2int(s, default):
+
+    """Transform string to int (default if not a number)."""
+
+    if s.lstrip('-').isdigit():
+        return(int(s))
+    return(default)
+
+#-------------------------------------------------------------------------#
+
 def error(msg):
 
     """Logging error messages"""
@@ -131,25 +298,213 @@ def getHelp():
     msg += "<F1> HELP\n"
     msg += "<F2> CONFIG\n"
     msg += "<F3> SEARCH\n"
+    msg += "<F4> STOP PLAYING\n"
     msg += "<F5> SCAN\n"
+    msg += "<Shift-F5> FULL SCAN\n"
+    msg += "<F6> COPY SELECTION IN CACHE\n"
     msg += "<F12> QUIT\n"
     return(msg.format(VERSION))
 
 #-------------------------------------------------------------------------#
 
-def playScreen():
+def newBackend(cfg):
+
+    """Return the player backend selected by the PLAYER setting"""
+
+    name = cfg.PLAYER
+    if name == 'auto':
+        if cfg.useOmx():
+            name = 'omxplayer'
+        elif which('mpv'):
+            name = 'mpv'
+        else:
+            name = 'mplayer'
+    for backend in [OmxBackend, MplayerBackend, MpvBackend, StubBackend]:
+        if backend.name == name:
+            return(backend(cfg))
+
+#-------------------------------------------------------------------------#
+
+def newProbe(name):
+
+    """Return the metadata probe selected by the PROBE setting, None if
+    off"""
+
+    if name == 'auto':
+        if which('ffprobe'):
+            name = 'ffprobe'
+        else:
+            name = 'header'
+    for probe in [FfProbe, HeaderProbe, StubProbe]:
+        if probe.name == name:
+            return(probe())
+    return(None)
+
+#-------------------------------------------------------------------------#
+
+def probeFile(name, path):
+
+    """Return the metadata of path, None if unknown (run in the worker
+    processes of the Prober)"""
+
+    try:
+        return(newProbe(name).probe(path))
+    except Exception as e:
+        # A broken file must not stop the pool
+        if DEBUG:
+            print(path, e)
+        return(None)
+
+#-------------------------------------------------------------------------#
+
+def fingerprint(path):
+
+    """Return the fingerprint of a file : its size and a hash of its
+    first and last 64 KiB, None if not readable"""
+
+    try:
+        with open(path, 'rb') as f:
+            size = fstat(f.fileno()).st_size
+            h = sha1(str(size).encode('ascii'))
+            h.update(f.read(65536))
+            if size > 65536:
+                f.seek(max(65536, size - 65536))
+                h.update(f.read(65536))
+    except OSError as e:
+        if DEBUG:
+            print(path, e)
+        return(None)
+    return("{0}:{1}".format(size, h.hexdigest()))
+
+#-------------------------------------------------------------------------#
+
+def probeText(info):
+
+    """Return a short description of the metadata of a movie"""
+
+    res = []
+    if info['duration']:
+        minutes = int(info['duration'] // 60)
+        res.append("{0}h{1:02d}".format(minutes // 60, minutes % 60))
+    if info['width'] and info['height']:
+        res.append("{0}x{1}".format(info['width'], info['height']))
+    if info['vcodec']:
+        res.append(info['vcodec'])
+    if info['audio']:
+        res.append("/".join([a.rpartition(':')[2] for a in info['audio']]))
+    return(" - ".join(res))
+
+#-------------------------------------------------------------------------#
+
+def benchDb(n):
+
+    """Benchmark the insertion of n movies in DB (--bench-db [n])
+
+    Compares the original code (one INSERT per movie in the two columns
+    files table, default PRAGMAs, one commit at the end) with addMovie
+    and addMovies on the current schema (indexes and full text search
+    triggers), and with the scan writer (rows given to a Scanner as the
+    walkers do, then committed at the end of the scan)."""
+
+    tmp = mkdtemp()
+    dirs = min(n, 500)
+    rows = []
+    for i in range(n):
+        file = "Movie.{0}.2014.720p.mkv".format(i)
+        rows.append((file, "/media/nas/{0}/{1}".format(i % dirs, file),
+            700000000 + i, 1400000000.0 + i))
+    cfg = Config()
+    cfg.defaultValues()
+    cfg.PATH = "/media/nas"
+    res = []
+    # Original code
+    con = connect("{0}/baseline.sqlite3".format(tmp))
+    cur = con.cursor()
+    cur.execute("CREATE TABLE files (file, path)")
+    con.commit()
+    start = time()
+    for file, filepath, size, mtime in rows:
+        cur.execute("INSERT INTO files VALUES (?, ?)", (file, filepath))
+    con.commit()
+    res.append(("original : INSERT per movie, 2 columns, no index",
+        time() - start))
+    con.close()
+    # Current schema, addMovie / addMovies then one commit
+    for name, bulk in [("addMovie per movie + commit", False),
+        ("addMovies (executemany) + commit", True)]:
+        db = Db(cfg)
+        db.db = "{0}/{1}.sqlite3".format(tmp, int(bulk))
+        db.openDb()
+        for i in range(dirs):
+            db.touchDir("/media/nas/{0}".format(i))
+        db.commitDb()
+        start = time()
+        if bulk:
+            db.addMovies(rows)
+        else:
+            for row in rows:
+                db.addMovie(*row)
+        db.commitDb()
+        res.append((name, time() - start))
+        db.closeDb()
+    # Scan writer : what a full scan of these movies writes
+    cfg.DB = "{0}/scan.sqlite3".format(tmp)
+    db = Db(cfg)
+    db.db = cfg.DB
+    db.openDb()
+    db.closeDb()
+    start = time()
+    scanner = Scanner(cfg, True)
+    db.openDb()
+    scanner.load(db)
+    db.beginDb()
+    scanner.apply(db, ('dir', cfg.PATH, None, 1400000000.0))
+    for i in range(dirs):
+        scanner.apply(db, ('dir', "/media/nas/{0}".format(i), cfg.PATH,
+            1400000000.0))
+    for file, filepath, size, mtime in rows:
+        scanner.apply(db, ('file', file, filepath, size, mtime))
+    scanner.finish(db)
+    res.append(("scan writer : one transaction, one commit", time() - start))
+    db.closeDb()
+    rmtree(tmp)
+    print("*** Insertion of {0} movies (journal {1}, synchronous {2}) ***"
+        .format(n, cfg.DBJOURNAL, cfg.DBSYNC))
+    for name, spent in res:
+        print("{0:45} {1:8.3f} s {2:10.0f} rows/s".format(name, spent,
+            n / max(spent, 0.000001)))
+    return(True)
 
-    """Draw a dark bg."""
+#-------------------------------------------------------------------------#
 
-    print("*** Drawing the PlayScreen ***")
-    ps = Tk()
-    ps.title("Playing...")
-    ps.attributes('-fullscreen', True)
-    ps.configure(bg='black')
-    lb = Label(ps, text="Playing...", bg='black', fg='grey')
-    lb.pack()
-    ps.update_idletasks()
-    return(ps)
+def duplicates():
+
+    """Print the movies stored more than once (--duplicates)"""
+
+    cfg = Config()
+    if not cfg.readConf():
+        error("No configuration, start raspyplayer-mc once first")
+        return(False)
+    prober = Prober(cfg)
+    db = Db(cfg)
+    if not db.openDb():
+        return(False)
+    with Db.writeLock:
+        db.delProbes()
+        db.commitDb()
+    prober.printAll(db)
+    groups = db.getDuplicates()
+    db.closeDb()
+    wasted = 0
+    for fp, paths in groups:
+        size = str2int(fp.partition(':')[0], 0)
+        wasted += size * (len(paths) - 1)
+        print("{0:.0f} MiB, {1} copies :".format(size / 1048576, len(paths)))
+        for path in paths:
+            print("    {0}".format(path))
+    print("{0} movies stored more than once, {1:.0f} MiB wasted".format(
+        len(groups), wasted / 1048576))
+    return(True)
 
 #-------------------------------------------------------------------------#
 # CLASSES
@@ -167,15 +522,51 @@ class Config(object):
         # Values loaded from CONF file
         self.clearConf()
         # Values hard coded
-        self.MPLRCMD = 'xterm -e mplayer -fs \"{0}\"'
-        self.OMXCMD1 = 'xterm -e omxplayer {0} -o {1} \"{2}\"'
-        self.OMXCMD2 = 'xterm -e omxplayer {0} -o {1} --subtitles \"{2}\" \"{3}\"'
+        self.SRCDELAY = 150
         # DB*** - SQL requests
         self.DBADD = self.initDbAdd()
+        self.DBADI = self.initDbAdi()
+        self.DBDID = self.initDbDid()
+        self.DBUPD = self.initDbUpd()
+        self.DBDEL = self.initDbDel()
+        self.DBFGT = self.initDbFgt()
+        self.DBTDL = self.initDbTdl()
         self.DBALL = self.initDbAll()
+        self.DBCNT = self.initDbCnt()
+        self.DBIDS = self.initDbIds()
+        self.DBGET = self.initDbGet()
         self.DBSRC = self.initDbSrc()
+        self.DBVERSION = 5
+        self.DBTABLES = self.initDbTables()
+        self.DBSBI = self.initDbSbi()
+        self.DBFPI = self.initDbFpi()
         self.DBDRP = self.initDbDrp()
         self.DBCRT = self.initDbCrt()
+        self.DBV1 = self.initDbV1()
+        self.DBFST = self.initDbFst()
+        self.DBDST = self.initDbDst()
+        self.DBDAD = self.initDbDad()
+        self.DBDAI = self.initDbDai()
+        self.DBDUP = self.initDbDup()
+        self.DBDDL = self.initDbDdl()
+        self.DBMGT = self.initDbMgt()
+        self.DBMST = self.initDbMst()
+        self.DBBGN = self.initDbBgn()
+        self.DBFTS = self.initDbFts()
+        self.DBFTM = self.initDbFtm()
+        self.DBSBD = self.initDbSbd()
+        self.DBSBA = self.initDbSba()
+        self.DBSBG = self.initDbSbg()
+        self.DBSBL = self.initDbSbl()
+        self.DBPRL = self.initDbPrl()
+        self.DBPRS = self.initDbPrs()
+        self.DBPRG = self.initDbPrg()
+        self.DBPRD = self.initDbPrd()
+        self.DBFPL = self.initDbFpl()
+        self.DBFPS = self.initDbFps()
+        self.DBFPG = self.initDbFpg()
+        self.DBFPU = self.initDbFpu()
+        self.DBMOV = self.initDbMov()
 
     #---------------------------------------------------------------------#
 
@@ -199,6 +590,32 @@ class Config(object):
         self.URL5L = 'URL5'
         self.OUT = None
         self.OPT = None
+        self.JOBS = None
+        self.WATCH = None
+        self.POLL = None
+        self.DBJOURNAL = None
+        self.DBSYNC = None
+        self.DBCACHE = None
+        self.DBMMAP = None
+        self.DBBATCH = None
+        self.SEARCH = None
+        self.CACHE = None
+        self.RESCAN = None
+        self.PLAYER = None
+        self.PREFETCH = None
+        self.PREFETCHBW = None
+        self.PROXY = None
+        self.PROXYBUF = None
+        self.CACHEDIR = None
+        self.CACHESIZE = None
+        self.CACHEBW = None
+        self.SUBLANG = []
+        self.SUBDIR = None
+        self.SUBSIZE = None
+        self.PROBE = None
+        self.PROBEJOBS = None
+        self.THUMBDIR = None
+        self.THUMBSIZE = None
 
     #---------------------------------------------------------------------#
 
@@ -216,6 +633,57 @@ class Config(object):
             self.OUT = 'local'
         if not self.OPT:
             self.OPT = '-t on --align center'
+        if not self.JOBS:
+            self.JOBS = 4
+        if not self.WATCH:
+            self.WATCH = 'off'
+        if not self.POLL:
+            self.POLL = 30
+        if not self.DBJOURNAL in ['DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY',
+            'WAL', 'OFF']:
+            self.DBJOURNAL = 'WAL'
+        if not self.DBSYNC in ['OFF', 'NORMAL', 'FULL', 'EXTRA']:
+            self.DBSYNC = 'NORMAL'
+        if self.DBCACHE is None:
+            self.DBCACHE = -4096
+        if self.DBMMAP is None:
+            self.DBMMAP = 33554432
+        if not self.DBBATCH:
+            self.DBBATCH = 1000
+        if not self.SEARCH in ['auto', 'exact', 'fuzzy']:
+            self.SEARCH = 'auto'
+        if self.CACHE is None:
+            self.CACHE = 100000
+        if not self.RESCAN in ['ask', 'auto', 'off']:
+            self.RESCAN = 'ask'
+        if not self.PLAYER in ['auto', 'omxplayer', 'mplayer', 'mpv', 'stub']:
+            self.PLAYER = 'auto'
+        if self.PREFETCH is None:
+            self.PREFETCH = 64
+        if not self.PREFETCHBW:
+            self.PREFETCHBW = 8
+        if not self.PROXY in ['off', 'on', 'auto']:
+            self.PROXY = 'off'
+        if not self.PROXYBUF:
+            self.PROXYBUF = 64
+        if not self.CACHEDIR:
+            self.CACHEDIR = "{0}/.raspyplayer-cache".format(expanduser('~'))
+        if self.CACHESIZE is None:
+            self.CACHESIZE = 0
+        if not self.CACHEBW:
+            self.CACHEBW = 4
+        if not self.SUBDIR:
+            self.SUBDIR = "{0}/.raspyplayer-subs".format(expanduser('~'))
+        if self.SUBSIZE is None:
+            self.SUBSIZE = 16
+        if not self.PROBE in ['auto', 'ffprobe', 'header', 'stub', 'off']:
+            self.PROBE = 'auto'
+        if not self.PROBEJOBS:
+            self.PROBEJOBS = 2
+        if not self.THUMBDIR:
+            self.THUMBDIR = "{0}/.raspyplayer-thumbs".format(expanduser('~'))
+        if self.THUMBSIZE is None:
+            self.THUMBSIZE = 32
 
     #---------------------------------------------------------------------#
 
@@ -292,6 +760,111 @@ class Config(object):
                     self.OPT = l[4:len(l)]
                     if DEBUG:
                         print(l)
+                elif len(l) >= 5 and l[0:5] == "JOBS=":
+                    self.JOBS = str2int(l[5:len(l)], self.JOBS)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 6 and l[0:6] == "WATCH=":
+                    self.WATCH = l[6:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 5 and l[0:5] == "POLL=":
+                    self.POLL = str2int(l[5:len(l)], self.POLL)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 10 and l[0:10] == "DBJOURNAL=":
+                    self.DBJOURNAL = l[10:len(l)].upper()
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "DBSYNC=":
+                    self.DBSYNC = l[7:len(l)].upper()
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 8 and l[0:8] == "DBCACHE=":
+                    self.DBCACHE = str2int(l[8:len(l)], self.DBCACHE)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "DBMMAP=":
+                    self.DBMMAP = str2int(l[7:len(l)], self.DBMMAP)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 8 and l[0:8] == "DBBATCH=":
+                    self.DBBATCH = str2int(l[8:len(l)], self.DBBATCH)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "SEARCH=":
+                    self.SEARCH = l[7:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 6 and l[0:6] == "CACHE=":
+                    self.CACHE = str2int(l[6:len(l)], self.CACHE)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "RESCAN=":
+                    self.RESCAN = l[7:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "PLAYER=":
+                    self.PLAYER = l[7:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 9 and l[0:9] == "PREFETCH=":
+                    self.PREFETCH = str2int(l[9:len(l)], self.PREFETCH)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 11 and l[0:11] == "PREFETCHBW=":
+                    self.PREFETCHBW = str2int(l[11:len(l)], self.PREFETCHBW)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 6 and l[0:6] == "PROXY=":
+                    self.PROXY = l[6:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 9 and l[0:9] == "PROXYBUF=":
+                    self.PROXYBUF = str2int(l[9:len(l)], self.PROXYBUF)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 9 and l[0:9] == "CACHEDIR=":
+                    self.CACHEDIR = l[9:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 10 and l[0:10] == "CACHESIZE=":
+                    self.CACHESIZE = str2int(l[10:len(l)], self.CACHESIZE)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 8 and l[0:8] == "CACHEBW=":
+                    self.CACHEBW = str2int(l[8:len(l)], self.CACHEBW)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 8 and l[0:8] == "SUBLANG=":
+                    self.SUBLANG = [i.strip().lower()
+                        for i in str2lst(l[8:len(l)]) if i.strip()]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 7 and l[0:7] == "SUBDIR=":
+                    self.SUBDIR = l[7:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 8 and l[0:8] == "SUBSIZE=":
+                    self.SUBSIZE = str2int(l[8:len(l)], self.SUBSIZE)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 6 and l[0:6] == "PROBE=":
+                    self.PROBE = l[6:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 10 and l[0:10] == "PROBEJOBS=":
+                    self.PROBEJOBS = str2int(l[10:len(l)], self.PROBEJOBS)
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 9 and l[0:9] == "THUMBDIR=":
+                    self.THUMBDIR = l[9:len(l)]
+                    if DEBUG:
+                        print(l)
+                elif len(l) >= 10 and l[0:10] == "THUMBSIZE=":
+                    self.THUMBSIZE = str2int(l[10:len(l)], self.THUMBSIZE)
+                    if DEBUG:
+                        print(l)
             f.close()
             self.defaultValues()
             return(True)
@@ -340,594 +913,5496 @@ class Config(object):
 
         """Initialisation of the DBADD request"""
 
-        res = "INSERT INTO files VALUES (?, ?)"
+        res = "INSERT INTO files (dir, file, size, mtime) "
+        res += "VALUES ((SELECT id FROM dirs WHERE path = ?), ?, ?, ?)"
         return(res)
 
     #---------------------------------------------------------------------#
 
-    def initDbSrc(self):
+    def initDbAdi(self):
 
-        """Initialisation of the DBSRC request"""
+        """Initialisation of the DBADI request (add with directory id)"""
 
-        res = "SELECT * FROM files WHERE file LIKE ? ORDER BY file"
+        res = []
+        res.append("CREATE TEMP TABLE adds (dir, file, size, mtime)")
+        res.append("INSERT INTO temp.adds VALUES (?, ?, ?, ?)")
+        res.append("INSERT INTO files (dir, file, size, mtime) "
+                   "SELECT dir, file, size, mtime FROM temp.adds")
+        res.append("DROP TABLE IF EXISTS temp.adds")
         return(res)
 
     #---------------------------------------------------------------------#
 
-    def initDbAll(self):
+    def initDbDid(self):
 
-        """Initialisation of the DBALL request"""
+        """Initialisation of the DBDID request"""
 
-        res = "SELECT * FROM files ORDER BY file"
+        res = "SELECT id FROM dirs WHERE path = ?"
         return(res)
 
     #---------------------------------------------------------------------#
 
-    def initDbDrp(self):
+    def initDbUpd(self):
 
-        """Initialisation of the DBDRP request"""
+        """Initialisation of the DBUPD request"""
 
-        res = "DROP TABLE files"
+        res = "UPDATE files SET size = ?, mtime = ? "
+        res += "WHERE dir = (SELECT id FROM dirs WHERE path = ?) AND file = ?"
         return(res)
 
     #---------------------------------------------------------------------#
 
-    def initDbCrt(self):
+    def initDbDel(self):
 
-        """Initialisation of the DBCRT request"""
+        """Initialisation of the DBDEL request"""
 
-        res = "CREATE TABLE files (file, path)"
+        res = "DELETE FROM files "
+        res += "WHERE dir = (SELECT id FROM dirs WHERE path = ?) AND file = ?"
         return(res)
 
     #---------------------------------------------------------------------#
 
-    def display(self, root):
+    def initDbFgt(self):
 
-        """Display the setting window"""
+        """Initialisation of the DBFGT request"""
 
-        if self.createGui():
-            self.player = root
-            self.fill()
-            self.root.mainloop()
-        return(True)
+        res = "SELECT size, mtime FROM files "
+        res += "WHERE dir = (SELECT id FROM dirs WHERE path = ?) AND file = ?"
+        return(res)
 
     #---------------------------------------------------------------------#
 
-    def fill(self):
+    def initDbTdl(self):
 
-        """Fill the setting window"""
+        """Initialisation of the DBTDL requests (delete a tree)"""
 
-        if self.PATH:
-            self.ui_path.insert(0, self.PATH)
-        self.ui_exc.insert(0, lst2str(self.EXC))
-        self.ui_ext.insert(0, lst2str(self.EXT))
-        if self.DB:
-            self.ui_db.insert(0, self.DB)
-        if self.URL1:
-            self.ui_url1.insert(0, self.URL1)
-        if self.URL2:
-            self.ui_url2.insert(0, self.URL2)
-        if self.URL3:
-            self.ui_url3.insert(0, self.URL3)
-        if self.URL4:
-            self.ui_url4.insert(0, self.URL4)
-        if self.URL5:
-            self.ui_url5.insert(0, self.URL5)
-        self.ui_url1l.insert(0, self.URL1L)
-        self.ui_url2l.insert(0, self.URL2L)
-        self.ui_url3l.insert(0, self.URL3L)
-        self.ui_url4l.insert(0, self.URL4L)
-        self.ui_url5l.insert(0, self.URL5L)
-        if self.OUT:
-            self.ui_out.insert(0, self.OUT)
-        if self.OPT:
-            self.ui_opt.insert(0, self.OPT)
+        res = ["DELETE FROM files WHERE dir IN (SELECT id FROM dirs "
+               + "WHERE path = ? OR substr(path, 1, ?) = ?)",
+               "DELETE FROM subs WHERE src IN (SELECT id FROM dirs "
+               + "WHERE path = ? OR substr(path, 1, ?) = ?)",
+               "DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?"]
+        return(res)
 
     #---------------------------------------------------------------------#
 
-    def reload(self):
+    def initDbSrc(self):
 
-        """Load the conf from the setting window"""
+        """Initialisation of the DBSRC request (page of a search)"""
 
-        self.PATH = self.ui_path.get()
-        self.EXC = str2lst(self.ui_exc.get())
-        self.EXT = str2lst(self.ui_ext.get())
-        self.DB = self.ui_db.get()
-        self.URL1 = self.ui_url1.get()
-        self.URL2 = self.ui_url2.get()
-        self.URL3 = self.ui_url3.get()
-        self.URL4 = self.ui_url4.get()
-        self.URL5 = self.ui_url5.get()
-        self.URL1L = self.ui_url1l.get()
-        self.URL2L = self.ui_url2l.get()
-        self.URL3L = self.ui_url3l.get()
-        self.URL4L = self.ui_url4l.get()
-        self.URL5L = self.ui_url5l.get()
-        self.OUT = self.ui_out.get()
-        self.OPT = self.ui_opt.get()
+        # Keyset pagination on (file, id), the first test uses the index
+        res = "SELECT f.id, f.file, d.path || '/' || f.file "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir "
+        res += "WHERE f.file >= ? COLLATE NOCASE "
+        res += "AND (f.file COLLATE NOCASE, f.id) > (?, ?) "
+        res += "AND f.file LIKE ? "
+        res += "ORDER BY f.file COLLATE NOCASE, f.id LIMIT ?"
+        return(res)
 
     #---------------------------------------------------------------------#
 
-    def save(self):
+    def initDbAll(self):
 
-        """Save the config"""
+        """Initialisation of the DBALL request (page of all movies)"""
 
-        print("*** Saving the configuration ***")
-        self.reload()
-        f = open(self.CONF, 'w')
-        line = "DB=" + self.DB
-        f.write(line+"\n")
-        for i in self.EXC:
-            line = "EXC=" + i
-            f.write(line+"\n")
-        for i in self.EXT:
-            line = "EXT=" + i
-            f.write(line+"\n")
-        line = "PATH=" + self.PATH
-        f.write(line+"\n")
-        line = "URL1=" + self.URL1
-        f.write(line+"\n")
-        line = "URL2=" + self.URL2
-        f.write(line+"\n")
-        line = "URL3=" + self.URL3
-        f.write(line+"\n")
-        line = "URL4=" + self.URL4
-        f.write(line+"\n")
-        line = "URL5=" + self.URL5
-        f.write(line+"\n")
-        line = "URL1L=" + self.URL1L
-        f.write(line+"\n")
-        line = "URL2L=" + self.URL2L
-        f.write(line+"\n")
-        line = "URL3L=" + self.URL3L
-        f.write(line+"\n")
-        line = "URL4L=" + self.URL4L
-        f.write(line+"\n")
-        line = "URL5L=" + self.URL5L
-        f.write(line+"\n")
-        line = "OUT=" + self.OUT
-        f.write(line+"\n")
-        line = "OPT=" + self.OPT
-        f.write(line+"\n")
-        f.close()
-        if self.checkConf():
-            self.toggleUrl(self.player)
-            self.readConf()
-            self.root.destroy()
+        res = "SELECT f.id, f.file, d.path || '/' || f.file "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir "
+        res += "WHERE f.file >= ? COLLATE NOCASE "
+        res += "AND (f.file COLLATE NOCASE, f.id) > (?, ?) "
+        res += "ORDER BY f.file COLLATE NOCASE, f.id LIMIT ?"
+        return(res)
 
     #---------------------------------------------------------------------#
 
-    def toggleUrl(self, player):
+    def initDbCnt(self):
 
-        """Enable / disable url buttons"""
+        """Initialisation of the DBCNT request (number of movies)"""
 
-        if self.URL1:
-            s = NORMAL
-            player.URL1L.set(self.URL1L)
-        else:
-            s = DISABLED
-            player.URL1L.set("N/A")
-        player.ui_buturl1.configure(state=s)
-        player.ui_buturl1.update_idletasks()
-        if self.URL2:
-            s = NORMAL
-            player.URL2L.set(self.URL2L)
-        else:
-            s = DISABLED
-            player.URL2L.set("N/A")
-        player.ui_buturl2.configure(state=s)
-        player.ui_buturl2.update_idletasks()
-        if self.URL3:
-            s = NORMAL
-            player.URL3L.set(self.URL3L)
-        else:
-            s = DISABLED
-            player.URL3L.set("N/A")
-        player.ui_buturl3.configure(state=s)
-        player.ui_buturl3.update_idletasks()
+        res = "SELECT count(*) FROM files"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbIds(self):
+
+        """Initialisation of the DBIDS request (titles of all movies)"""
+
+        res = "SELECT id, file FROM files"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbGet(self):
+
+        """Initialisation of the DBGET request"""
+
+        res = "SELECT f.id, f.file, d.path || '/' || f.file "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir WHERE f.id = ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbTables(self):
+
+        """Tables of the current DB schema : [(name, columns)]"""
+
+        res = [("dirs", "(id INTEGER PRIMARY KEY, "
+                + "path TEXT NOT NULL UNIQUE, "
+                + "parent INTEGER REFERENCES dirs (id), "
+                + "mtime REAL)"),
+               ("files", "(id INTEGER PRIMARY KEY, "
+                + "dir INTEGER NOT NULL REFERENCES dirs (id), "
+                + "file TEXT NOT NULL, "
+                + "size INTEGER, "
+                + "mtime REAL, "
+                + "UNIQUE (dir, file))"),
+               ("subs", "(id INTEGER PRIMARY KEY, "
+                + "src INTEGER NOT NULL REFERENCES dirs (id), "
+                + "dir INTEGER NOT NULL REFERENCES dirs (id), "
+                + "stem TEXT NOT NULL, "
+                + "lang TEXT, "
+                + "file TEXT NOT NULL)"),
+               ("probes", "(path TEXT PRIMARY KEY, "
+                + "size INTEGER, "
+                + "mtime REAL, "
+                + "duration REAL, "
+                + "container TEXT, "
+                + "vcodec TEXT, "
+                + "width INTEGER, "
+                + "height INTEGER, "
+                + "audio TEXT)"),
+               ("prints", "(path TEXT PRIMARY KEY, "
+                + "size INTEGER, "
+                + "mtime REAL, "
+                + "fp TEXT)"),
+               ("meta", "(key TEXT PRIMARY KEY, value)")]
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDrp(self):
+
+        """Initialisation of the DBDRP requests"""
+
+        res = ["DROP TABLE IF EXISTS files_fts"]
+        for name, columns in reversed(self.DBTABLES):
+            res.append("DROP TABLE IF EXISTS {0}".format(name))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbCrt(self):
+
+        """Initialisation of the DBCRT requests"""
+
+        res = []
+        for name, columns in self.DBTABLES:
+            res.append("CREATE TABLE IF NOT EXISTS {0} {1}".format(name,
+                columns))
+        res.append("CREATE INDEX IF NOT EXISTS dirs_parent "
+            + "ON dirs (parent)")
+        res.append("CREATE INDEX IF NOT EXISTS files_file "
+            + "ON files (file COLLATE NOCASE)")
+        res.extend(self.DBSBI)
+        res.append(self.DBFPI)
+        res.append("PRAGMA user_version = {0:d}".format(self.DBVERSION))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbV1(self):
+
+        """Initialisation of the DBV1 requests (schema of version 1, where
+        the migrations start from)"""
+
+        tables = dict(self.DBTABLES)
+        res = []
+        for name in ["dirs", "files", "meta"]:
+            res.append("CREATE TABLE IF NOT EXISTS {0} {1}".format(name,
+                tables[name]))
+        res.append("CREATE INDEX IF NOT EXISTS dirs_parent "
+            + "ON dirs (parent)")
+        res.append("CREATE INDEX IF NOT EXISTS files_file "
+            + "ON files (file COLLATE NOCASE)")
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFst(self):
+
+        """Initialisation of the DBFST request (files state)"""
+
+        res = "SELECT d.path || '/' || f.file, f.size, f.mtime "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDst(self):
+
+        """Initialisation of the DBDST request (directories state)"""
+
+        res = "SELECT d.path, p.path, d.mtime "
+        res += "FROM dirs d LEFT JOIN dirs p ON p.id = d.parent"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDad(self):
+
+        """Initialisation of the DBDAD request"""
+
+        res = "INSERT INTO dirs (path, parent, mtime) "
+        res += "VALUES (?, (SELECT id FROM dirs WHERE path = ?), ?)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDai(self):
+
+        """Initialisation of the DBDAI request (add if not known)"""
+
+        res = "INSERT OR IGNORE INTO dirs (path, parent, mtime) "
+        res += "VALUES (?, (SELECT id FROM dirs WHERE path = ?), NULL)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDup(self):
+
+        """Initialisation of the DBDUP request"""
+
+        res = "UPDATE dirs SET parent = (SELECT id FROM dirs WHERE path = ?), "
+        res += "mtime = ? WHERE path = ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbDdl(self):
+
+        """Initialisation of the DBDDL request"""
+
+        res = ["DELETE FROM subs WHERE src IN (SELECT id FROM dirs "
+               + "WHERE path = ?)",
+               "DELETE FROM dirs WHERE path = ?"]
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbMgt(self):
+
+        """Initialisation of the DBMGT request"""
+
+        res = "SELECT value FROM meta WHERE key = ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbMst(self):
+
+        """Initialisation of the DBMST requests"""
+
+        res = ["DELETE FROM meta WHERE key = ?",
+               "INSERT INTO meta VALUES (?, ?)"]
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbBgn(self):
+
+        """Initialisation of the DBBGN request (write transaction of a scan)"""
+
+        # Other connections keep reading the last commit until the end
+        res = "BEGIN IMMEDIATE"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFts(self):
+
+        """Initialisation of the DBFTS requests (full text search index)"""
+
+        # Release names : "The.Movie_2014.720p.mkv" -> the movie 2014 720p
+        res = ["CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5 ("
+               + "file, content='files', content_rowid='id', "
+               + "tokenize=\"unicode61 remove_diacritics 2 "
+               + "separators '._-+[]()'\")",
+               "CREATE TRIGGER IF NOT EXISTS files_fts_ins "
+               + "AFTER INSERT ON files BEGIN "
+               + "INSERT INTO files_fts (rowid, file) "
+               + "VALUES (new.id, new.file); END",
+               "CREATE TRIGGER IF NOT EXISTS files_fts_del "
+               + "AFTER DELETE ON files BEGIN "
+               + "INSERT INTO files_fts (files_fts, rowid, file) "
+               + "VALUES ('delete', old.id, old.file); END",
+               "CREATE TRIGGER IF NOT EXISTS files_fts_upd "
+               + "AFTER UPDATE OF file ON files BEGIN "
+               + "INSERT INTO files_fts (files_fts, rowid, file) "
+               + "VALUES ('delete', old.id, old.file); "
+               + "INSERT INTO files_fts (rowid, file) "
+               + "VALUES (new.id, new.file); END",
+               "INSERT INTO files_fts (files_fts) VALUES ('rebuild')"]
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFtm(self):
+
+        """Initialisation of the DBFTM request (page of a full text
+        search)"""
+
+        # Keyset pagination on (rank, id)
+        res = "SELECT f.id, f.file, d.path || '/' || f.file, rank "
+        res += "FROM files_fts JOIN files f ON f.id = files_fts.rowid "
+        res += "JOIN dirs d ON d.id = f.dir "
+        res += "WHERE files_fts MATCH ? AND (rank, f.id) > (?, ?) "
+        res += "ORDER BY rank, f.id LIMIT ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbSbd(self):
+
+        """Initialisation of the DBSBD request (subtitles of a folder)"""
+
+        res = "DELETE FROM subs WHERE src = (SELECT id FROM dirs "
+        res += "WHERE path = ?)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbSba(self):
+
+        """Initialisation of the DBSBA request (add subtitles)"""
+
+        res = "INSERT INTO subs (src, dir, stem, lang, file) "
+        res += "VALUES ((SELECT id FROM dirs WHERE path = ?), "
+        res += "(SELECT id FROM dirs WHERE path = ?), ?, ?, ?)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbSbg(self):
+
+        """Initialisation of the DBSBG request (subtitles of a movie)"""
+
+        res = "SELECT s.lang, d.path || '/' || s.file FROM subs s "
+        res += "JOIN dirs d ON d.id = s.src "
+        res += "WHERE s.dir = (SELECT id FROM dirs WHERE path = ?) "
+        # A Subs folder next to a single movie : all its subtitles
+        res += "AND (s.stem = ? OR (s.src <> s.dir "
+        res += "AND (SELECT count(*) FROM files f WHERE f.dir = s.dir) = 1)) "
+        res += "ORDER BY d.path, s.file"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbSbl(self):
+
+        """Initialisation of the DBSBL request (all the subtitles)"""
+
+        res = "SELECT d.path || '/' || s.file FROM subs s "
+        res += "JOIN dirs d ON d.id = s.src"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbPrl(self):
+
+        """Initialisation of the DBPRL request (movies to probe)"""
+
+        res = "SELECT d.path || '/' || f.file, f.size, f.mtime "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir "
+        res += "LEFT JOIN probes p ON p.path = d.path || '/' || f.file "
+        res += "AND p.size = f.size AND p.mtime = f.mtime "
+        res += "WHERE p.path IS NULL"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbPrs(self):
+
+        """Initialisation of the DBPRS request (set metadata)"""
+
+        res = "INSERT OR REPLACE INTO probes (path, size, mtime, duration, "
+        res += "container, vcodec, width, height, audio) "
+        res += "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbPrg(self):
+
+        """Initialisation of the DBPRG request (metadata of a movie)"""
+
+        res = "SELECT duration, container, vcodec, width, height, audio "
+        res += "FROM probes WHERE path = ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbPrd(self):
+
+        """Initialisation of the DBPRD requests (metadata and fingerprints
+        of movies gone)"""
+
+        res = []
+        for table in ["probes", "prints"]:
+            sql = "DELETE FROM {0} WHERE path NOT IN ".format(table)
+            sql += "(SELECT d.path || '/' || f.file "
+            sql += "FROM files f JOIN dirs d ON d.id = f.dir)"
+            res.append(sql)
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFpl(self):
+
+        """Initialisation of the DBFPL request (movies to fingerprint)"""
+
+        res = "SELECT d.path || '/' || f.file, f.size, f.mtime "
+        res += "FROM files f JOIN dirs d ON d.id = f.dir "
+        res += "LEFT JOIN prints p ON p.path = d.path || '/' || f.file "
+        res += "AND p.size = f.size AND p.mtime = f.mtime "
+        res += "WHERE p.path IS NULL"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFps(self):
+
+        """Initialisation of the DBFPS request (set a fingerprint)"""
+
+        res = "INSERT OR REPLACE INTO prints (path, size, mtime, fp) "
+        res += "VALUES (?, ?, ?, ?)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFpg(self):
+
+        """Initialisation of the DBFPG request (fingerprint of a movie)"""
+
+        res = "SELECT fp FROM prints WHERE path = ? AND size = ? AND mtime = ?"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFpu(self):
+
+        """Initialisation of the DBFPU request (duplicates)"""
+
+        res = "SELECT fp, path FROM prints WHERE fp IN "
+        res += "(SELECT fp FROM prints GROUP BY fp HAVING count(*) > 1) "
+        res += "ORDER BY fp, path"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbFpi(self):
+
+        """Initialisation of the DBFPI request (fingerprints index)"""
+
+        res = "CREATE INDEX IF NOT EXISTS prints_fp ON prints (fp)"
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbMov(self):
+
+        """Initialisation of the DBMOV requests (move a movie, with its
+        metadata and fingerprint)"""
+
+        res = ["UPDATE files SET dir = (SELECT id FROM dirs WHERE path = ?), "
+               + "file = ?, size = ?, mtime = ? "
+               + "WHERE dir = (SELECT id FROM dirs WHERE path = ?) AND file = ?"]
+        for table in ["probes", "prints"]:
+            sql = "UPDATE OR REPLACE {0} SET path = ?, ".format(table)
+            sql += "size = ?, mtime = ? "
+            sql += "WHERE path = ? AND size = ? AND mtime = ?"
+            res.append(sql)
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def initDbSbi(self):
+
+        """Initialisation of the DBSBI requests (subtitles indexes)"""
+
+        res = ["CREATE INDEX IF NOT EXISTS subs_dir ON subs (dir, stem)",
+               "CREATE INDEX IF NOT EXISTS subs_src ON subs (src)"]
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def scanSignature(self):
+
+        """Return the settings a scan result depends on"""
+
+        return("{0}|{1}|{2}".format(self.PATH, lst2str(self.EXC),
+            lst2str(self.EXT)))
+
+    #---------------------------------------------------------------------#
+
+    def display(self, root):
+
+        """Display the setting window"""
+
+        if self.createGui():
+            self.player = root
+            self.fill()
+            self.root.mainloop()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def fill(self):
+
+        """Fill the setting window"""
+
+        if self.PATH:
+            self.ui_path.insert(0, self.PATH)
+        self.ui_exc.insert(0, lst2str(self.EXC))
+        self.ui_ext.insert(0, lst2str(self.EXT))
+        if self.DB:
+            self.ui_db.insert(0, self.DB)
+        if self.URL1:
+            self.ui_url1.insert(0, self.URL1)
+        if self.URL2:
+            self.ui_url2.insert(0, self.URL2)
+        if self.URL3:
+            self.ui_url3.insert(0, self.URL3)
         if self.URL4:
-            s = NORMAL
-            player.URL4L.set(self.URL4L)
-        else:
-            s = DISABLED
-            player.URL4L.set("N/A")
-        player.ui_buturl4.configure(state=s)
-        player.ui_buturl4.update_idletasks()
+            self.ui_url4.insert(0, self.URL4)
         if self.URL5:
-            s = NORMAL
-            player.URL5L.set(self.URL5L)
-        else:
-            s = DISABLED
-            player.URL5L.set("N/A")
-        player.ui_buturl5.configure(state=s)
-        player.ui_buturl5.update_idletasks()
-        # Refresh
-        player.root.update_idletasks()
+            self.ui_url5.insert(0, self.URL5)
+        self.ui_url1l.insert(0, self.URL1L)
+        self.ui_url2l.insert(0, self.URL2L)
+        self.ui_url3l.insert(0, self.URL3L)
+        self.ui_url4l.insert(0, self.URL4L)
+        self.ui_url5l.insert(0, self.URL5L)
+        if self.OUT:
+            self.ui_out.insert(0, self.OUT)
+        if self.OPT:
+            self.ui_opt.insert(0, self.OPT)
+
+    #---------------------------------------------------------------------#
+
+    def reload(self):
+
+        """Load the conf from the setting window"""
+
+        self.PATH = self.ui_path.get()
+        self.EXC = str2lst(self.ui_exc.get())
+        self.EXT = str2lst(self.ui_ext.get())
+        self.DB = self.ui_db.get()
+        self.URL1 = self.ui_url1.get()
+        self.URL2 = self.ui_url2.get()
+        self.URL3 = self.ui_url3.get()
+        self.URL4 = self.ui_url4.get()
+        self.URL5 = self.ui_url5.get()
+        self.URL1L = self.ui_url1l.get()
+        self.URL2L = self.ui_url2l.get()
+        self.URL3L = self.ui_url3l.get()
+        self.URL4L = self.ui_url4l.get()
+        self.URL5L = self.ui_url5l.get()
+        self.OUT = self.ui_out.get()
+        self.OPT = self.ui_opt.get()
+
+    #---------------------------------------------------------------------#
+
+    def save(self):
+
+        """Save the config"""
+
+        print("*** Saving the configuration ***")
+        self.reload()
+        # Settings not in the window (first launch : no conf file read)
+        self.defaultValues()
+        f = open(self.CONF, 'w')
+        line = "DB=" + self.DB
+        f.write(line+"\n")
+        for i in self.EXC:
+            line = "EXC=" + i
+            f.write(line+"\n")
+        for i in self.EXT:
+            line = "EXT=" + i
+            f.write(line+"\n")
+        line = "PATH=" + self.PATH
+        f.write(line+"\n")
+        line = "URL1=" + self.URL1
+        f.write(line+"\n")
+        line = "URL2=" + self.URL2
+        f.write(line+"\n")
+        line = "URL3=" + self.URL3
+        f.write(line+"\n")
+        line = "URL4=" + self.URL4
+        f.write(line+"\n")
+        line = "URL5=" + self.URL5
+        f.write(line+"\n")
+        line = "URL1L=" + self.URL1L
+        f.write(line+"\n")
+        line = "URL2L=" + self.URL2L
+        f.write(line+"\n")
+        line = "URL3L=" + self.URL3L
+        f.write(line+"\n")
+        line = "URL4L=" + self.URL4L
+        f.write(line+"\n")
+        line = "URL5L=" + self.URL5L
+        f.write(line+"\n")
+        line = "OUT=" + self.OUT
+        f.write(line+"\n")
+        line = "OPT=" + self.OPT
+        f.write(line+"\n")
+        line = "JOBS=" + str(self.JOBS)
+        f.write(line+"\n")
+        line = "WATCH=" + str(self.WATCH)
+        f.write(line+"\n")
+        line = "POLL=" + str(self.POLL)
+        f.write(line+"\n")
+        line = "DBJOURNAL=" + str(self.DBJOURNAL)
+        f.write(line+"\n")
+        line = "DBSYNC=" + str(self.DBSYNC)
+        f.write(line+"\n")
+        line = "DBCACHE=" + str(self.DBCACHE)
+        f.write(line+"\n")
+        line = "DBMMAP=" + str(self.DBMMAP)
+        f.write(line+"\n")
+        line = "DBBATCH=" + str(self.DBBATCH)
+        f.write(line+"\n")
+        line = "SEARCH=" + str(self.SEARCH)
+        f.write(line+"\n")
+        line = "CACHE=" + str(self.CACHE)
+        f.write(line+"\n")
+        line = "RESCAN=" + str(self.RESCAN)
+        f.write(line+"\n")
+        line = "PLAYER=" + str(self.PLAYER)
+        f.write(line+"\n")
+        line = "PREFETCH=" + str(self.PREFETCH)
+        f.write(line+"\n")
+        line = "PREFETCHBW=" + str(self.PREFETCHBW)
+        f.write(line+"\n")
+        line = "PROXY=" + str(self.PROXY)
+        f.write(line+"\n")
+        line = "PROXYBUF=" + str(self.PROXYBUF)
+        f.write(line+"\n")
+        line = "CACHEDIR=" + str(self.CACHEDIR)
+        f.write(line+"\n")
+        line = "CACHESIZE=" + str(self.CACHESIZE)
+        f.write(line+"\n")
+        line = "CACHEBW=" + str(self.CACHEBW)
+        f.write(line+"\n")
+        line = "SUBLANG=" + lst2str(self.SUBLANG)
+        f.write(line+"\n")
+        line = "SUBDIR=" + str(self.SUBDIR)
+        f.write(line+"\n")
+        line = "SUBSIZE=" + str(self.SUBSIZE)
+        f.write(line+"\n")
+        line = "PROBE=" + str(self.PROBE)
+        f.write(line+"\n")
+        line = "PROBEJOBS=" + str(self.PROBEJOBS)
+        f.write(line+"\n")
+        line = "THUMBDIR=" + str(self.THUMBDIR)
+        f.write(line+"\n")
+        line = "THUMBSIZE=" + str(self.THUMBSIZE)
+        f.write(line+"\n")
+        f.close()
+        if self.checkConf():
+            self.toggleUrl(self.player)
+            self.readConf()
+            self.root.destroy()
+
+    #---------------------------------------------------------------------#
+
+    def toggleUrl(self, player):
+
+        """Enable / disable url buttons"""
+
+        if self.URL1:
+            s = NORMAL
+            player.URL1L.set(self.URL1L)
+        else:
+            s = DISABLED
+            player.URL1L.set("N/A")
+        player.ui_buturl1.configure(state=s)
+        player.ui_buturl1.update_idletasks()
+        if self.URL2:
+            s = NORMAL
+            player.URL2L.set(self.URL2L)
+        else:
+            s = DISABLED
+            player.URL2L.set("N/A")
+        player.ui_buturl2.configure(state=s)
+        player.ui_buturl2.update_idletasks()
+        if self.URL3:
+            s = NORMAL
+            player.URL3L.set(self.URL3L)
+        else:
+            s = DISABLED
+            player.URL3L.set("N/A")
+        player.ui_buturl3.configure(state=s)
+        player.ui_buturl3.update_idletasks()
+        if self.URL4:
+            s = NORMAL
+            player.URL4L.set(self.URL4L)
+        else:
+            s = DISABLED
+            player.URL4L.set("N/A")
+        player.ui_buturl4.configure(state=s)
+        player.ui_buturl4.update_idletasks()
+        if self.URL5:
+            s = NORMAL
+            player.URL5L.set(self.URL5L)
+        else:
+            s = DISABLED
+            player.URL5L.set("N/A")
+        player.ui_buturl5.configure(state=s)
+        player.ui_buturl5.update_idletasks()
+        # Refresh
+        player.root.update_idletasks()
+
+    #---------------------------------------------------------------------#
+
+    def createGui(self):
+
+        """Create the GUI for Config"""
+
+        print("*** Creating Configuration GUI ***")
+        self.root = Tk()
+        self.root.title("Configuration")
+        self.root.attributes('-topmost', True)
+        font = Font(self.root, size=12, family='Sans')
+        # Middle Frame (config group)
+        self.ui_midframe = Frame(self.root, borderwidth=2)
+        self.ui_midframe.pack(fill=BOTH, expand=1)
+        # PATH
+        self.ui_pathlbl = Label(self.ui_midframe, text="Movies root folder",
+            justify=LEFT, anchor=W, font=font)
+        self.ui_pathlbl.grid(row=0, column=0, padx=2, pady=2)
+        self.ui_path = Entry(self.ui_midframe, font=font)
+        self.ui_path.grid(row=0, column=1, padx=2, pady=2)
+        # EXC
+        self.ui_exclbl = Label(self.ui_midframe, text="Directories to exclude",
+            justify=LEFT, anchor=W, font=font)
+        self.ui_exclbl.grid(row=1, column=0, padx=2, pady=2)
+        self.ui_exc = Entry(self.ui_midframe, font=font)
+        self.ui_exc.grid(row=1, column=1, padx=2, pady=2)
+        # EXT
+        self.ui_extlbl = Label(self.ui_midframe, text="Movies extensions",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_extlbl.grid(row=2, column=0, padx=2, pady=2)
+        self.ui_ext = Entry(self.ui_midframe, font=font)
+        self.ui_ext.grid(row=2, column=1, padx=2, pady=2)
+        # DB
+        self.ui_dblbl = Label(self.ui_midframe, text="Database name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_dblbl.grid(row=3, column=0, padx=2, pady=2)
+        self.ui_db = Entry(self.ui_midframe, font=font)
+        self.ui_db.grid(row=3, column=1, padx=2, pady=2)
+        # OUT
+        self.ui_outlbl = Label(self.ui_midframe, text="Audio output (local/hdmi)",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_outlbl.grid(row=4, column=0, padx=2, pady=2)
+        self.ui_out = Entry(self.ui_midframe, font=font)
+        self.ui_out.grid(row=4, column=1, padx=2, pady=2)
+        # OPT
+        self.ui_optlbl = Label(self.ui_midframe, text="Omxplayer extra options",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_optlbl.grid(row=5, column=0, padx=2, pady=2)
+        self.ui_opt = Entry(self.ui_midframe, font=font)
+        self.ui_opt.grid(row=5, column=1, padx=2, pady=2)
+        # URL1L
+        self.ui_url1llbl = Label(self.ui_midframe, text="Url 1 name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url1llbl.grid(row=6, column=0, padx=2, pady=2)
+        self.ui_url1l = Entry(self.ui_midframe, font=font)
+        self.ui_url1l.grid(row=6, column=1, padx=2, pady=2)
+        # URL1
+        self.ui_url1lbl = Label(self.ui_midframe, text="Url 1",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url1lbl.grid(row=7, column=0, padx=2, pady=2)
+        self.ui_url1 = Entry(self.ui_midframe, font=font)
+        self.ui_url1.grid(row=7, column=1, padx=2, pady=2)
+        # URL2L
+        self.ui_url2llbl = Label(self.ui_midframe, text="Url 2 name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url2llbl.grid(row=8, column=0, padx=2, pady=2)
+        self.ui_url2l = Entry(self.ui_midframe, font=font)
+        self.ui_url2l.grid(row=8, column=1, padx=2, pady=2)
+        # URL2
+        self.ui_url2lbl = Label(self.ui_midframe, text="Url 2",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url2lbl.grid(row=9, column=0, padx=2, pady=2)
+        self.ui_url2 = Entry(self.ui_midframe, font=font)
+        self.ui_url2.grid(row=9, column=1, padx=2, pady=2)
+        # URL3L
+        self.ui_url3llbl = Label(self.ui_midframe, text="Url 3 name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url3llbl.grid(row=10, column=0, padx=2, pady=2)
+        self.ui_url3l = Entry(self.ui_midframe, font=font)
+        self.ui_url3l.grid(row=10, column=1, padx=2, pady=2)
+        # URL3
+        self.ui_url3lbl = Label(self.ui_midframe, text="Url 3",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url3lbl.grid(row=11, column=0, padx=2, pady=2)
+        self.ui_url3 = Entry(self.ui_midframe, font=font)
+        self.ui_url3.grid(row=11, column=1, padx=2, pady=2)
+        # URL4L
+        self.ui_url4llbl = Label(self.ui_midframe, text="Url 4 name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url4llbl.grid(row=12, column=0, padx=2, pady=2)
+        self.ui_url4l = Entry(self.ui_midframe, font=font)
+        self.ui_url4l.grid(row=12, column=1, padx=2, pady=2)
+        # URL4
+        self.ui_url4lbl = Label(self.ui_midframe, text="Url 4",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url4lbl.grid(row=13, column=0, padx=2, pady=2)
+        self.ui_url4 = Entry(self.ui_midframe, font=font)
+        self.ui_url4.grid(row=13, column=1, padx=2, pady=2)
+        # URL5L
+        self.ui_url5llbl = Label(self.ui_midframe, text="Url 5 name",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url5llbl.grid(row=14, column=0, padx=2, pady=2)
+        self.ui_url5l = Entry(self.ui_midframe, font=font)
+        self.ui_url5l.grid(row=14, column=1, padx=2, pady=2)
+        # URL5
+        self.ui_url5lbl = Label(self.ui_midframe, text="Url 5",
+            justify=LEFT, anchor=W, font=font )
+        self.ui_url5lbl.grid(row=15, column=0, padx=2, pady=2)
+        self.ui_url5 = Entry(self.ui_midframe, font=font)
+        self.ui_url5.grid(row=15, column=1, padx=2, pady=2)
+        # Bottom Frame (buttons group)
+        self.ui_botframe = Frame(self.root, borderwidth=2)
+        self.ui_botframe.pack(anchor='s')
+        # Button Save
+        self.ui_butsave = Button(self.ui_botframe, text="Save",
+            command=self.save, font=font)
+        self.ui_butsave.grid(row=1, column=0, padx=2, pady=2)
+        # Button Close
+        self.ui_butquit = Button(self.ui_botframe, text="Close",
+            command=self.root.destroy, font=font)
+        self.ui_butquit.grid(row=1, column=1, padx=2, pady=2)
+        # Window position
+        self.root.update_idletasks()
+        w = self.root.winfo_reqwidth()
+        h = self.root.winfo_reqheight()
+        ws = self.root.winfo_screenwidth()
+        hs = self.root.winfo_screenheight()
+        x = (ws/2) - (w/2)
+        y = (hs/2) - (h/2)
+        self.root.geometry('%dx%d+%d+%d' % (w, h, x, y))
+        self.root.minsize(w, h)
+        self.root.maxsize(w, h)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Db(object):
+
+    """DataBase class"""
+
+    # Only one connection writes at a time (scan or watcher)
+    writeLock = Lock()
+
+    def __init__(self, cfg):
+
+        """Initialisation of the DB object"""
+
+        self.cfg = cfg
+        self.db = "{0}/{1}".format(expanduser('~'), cfg.DB)
+        self.con = None
+        self.cur = None
+        self.new = False
+        self.fts = False
+
+    #---------------------------------------------------------------------#
+
+    def openDb(self):
+
+        """Open the DB"""
+
+        print("*** DB - Opening the database ***")
+        new = False
+        if not isfile(self.db):
+            new = True
+        self.con = connect(self.db)
+        self.cur = self.con.cursor()
+        self.tuneDb()
+        if new:
+            self.createDb()
+            res = True
+        else:
+            res = self.migrateDb()
+        self.execSql("SELECT count(*) FROM sqlite_master "
+            + "WHERE name = 'files_fts'", False)
+        self.fts = self.cur.fetchone()[0] > 0
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def tuneDb(self):
+
+        """Apply the PRAGMA settings of the configuration"""
+
+        self.execSql("PRAGMA journal_mode = {0}".format(
+            self.cfg.DBJOURNAL), False)
+        self.execSql("PRAGMA synchronous = {0}".format(self.cfg.DBSYNC),
+            False)
+        self.execSql("PRAGMA cache_size = {0:d}".format(self.cfg.DBCACHE),
+            False)
+        self.execSql("PRAGMA mmap_size = {0:d}".format(self.cfg.DBMMAP),
+            False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def createDb(self):
+
+        """Create the DB"""
+
+        print("*** DB - Creating the database ***")
+        for sql in self.cfg.DBCRT:
+            self.execSql(sql, False)
+        self.createFts()
+        self.commitDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def createFts(self):
+
+        """Create the full text search index, False if FTS5 is missing"""
+
+        try:
+            for sql in self.cfg.DBFTS:
+                self.execSql(sql, False)
+        except OperationalError as e:
+            error("No full text search : {0}".format(e))
+            return(False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb(self):
+
+        """Migrate a DB created by an older version"""
+
+        self.execSql("PRAGMA user_version", False)
+        version = self.cur.fetchone()[0]
+        if version > self.cfg.DBVERSION:
+            error("Database version {0} is too recent".format(version))
+            return(False)
+        migrations = [self.migrateDb0, self.migrateDb1, self.migrateDb2,
+            self.migrateDb3, self.migrateDb4]
+        while version < self.cfg.DBVERSION:
+            print("*** DB - Migrating the database to version {0} ***".format(
+                version + 1))
+            migrations[version]()
+            version += 1
+            self.execSql("PRAGMA user_version = {0:d}".format(version), False)
+            self.commitDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb0(self):
+
+        """Migration 0 -> 1 : from files (file, path[, size, mtime])"""
+
+        self.execSql("PRAGMA table_info(files)", False)
+        cols = [row[1] for row in self.cur.fetchall()]
+        rows = []
+        if cols:
+            if "size" in cols:
+                self.execSql("SELECT path, size, mtime FROM files", False)
+            else:
+                self.execSql("SELECT path, NULL, NULL FROM files", False)
+            rows = self.cur.fetchall()
+        self.execSql("BEGIN", False)
+        self.dropDb()
+        # The next migrations add the rest, the loop sets the version
+        for sql in self.cfg.DBV1:
+            self.execSql(sql, False)
+        # Directory mtimes are unknown : the next scan lists them again
+        dirs = set([splitPath(path)[0] for path, size, mtime in rows])
+        self.cur.executemany(self.cfg.DBDAD, [(d, None, None) for d in dirs])
+        # Old tables had no uniqueness
+        sql = self.cfg.DBADD.replace("INSERT", "INSERT OR IGNORE", 1)
+        self.cur.executemany(sql, [splitPath(path) + (size, mtime)
+            for path, size, mtime in rows])
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb1(self):
+
+        """Migration 1 -> 2 : full text search index"""
+
+        self.createFts()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb2(self):
+
+        """Migration 2 -> 3 : subtitles index"""
+
+        self.execSql("CREATE TABLE IF NOT EXISTS subs {0}".format(
+            dict(self.cfg.DBTABLES)["subs"]), False)
+        for sql in self.cfg.DBSBI:
+            self.execSql(sql, False)
+        # Folders have to be listed again to find the subtitles
+        self.setMeta('scan', None)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb3(self):
+
+        """Migration 3 -> 4 : metadata of the movies"""
+
+        self.execSql("CREATE TABLE IF NOT EXISTS probes {0}".format(
+            dict(self.cfg.DBTABLES)["probes"]), False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def migrateDb4(self):
+
+        """Migration 4 -> 5 : fingerprints of the movies"""
+
+        self.execSql("CREATE TABLE IF NOT EXISTS prints {0}".format(
+            dict(self.cfg.DBTABLES)["prints"]), False)
+        self.execSql(self.cfg.DBFPI, False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def dropDb(self):
+
+        """Drop the DB"""
+
+        print("*** DB - Dropping the database ***")
+        for sql in self.cfg.DBDRP:
+            self.execSql(sql, False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def initDb(self):
+
+        """Initialisation of the DB"""
+
+        print("*** DB - Initializing the database ***")
+        self.dropDb()
+        self.createDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def beginDb(self):
+
+        """Start the write transaction of a scan
+
+        The scan writes its changes only, and the other connections see
+        none of them until the commit (or the rollback of a failed
+        scan)."""
+
+        print("*** DB - Starting a transaction ***")
+        if self.cfg.DBJOURNAL != 'WAL':
+            # Keep the changes in memory : writing them in the file would
+            # lock the readers out before the commit.
+            self.execSql("PRAGMA cache_spill = OFF", False)
+        self.execSql(self.cfg.DBBGN, False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def closeDb(self):
+
+        """Close the DB"""
+
+        print("*** DB - Closing the database ***")
+        self.cur.close()
+        self.con.close()
+        self.cur = None
+        self.con = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def commitDb(self):
+
+        """Commit"""
+
+        print("*** DB - Commiting the database ***")
+        self.con.commit()
+
+    #---------------------------------------------------------------------#
+
+    def execSql(self, sql, bind):
+
+        """Execute a SQL statement in DB"""
+
+        if sql:
+            if bind:
+                if DEBUG:
+                    print(sql, bind)
+                self.cur.execute(sql, bind)
+            else:
+                if DEBUG:
+                    print(sql)
+                self.cur.execute(sql)
+            return(True)
+        else:
+            return(False)
+
+    #---------------------------------------------------------------------#
+
+    def getGeneration(self):
+
+        """Return the generation of the library (changes at each update)"""
+
+        return(str2int(str(self.getMeta('generation')), 0))
+
+    #---------------------------------------------------------------------#
+
+    def bumpGeneration(self):
+
+        """The library has changed"""
+
+        self.setMeta('generation', self.getGeneration() + 1)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getMovie(self, id):
+
+        """Return the (id, file, path) row of a movie, None if unknown"""
+
+        self.execSql(self.cfg.DBGET, (id,))
+        return(self.cur.fetchone())
+
+    #---------------------------------------------------------------------#
+
+    def getMoviesPage(self, src=None, after=None, limit=500):
+
+        """Return (rows, next) : a page of (id, file, path) rows and the
+        cursor to give as after for the next page (None if last page)
+
+        Without src, all movies are sorted by file. With FTS5, every word
+        of src has to start a word of the file name and results are
+        sorted by relevance. Otherwise src is searched anywhere in the
+        file name."""
+
+        if self.queryMovies(self.cur, src, after, limit):
+            rows = [(r[3], r[0:3]) for r in self.cur.fetchall()]
+        else:
+            rows = [(r[1], r) for r in self.cur.fetchall()]
+        next = None
+        if len(rows) == limit:
+            next = (rows[-1][0], rows[-1][1][0])
+        return(([r[1] for r in rows], next))
+
+    #---------------------------------------------------------------------#
+
+    def queryMovies(self, cur, src, after, limit):
+
+        """Run the request of getMoviesPage on cur (limit -1 : all the
+        rows), return True if the rows end with their rank"""
+
+        words = []
+        if src:
+            words = findall(r"[^\W_]+", src)
+        if not src:
+            key = after or ("", 0)
+            cur.execute(self.cfg.DBALL, (key[0], key[0], key[1], limit))
+            return(False)
+        if self.fts and words:
+            key = after or (float('-inf'), 0)
+            match = " ".join(['"{0}"*'.format(w) for w in words])
+            try:
+                cur.execute(self.cfg.DBFTM, (match, key[0], key[1], limit))
+                return(True)
+            except OperationalError as e:
+                # Index not usable : search with LIKE
+                error(e)
+        key = after or ("", 0)
+        cur.execute(self.cfg.DBSRC, (key[0], key[0], key[1], '%'+src+'%',
+            limit))
+        return(False)
+
+    #---------------------------------------------------------------------#
+
+    def searchFilter(self, src):
+
+        """Return (key, terms) : the rows found by getMoviesPage(src) are
+        the ones whose key(file) contains all the terms
+
+        Used to narrow results in memory when a search is extended."""
+
+        if self.fts and findall(r"[^\W_]+", src):
+            # Every word has to start a word of the file name
+            terms = [" " + w for w in normTitle(src, False).split()]
+            return((self.ftsKey, terms))
+        return((self.likeKey, [src.lower()]))
+
+    #---------------------------------------------------------------------#
+
+    def ftsKey(self, file):
+
+        """Key of a file for a full text search"""
+
+        return(" " + normTitle(file, False))
+
+    #---------------------------------------------------------------------#
+
+    def likeKey(self, file):
+
+        """Key of a file for a LIKE search"""
+
+        return(file.lower())
+
+    #---------------------------------------------------------------------#
+
+    def countMovies(self):
+
+        """Return the number of movies"""
+
+        self.execSql(self.cfg.DBCNT, None)
+        return(self.cur.fetchone()[0])
+
+    #---------------------------------------------------------------------#
+
+    def getMovieTitles(self):
+
+        """Return {id: file} for all movies"""
+
+        self.execSql(self.cfg.DBIDS, None)
+        return(dict(self.cur.fetchall()))
+
+    #---------------------------------------------------------------------#
+
+    def iterMovies(self, src=None, page=500):
+
+        """Yield (id, file, path) rows lazily, page by page
+
+        The rows come from one request on a cursor of their own : a full
+        text search is not matched and ranked again for each page."""
+
+        cur = self.con.cursor()
+        try:
+            rank = self.queryMovies(cur, src, None, -1)
+            while True:
+                rows = cur.fetchmany(page)
+                for row in rows:
+                    yield row[0:3] if rank else row
+                if len(rows) < page:
+                    break
+        finally:
+            cur.close()
+
+    #---------------------------------------------------------------------#
+
+    def addMovie(self, file, filepath, size=None, mtime=None):
+
+        """Add a movie in DB"""
+
+        self.execSql(self.cfg.DBADD, (splitPath(filepath)[0], file, size,
+            mtime))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def addMovies(self, rows):
+
+        """Add movies in DB, rows of (file, filepath, size, mtime)
+
+        Rows are loaded in a TEMP table with executemany calls of DBBATCH
+        rows, then copied by one INSERT ... SELECT : the full text index
+        triggers run in one statement instead of one per row. The caller
+        commits (a scan commits once, at the end)."""
+
+        if DEBUG:
+            print(self.cfg.DBADI, len(rows))
+        ids = {}
+        batch = self.cfg.DBBATCH
+        self.cur.execute(self.cfg.DBADI[0])
+        try:
+            for i in range(0, len(rows), batch):
+                binds = []
+                for file, filepath, size, mtime in rows[i:i+batch]:
+                    path = filepath[0:len(filepath)-len(file)-1]
+                    if not path in ids:
+                        self.cur.execute(self.cfg.DBDID, (path,))
+                        row = self.cur.fetchone()
+                        ids[path] = row and row[0]
+                    binds.append((ids[path], file, size, mtime))
+                self.cur.executemany(self.cfg.DBADI[1], binds)
+            self.cur.execute(self.cfg.DBADI[2])
+        finally:
+            # Rows not added are not left for the next call
+            self.cur.execute(self.cfg.DBADI[3])
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def updMovies(self, rows):
+
+        """Update movies in DB, rows of (size, mtime, filepath)"""
+
+        if DEBUG:
+            print(self.cfg.DBUPD, len(rows))
+        self.cur.executemany(self.cfg.DBUPD, [(size, mtime) + splitPath(path)
+            for size, mtime, path in rows])
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def delMovies(self, paths):
+
+        """Delete movies from DB"""
+
+        if DEBUG:
+            print(self.cfg.DBDEL, len(paths))
+        self.cur.executemany(self.cfg.DBDEL, [splitPath(p) for p in paths])
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def updMovie(self, filepath, size, mtime):
+
+        """Update size and mtime of a movie in DB"""
+
+        self.execSql(self.cfg.DBUPD, (size, mtime) + splitPath(filepath))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def delMovie(self, filepath):
+
+        """Delete a movie from DB"""
+
+        self.execSql(self.cfg.DBDEL, splitPath(filepath))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getMovieState(self, filepath):
+
+        """Return (size, mtime) of a movie, None if not in DB"""
+
+        self.execSql(self.cfg.DBFGT, splitPath(filepath))
+        return(self.cur.fetchone())
+
+    #---------------------------------------------------------------------#
+
+    def delTree(self, path):
+
+        """Delete a directory and everything below it from DB"""
+
+        prefix = path + "/"
+        self.execSql(self.cfg.DBTDL[0], (path, len(prefix), prefix))
+        res = self.cur.rowcount
+        self.execSql(self.cfg.DBTDL[1], (path, len(prefix), prefix))
+        self.execSql(self.cfg.DBTDL[2], (path, len(prefix), prefix))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def getFilesState(self):
+
+        """Return {path: (size, mtime)} for all movies in DB"""
+
+        files = {}
+        self.execSql(self.cfg.DBFST, False)
+        for path, size, mtime in self.cur:
+            files[path] = (size, mtime)
+        return(files)
+
+    #---------------------------------------------------------------------#
+
+    def getDirsState(self):
+
+        """Return {path: (parent, mtime)} for all scanned directories"""
+
+        dirs = {}
+        self.execSql(self.cfg.DBDST, False)
+        for path, parent, mtime in self.cur:
+            dirs[path] = (parent, mtime)
+        return(dirs)
+
+    #---------------------------------------------------------------------#
+
+    def addDir(self, path, parent, mtime):
+
+        """Add a scanned directory in DB"""
+
+        self.execSql(self.cfg.DBDAD, (path, parent, mtime))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def touchDir(self, path):
+
+        """Add a directory in DB if not known yet (mtime unknown)"""
+
+        self.execSql(self.cfg.DBDAI, (path, splitPath(path)[0]))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def updDir(self, path, parent, mtime):
+
+        """Update a scanned directory in DB"""
+
+        self.execSql(self.cfg.DBDUP, (parent, mtime, path))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def delDir(self, path):
+
+        """Delete a scanned directory from DB"""
+
+        for sql in self.cfg.DBDDL:
+            self.execSql(sql, (path,))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def setSubs(self, path, parent, files):
+
+        """Replace the subtitles found in the directory path
+
+        Subtitles in a Subs folder belong to the movies of its parent (to
+        the movie of its parent if there is only one, whatever their
+        names : 'Subs/2_English.srt')."""
+
+        dir = path
+        if parent and isSubsDir(basename(path)):
+            dir = parent
+        self.touchDir(path)
+        self.touchDir(dir)
+        self.execSql(self.cfg.DBSBD, (path,))
+        for file in files:
+            stem, lang = subName(file)
+            self.execSql(self.cfg.DBSBA, (path, dir, stem, lang, file))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getSubs(self, path):
+
+        """Return [(lang, path)] : the subtitles of a movie"""
+
+        dir, file = splitPath(path)
+        self.execSql(self.cfg.DBSBG, (dir, file.rpartition('.')[0]))
+        return(self.cur.fetchall())
+
+    #---------------------------------------------------------------------#
+
+    def getAllSubs(self):
+
+        """Return the paths of all the subtitles"""
+
+        self.execSql(self.cfg.DBSBL, None)
+        return([row[0] for row in self.cur.fetchall()])
+
+    #---------------------------------------------------------------------#
+
+    def getProbeTodo(self):
+
+        """Return [(path, size, mtime)] : the movies not probed yet (or
+        changed since)"""
+
+        self.execSql(self.cfg.DBPRL, None)
+        return(self.cur.fetchall())
+
+    #---------------------------------------------------------------------#
+
+    def setProbe(self, path, size, mtime, info):
+
+        """Store the metadata of a movie (info None : probe failed)"""
+
+        if not info:
+            info = {}
+        self.execSql(self.cfg.DBPRS, (path, size, mtime,
+            info.get('duration'), info.get('container'),
+            info.get('vcodec'), info.get('width'), info.get('height'),
+            lst2str(info.get('audio', []))))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getProbe(self, path):
+
+        """Return the metadata of a movie, None if not probed"""
+
+        self.execSql(self.cfg.DBPRG, (path,))
+        row = self.cur.fetchone()
+        if not row:
+            return(None)
+        keys = ['duration', 'container', 'vcodec', 'width', 'height']
+        info = dict(zip(keys, row))
+        info['audio'] = str2lst(row[5]) if row[5] else []
+        return(info)
+
+    #---------------------------------------------------------------------#
+
+    def delProbes(self):
+
+        """Delete the metadata and fingerprints of the movies not in the
+        library anymore"""
+
+        res = 0
+        for sql in self.cfg.DBPRD:
+            self.execSql(sql, None)
+            res += self.cur.rowcount
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def getPrintTodo(self):
+
+        """Return [(path, size, mtime)] : the movies without fingerprint
+        (or changed since)"""
+
+        self.execSql(self.cfg.DBFPL, None)
+        return(self.cur.fetchall())
+
+    #---------------------------------------------------------------------#
+
+    def setPrint(self, path, size, mtime, fp):
+
+        """Store the fingerprint of a movie"""
+
+        self.execSql(self.cfg.DBFPS, (path, size, mtime, fp))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getPrint(self, path, size, mtime):
+
+        """Return the fingerprint of a movie, None if unknown or changed"""
+
+        self.execSql(self.cfg.DBFPG, (path, size, mtime))
+        row = self.cur.fetchone()
+        return(row and row[0])
+
+    #---------------------------------------------------------------------#
+
+    def getDuplicates(self):
+
+        """Return [(fingerprint, [path])] : the movies stored more than
+        once"""
+
+        res = []
+        self.execSql(self.cfg.DBFPU, None)
+        for fp, path in self.cur.fetchall():
+            if res and res[-1][0] == fp:
+                res[-1][1].append(path)
+            else:
+                res.append((fp, [path]))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def moveMovie(self, old, new, size, mtime):
+
+        """A movie was moved (or renamed) from old to new : the row of old
+        is kept with its metadata, the one added for new is removed"""
+
+        state = tuple(self.getMovieState(old))
+        self.delMovie(new)
+        self.execSql(self.cfg.DBMOV[0], splitPath(new) + (size, mtime)
+            + splitPath(old))
+        for sql in self.cfg.DBMOV[1:]:
+            self.execSql(sql, (new, size, mtime, old) + state)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def getMeta(self, key):
+
+        """Return a value from the meta table"""
+
+        self.execSql(self.cfg.DBMGT, (key,))
+        row = self.cur.fetchone()
+        if row:
+            return(row[0])
+        else:
+            return(None)
+
+    #---------------------------------------------------------------------#
+
+    def setMeta(self, key, value):
+
+        """Set a value in the meta table"""
+
+        self.execSql(self.cfg.DBMST[0], (key,))
+        self.execSql(self.cfg.DBMST[1], (key, value))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Scanner(object):
+
+    """Incremental scan of the movies root folder
+
+    Directories are listed by a pool of walker threads (os.scandir, so the
+    entry type comes for free with the listing) and every result goes
+    through a bounded queue to a single writer thread which owns its own
+    connection to the DB. The writer only writes the changes found, in one
+    transaction committed at the end, so the library is never seen empty
+    or half scanned.
+
+    If given, progress is called from the writer thread with
+    ('scan', found, files per second, current directory) tuples.
+    """
+
+    def __init__(self, cfg, full=False, progress=None):
+
+        """Initialisation of the Scanner object"""
+
+        self.cfg = cfg
+        self.full = full
+        self.progress = progress
+        self.cancelled = Event()
+        self.jobs = max(1, cfg.JOBS or 1)
+        # Work shared by the walkers (depth first keeps it small)
+        self.todo = LifoQueue()
+        self.pending = 0
+        self.lock = Lock()
+        # Results for the writer
+        self.out = Queue(maxsize=1024)
+        self.ready = Event()
+        self.failed = None
+        # State of the last scan (read only once loaded)
+        self.files = {}
+        self.dirs = {}
+        self.children = {}
+        self.content = {}
+        # Writer state
+        self.seenFiles = set()
+        self.seenDirs = set()
+        self.adds = []
+        self.upds = []
+        self.news = {}
+        self.added = 0
+        self.changed = 0
+        self.removed = 0
+        self.moved = 0
+        self.found = 0
+        self.current = None
+        self.started = time()
+        self.reported = 0
+
+    #---------------------------------------------------------------------#
+
+    def load(self, db):
+
+        """Load the state of the last scan from DB"""
+
+        if db.getMeta('scan') != self.cfg.scanSignature():
+            # Settings have changed : stored directories are useless
+            self.full = True
+        self.files = db.getFilesState()
+        self.dirs = db.getDirsState()
+        for path in self.dirs:
+            parent = self.dirs[path][0]
+            self.children.setdefault(parent, []).append(path)
+        for path in self.files:
+            self.content.setdefault(splitPath(path)[0], []).append(path)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Scan and return a report {added, changed, removed, cancelled}"""
+
+        writer = Thread(target=self.write, name="scan-writer")
+        writer.start()
+        self.ready.wait()
+        if not self.failed:
+            if self.full:
+                print("*** Full scan of {0} ***".format(self.cfg.PATH))
+            else:
+                print("*** Incremental scan of {0} ***".format(self.cfg.PATH))
+            self.push(self.cfg.PATH, None)
+            walkers = []
+            for i in range(self.jobs):
+                walker = Thread(target=self.walk, name="scan-walker")
+                walker.start()
+                walkers.append(walker)
+            for walker in walkers:
+                walker.join()
+        self.out.put(None)
+        writer.join()
+        if self.failed:
+            raise self.failed
+        return(self.report())
+
+    #---------------------------------------------------------------------#
+
+    def report(self):
+
+        """Return the scan report"""
+
+        return({'added': self.added, 'changed': self.changed,
+            'removed': self.removed, 'moved': self.moved,
+            'cancelled': self.cancelled.is_set()})
+
+    #---------------------------------------------------------------------#
+
+    def cancel(self):
+
+        """Stop the scan, nothing is written in DB"""
+
+        print("*** Cancelling the scan ***")
+        self.cancelled.set()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def notify(self, force=False):
+
+        """Report the progress (4 times per second at most)"""
+
+        now = time()
+        if self.progress and (force or now - self.reported >= 0.25):
+            self.reported = now
+            rate = self.found / max(now - self.started, 0.001)
+            self.progress(('scan', self.found, rate, self.current))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def push(self, path, parent):
+
+        """Add a directory to scan"""
+
+        with self.lock:
+            self.pending += 1
+        self.todo.put((path, parent))
+
+    #---------------------------------------------------------------------#
+
+    def walk(self):
+
+        """Walker thread : scan directories until there is none left"""
+
+        while True:
+            item = self.todo.get()
+            if item is None:
+                break
+            try:
+                if not self.cancelled.is_set():
+                    self.scanDir(item[0], item[1])
+            except Exception as e:
+                error(e)
+            with self.lock:
+                self.pending -= 1
+                if self.pending == 0:
+                    # Last directory done : wake up every walker
+                    for i in range(self.jobs):
+                        self.todo.put(None)
+
+    #---------------------------------------------------------------------#
+
+    def scanDir(self, path, parent):
+
+        """Look for movies in path"""
+
+        try:
+            mtime = stat(path).st_mtime
+        except OSError as e:
+            self.lost(path, parent, e)
+            return(False)
+        self.out.put(('dir', path, parent, mtime))
+        known = self.dirs.get(path)
+        if not self.full and known and known[1] == mtime:
+            # Directory entries have not changed since the last scan, but
+            # a sub-directory mtime does not bubble up : go down anyway.
+            if DEBUG:
+                print("Skip {0}".format(path))
+            self.out.put(('keep', path))
+            for sub in self.children.get(path, []):
+                self.push(sub, path)
+            return(True)
+        if DEBUG:
+            print("Scan {0}".format(path))
+        subs = []
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    if self.cancelled.is_set():
+                        break
+                    file = entry.name
+                    filepath = path+"/"+file
+                    try:
+                        if entry.is_dir():
+                            if isScanDir(self.cfg, file):
+                                self.push(filepath, path)
+                        elif isMovie(self.cfg, file):
+                            st = entry.stat()
+                            self.out.put(('file', file, filepath,
+                                st.st_size, st.st_mtime))
+                        elif file.lower().endswith(".srt"):
+                            subs.append(file)
+                    except OSError as e:
+                        error(e)
+        except OSError as e:
+            self.lost(path, parent, e)
+            return(False)
+        self.out.put(('subs', path, parent, subs))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def lost(self, path, parent, e):
+
+        """A directory could not be listed : fail the scan if it is the
+        root (share not mounted), else keep what it held at the last scan"""
+
+        error(e)
+        if not parent:
+            self.failed = e
+            return(False)
+        # No mtime : listed again by the next scan
+        self.out.put(('dir', path, parent, None))
+        todo = [path]
+        while todo:
+            path = todo.pop()
+            self.out.put(('keep', path))
+            todo.extend(self.children.get(path, []))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def write(self):
+
+        """Writer thread : apply the scan results to the DB"""
+
+        db = Db(self.cfg)
+        with Db.writeLock:
+            try:
+                db.openDb()
+                self.load(db)
+                db.beginDb()
+            except Exception as e:
+                self.failed = e
+            self.ready.set()
+            try:
+                while not self.failed and not self.cancelled.is_set():
+                    item = self.out.get()
+                    if item is None:
+                        break
+                    self.apply(db, item)
+                    self.notify()
+                else:
+                    # Keep the walkers going until they are done
+                    while self.out.get() is not None:
+                        pass
+                if self.cancelled.is_set() or self.failed:
+                    db.con.rollback()
+                elif not self.failed:
+                    self.notify(True)
+                    self.finish(db)
+            except Exception as e:
+                self.failed = e
+                while self.out.get() is not None:
+                    pass
+            if db.con:
+                db.closeDb()
+
+    #---------------------------------------------------------------------#
+
+    def apply(self, db, item):
+
+        """Apply one scan result to the DB"""
+
+        if item[0] == 'file':
+            self.found += 1
+            self.scanFile(db, item[1], item[2], item[3], item[4])
+        elif item[0] == 'dir':
+            path, parent, mtime = item[1:]
+            self.current = path
+            self.seenDirs.add(path)
+            if not path in self.dirs:
+                db.addDir(path, parent, mtime)
+            elif self.dirs[path] != (parent, mtime):
+                db.updDir(path, parent, mtime)
+        elif item[0] == 'keep':
+            if item[1] in self.dirs:
+                self.seenDirs.add(item[1])
+            content = self.content.get(item[1], [])
+            self.found += len(content)
+            self.seenFiles.update(content)
+        elif item[0] == 'subs':
+            db.setSubs(item[1], item[2], item[3])
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def scanFile(self, db, file, filepath, size, mtime):
+
+        """Add or update a movie found in a scanned directory"""
+
+        self.seenFiles.add(filepath)
+        if not filepath in self.files:
+            self.adds.append((file, filepath, size, mtime))
+            self.news[filepath] = (size, mtime)
+            self.added += 1
+        elif self.files[filepath] != (size, mtime):
+            self.upds.append((size, mtime, filepath))
+            self.changed += 1
+        if len(self.adds) + len(self.upds) >= self.cfg.DBBATCH:
+            self.flush(db)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def flush(self, db):
+
+        """Write the pending rows in DB"""
+
+        if self.adds:
+            db.addMovies(self.adds)
+            self.adds = []
+        if self.upds:
+            db.updMovies(self.upds)
+            self.upds = []
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def finish(self, db):
+
+        """Remove what was not found anymore and commit"""
+
+        self.flush(db)
+        gone = [path for path in self.files if not path in self.seenFiles]
+        for old, new in self.findMoves(db, gone):
+            db.moveMovie(old, new, self.news[new][0], self.news[new][1])
+            gone.remove(old)
+            self.added -= 1
+            self.moved += 1
+        db.delMovies(gone)
+        self.removed = len(gone)
+        for path in self.dirs:
+            if not path in self.seenDirs:
+                db.delDir(path)
+        db.setMeta('scan', self.cfg.scanSignature())
+        if self.added + self.changed + self.removed + self.moved:
+            db.bumpGeneration()
+        db.commitDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def findMoves(self, db, gone):
+
+        """Return [(old, new)] : the movies gone found again under a new
+        path, by fingerprint (only the new movies of the size of a movie
+        gone are read)"""
+
+        sizes = {}
+        for path in gone:
+            size, mtime = self.files[path]
+            fp = db.getPrint(path, size, mtime)
+            if fp:
+                sizes.setdefault(size, {})[fp] = path
+        news = [path for path in self.news if self.news[path][0] in sizes]
+        if not news:
+            return([])
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            fps = list(pool.map(fingerprint, news))
+        res = []
+        for path, fp in zip(news, fps):
+            old = sizes[self.news[path][0]].pop(fp, None)
+            if old:
+                if DEBUG:
+                    print("Moved {0} -> {1}".format(old, path))
+                res.append((old, path))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Watcher(object):
+
+    """Live update of the DB from the movies root folder
+
+    Uses inotify on local disks. Network mounts (where inotify does not
+    see changes made by other hosts) are polled with incremental scans,
+    which only list the directories whose mtime changed.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE \
+        | IN_DELETE
+    NETFS = ['cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'fuse.sshfs']
+
+    def __init__(self, cfg, notify):
+
+        """Initialisation of the Watcher object"""
+
+        self.cfg = cfg
+        self.notify = notify
+        self.mode = None
+        self.thread = None
+        self.stopped = Event()
+        self.libc = None
+        self.fd = None
+        self.wds = {}
+        self.overflow = False
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start watching according to the WATCH setting"""
+
+        mode = self.cfg.WATCH
+        if not mode in ['auto', 'inotify', 'poll']:
+            return(False)
+        if mode == 'auto':
+            if isNetworkFs(self.cfg.PATH, self.NETFS):
+                mode = 'poll'
+            else:
+                mode = 'inotify'
+        if mode == 'inotify' and not self.initInotify():
+            mode = 'poll'
+        print("*** Watching {0} ({1}) ***".format(self.cfg.PATH, mode))
+        self.mode = mode
+        if mode == 'inotify':
+            target = self.runInotify
+        else:
+            target = self.runPoll
+        self.thread = Thread(target=target, name="watcher", daemon=True)
+        self.thread.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop watching"""
+
+        if self.thread:
+            print("*** Stopping the watcher ***")
+            self.stopped.set()
+            self.thread.join(5)
+            self.thread = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def rescan(self):
+
+        """Incremental scan, notify if something changed"""
+
+        try:
+            res = Scanner(self.cfg).run()
+        except Exception as e:
+            error(e)
+            return(False)
+        n = res['added'] + res['changed'] + res['removed'] + res['moved']
+        if n:
+            self.notify(n)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def runPoll(self):
+
+        """Polling thread"""
+
+        while not self.stopped.wait(self.cfg.POLL):
+            self.rescan()
+
+    #---------------------------------------------------------------------#
+
+    def initInotify(self):
+
+        """Open an inotify instance, False if not available"""
+
+        try:
+            self.libc = CDLL(find_library('c'), use_errno=True)
+            fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            error(e)
+            return(False)
+        if fd < 0:
+            error("inotify_init1 failed (errno {0})".format(get_errno()))
+            return(False)
+        self.fd = fd
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def addWatch(self, path):
+
+        """Watch a directory"""
+
+        wd = self.libc.inotify_add_watch(self.fd, path.encode(), self.MASK)
+        if wd < 0:
+            error("Cannot watch {0} (errno {1})".format(path, get_errno()))
+            return(False)
+        self.wds[wd] = path
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def delWatches(self, path):
+
+        """Stop watching a directory and its sub-directories"""
+
+        prefix = path + "/"
+        for wd, p in list(self.wds.items()):
+            if p == path or p[0:len(prefix)] == prefix:
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.wds[wd]
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def runInotify(self):
+
+        """Inotify thread"""
+
+        db = Db(self.cfg)
+        db.openDb()
+        self.watchTree(self.cfg.PATH)
+        # Catch up with what happened while we were not watching
+        self.rescan()
+        while not self.stopped.is_set():
+            if not select([self.fd], [], [], 1.0)[0]:
+                continue
+            try:
+                data = read(self.fd, 65536)
+            except BlockingIOError:
+                continue
+            n = self.applyEvents(db, data)
+            if self.overflow:
+                self.overflow = False
+                self.rescan()
+            if n:
+                self.notify(n)
+        close(self.fd)
+        db.closeDb()
+
+    #---------------------------------------------------------------------#
+
+    def watchTree(self, path):
+
+        """Watch a directory and its sub-directories"""
+
+        self.addWatch(path)
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir() and isScanDir(self.cfg, entry.name):
+                        self.watchTree(path+"/"+entry.name)
+        except OSError as e:
+            error(e)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def applyEvents(self, db, data):
+
+        """Apply a buffer of inotify events to the DB"""
+
+        n = 0
+        with Db.writeLock:
+            try:
+                i = 0
+                while i < len(data):
+                    wd, mask, cookie, size = unpack_from("iIII", data, i)
+                    name = data[i+16:i+16+size].rstrip(b"\0").decode(
+                        errors='surrogateescape')
+                    i += 16 + size
+                    n += self.applyEvent(db, wd, mask, name)
+                if n:
+                    db.bumpGeneration()
+                db.commitDb()
+            except Exception as e:
+                # Database locked or the like : let a rescan fix it
+                error(e)
+                db.con.rollback()
+                self.overflow = True
+        return(n)
+
+    #---------------------------------------------------------------------#
+
+    def applyEvent(self, db, wd, mask, name):
+
+        """Apply one inotify event to the DB, return the rows changed"""
+
+        if mask & self.IN_Q_OVERFLOW:
+            self.overflow = True
+            return(0)
+        if mask & self.IN_IGNORED:
+            self.wds.pop(wd, None)
+            return(0)
+        path = self.wds.get(wd)
+        if not path or not name:
+            return(0)
+        filepath = path+"/"+name
+        if DEBUG:
+            print("Event {0:#x} {1}".format(mask, filepath))
+        if mask & self.IN_ISDIR:
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self.delWatches(filepath)
+                return(db.delTree(filepath))
+            elif isScanDir(self.cfg, name):
+                return(self.addTree(db, filepath))
+        elif isMovie(self.cfg, name):
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                if db.getMovieState(filepath):
+                    db.delMovie(filepath)
+                    return(1)
+            else:
+                return(self.addFile(db, name, filepath))
+        elif name.lower().endswith(".srt"):
+            self.addSubs(db, path)
+        return(0)
+
+    #---------------------------------------------------------------------#
+
+    def addFile(self, db, file, filepath):
+
+        """Add or update a movie, return the rows changed"""
+
+        try:
+            st = stat(filepath)
+        except OSError:
+            # Already gone
+            return(0)
+        state = db.getMovieState(filepath)
+        if not state:
+            db.touchDir(splitPath(filepath)[0])
+            db.addMovie(file, filepath, st.st_size, st.st_mtime)
+            return(1)
+        elif tuple(state) != (st.st_size, st.st_mtime):
+            db.updMovie(filepath, st.st_size, st.st_mtime)
+            return(1)
+        return(0)
+
+    #---------------------------------------------------------------------#
+
+    def addTree(self, db, path):
+
+        """Watch a new directory and add its movies, return rows changed"""
+
+        n = 0
+        subs = []
+        self.addWatch(path)
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if isScanDir(self.cfg, entry.name):
+                            n += self.addTree(db, path+"/"+entry.name)
+                    elif isMovie(self.cfg, entry.name):
+                        n += self.addFile(db, entry.name, path+"/"+entry.name)
+                    elif entry.name.lower().endswith(".srt"):
+                        subs.append(entry.name)
+        except OSError as e:
+            error(e)
+        if subs:
+            db.setSubs(path, splitPath(path)[0], subs)
+        return(n)
+
+    #---------------------------------------------------------------------#
+
+    def addSubs(self, db, path):
+
+        """List again the subtitles of a directory"""
+
+        try:
+            with scandir(path) as entries:
+                subs = [entry.name for entry in entries
+                    if entry.name.lower().endswith(".srt")]
+        except OSError as e:
+            error(e)
+            return(False)
+        return(db.setSubs(path, splitPath(path)[0], subs))
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class FuzzyIndex(object):
+
+    """Typo tolerant search on titles, with an in-memory trigram index"""
+
+    def __init__(self, rows, limit=50, threshold=0.3):
+
+        """Build the index from (id, file, path) rows"""
+
+        self.limit = limit
+        self.threshold = threshold
+        self.rows = rows
+        self.sizes = array('H')
+        self.postings = {}
+        for i in range(len(rows)):
+            grams = trigrams(normTitle(rows[i][1]))
+            self.sizes.append(min(len(grams), 65535))
+            for gram in grams:
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array('I')
+                posting.append(i)
+
+    #---------------------------------------------------------------------#
+
+    def search(self, src):
+
+        """Return the best matches [(id, file, path)], most similar first
+
+        A title matches when it shares enough trigrams with src
+        (threshold of the src trigrams), ties are broken by the
+        similarity of the whole title."""
+
+        grams = trigrams(normTitle(src, False))
+        if not grams:
+            return([])
+        counts = Counter()
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting:
+                counts.update(posting)
+        n = len(grams)
+        best = []
+        # Only the titles sharing the most trigrams are worth ranking
+        for i, shared in counts.most_common(self.limit * 4):
+            if shared >= n * self.threshold:
+                best.append((shared, shared / (n + self.sizes[i] - shared), i))
+        best.sort(reverse=True)
+        return([self.rows[i] for shared, sim, i in best[0:self.limit]])
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class TitleIndex(object):
+
+    """Titles sorted by casefolded name, for prefix lookups
+
+    The index is a sorted list of (key, id) entries : a lookup is a
+    bisect, adding or removing a title an insort or a bisect and a del.
+    It follows the changes of the library with sync() instead of being
+    rebuilt."""
+
+    def __init__(self, rows, gen):
+
+        """Build the index from (id, file, path) rows of generation gen"""
+
+        self.gen = gen
+        self.titles = {}
+        for id, file, path in rows:
+            self.titles[id] = (file.casefold(), file)
+        self.entries = sorted([(v[0], k) for k, v in self.titles.items()])
+
+    #---------------------------------------------------------------------#
+
+    def add(self, id, file):
+
+        """Add a title"""
+
+        key = file.casefold()
+        self.titles[id] = (key, file)
+        insort(self.entries, (key, id))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def remove(self, id):
+
+        """Remove a title"""
+
+        key, file = self.titles.pop(id)
+        del self.entries[bisect_left(self.entries, (key, id))]
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def sync(self, db):
+
+        """Apply the changes made to the library since the last sync
+
+        A movie moved or renamed by a scan keeps its id : a title which
+        changed is removed and added again."""
+
+        gen = db.getGeneration()
+        if gen == self.gen:
+            return(False)
+        titles = db.getMovieTitles()
+        for id in [id for id in self.titles
+            if titles.get(id) != self.titles[id][1]]:
+            self.remove(id)
+        new = set(titles).difference(self.titles)
+        if len(new) > 1000:
+            # Lots of new titles (first scan) : faster to sort again
+            for id in new:
+                self.titles[id] = (titles[id].casefold(), titles[id])
+            self.entries = sorted([(v[0], k) for k, v in self.titles.items()])
+        else:
+            for id in new:
+                self.add(id, titles[id])
+        self.gen = gen
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def prefix(self, src, limit=8):
+
+        """Return up to limit distinct titles starting with src"""
+
+        key = src.casefold()
+        res = []
+        i = bisect_left(self.entries, (key,))
+        while i < len(self.entries) and len(res) < limit:
+            if not self.entries[i][0].startswith(key):
+                break
+            file = self.titles[self.entries[i][1]][1]
+            if not file in res:
+                res.append(file)
+            i += 1
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class ResultCache(object):
+
+    """LRU cache of search results, holding maxRows rows at most
+
+    Entries are tagged with the generation of the library they were read
+    from and are dropped when it has changed."""
+
+    def __init__(self, maxRows):
+
+        """Initialisation of the ResultCache object"""
+
+        self.maxRows = maxRows
+        self.entries = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    #---------------------------------------------------------------------#
+
+    def get(self, key, gen):
+
+        """Return the cached rows, None if not cached or out of date"""
+
+        entry = self.entries.get(key)
+        if entry and entry[0] == gen:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return(entry[1])
+        if entry:
+            self.drop(key)
+        self.misses += 1
+        return(None)
+
+    #---------------------------------------------------------------------#
+
+    def put(self, key, gen, rows):
+
+        """Cache rows, evicting the least recently used entries"""
+
+        if key in self.entries:
+            self.drop(key)
+        if len(rows) > self.maxRows:
+            return(False)
+        while self.entries and self.rows + len(rows) > self.maxRows:
+            self.drop(next(iter(self.entries)))
+            self.evictions += 1
+        self.entries[key] = (gen, rows)
+        self.rows += len(rows)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def drop(self, key):
+
+        """Remove an entry"""
+
+        gen, rows = self.entries.pop(key)
+        self.rows -= len(rows)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stats(self):
+
+        """Return the cache counters"""
+
+        return({'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'entries': len(self.entries),
+            'rows': self.rows})
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class ListModel(object):
+
+    """Rows of a VirtualList held in memory"""
+
+    def __init__(self, rows):
+
+        """Initialisation of the ListModel object"""
+
+        self.data = rows
+
+    #---------------------------------------------------------------------#
+
+    def count(self):
+
+        """Return the number of rows"""
+
+        return(len(self.data))
+
+    #---------------------------------------------------------------------#
+
+    def rows(self, first, n):
+
+        """Return n rows from first"""
+
+        return(self.data[first:first+n])
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class DbModel(object):
+
+    """Rows of a VirtualList read from the DB when displayed
+
+    All movies are read page by page (keyset pagination) and the last
+    pages used are kept in memory. The cursors of the pages already
+    walked are kept to jump back to them."""
+
+    def __init__(self, db, page=200, pages=16):
+
+        """Initialisation of the DbModel object"""
+
+        self.db = db
+        self.page = page
+        self.pages = pages
+        self.total = None
+        self.cursors = {0: None}
+        self.cache = OrderedDict()
+
+    #---------------------------------------------------------------------#
+
+    def count(self):
+
+        """Return the number of rows"""
+
+        if self.total is None:
+            self.total = self.db.countMovies()
+        return(self.total)
+
+    #---------------------------------------------------------------------#
+
+    def rows(self, first, n):
+
+        """Return n rows from first"""
+
+        res = []
+        if n <= 0:
+            return(res)
+        start = first // self.page
+        for p in range(start, (first + n - 1) // self.page + 1):
+            res.extend(self.getPage(p))
+        first -= start * self.page
+        return(res[first:first+n])
+
+    #---------------------------------------------------------------------#
+
+    def getPage(self, p):
+
+        """Return the rows of page p"""
+
+        if p in self.cache:
+            self.cache.move_to_end(p)
+            return(self.cache[p])
+        # Walk from the nearest page with a known cursor
+        k = max([i for i in self.cursors if i <= p])
+        rows = []
+        while k <= p:
+            if k not in self.cursors:
+                # Past the last page
+                return([])
+            rows, next = self.db.getMoviesPage(None, self.cursors[k],
+                self.page)
+            if next:
+                self.cursors[k+1] = next
+            k += 1
+        self.cache[p] = rows
+        if len(self.cache) > self.pages:
+            self.cache.popitem(last=False)
+        return(rows)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class VirtualList(Frame):
+
+    """List of files displaying only its visible rows
+
+    The rows (id, file, path) come from a model with count() and
+    rows(first, n) methods, so the Listbox never holds more than a
+    screen of titles. The selection (EXTENDED) is kept as model indexes
+    and survives scrolling."""
+
+    def __init__(self, master, font, command, shown=None):
+
+        """Initialisation of the VirtualList object (shown : called with
+        the visible rows and the index of the active one after each
+        render)"""
+
+        Frame.__init__(self, master)
+        self.model = ListModel([])
+        self.command = command
+        self.shown = shown
+        self.top = 0
+        self.height = 1
+        self.active = 0
+        self.anchor = 0
+        self.selection = set()
+        self.linespace = font.metrics('linespace')
+        self.ui_list = Listbox(self, selectmode=EXTENDED, font=font,
+            exportselection=False)
+        self.ui_list.pack(side=LEFT, fill=BOTH, expand=1)
+        self.ui_scroll = Scrollbar(self, command=self.yview)
+        self.ui_scroll.pack(side=RIGHT, fill=Y)
+        # Replace the Listbox bindings, the Listbox only holds a window
+        lb = self.ui_list
+        lb.bind("<Configure>", self.evtConfigure)
+        lb.bind("<Button-1>", lambda e: self.click(e.y, None))
+        lb.bind("<Shift-Button-1>", lambda e: self.click(e.y, 'shift'))
+        lb.bind("<Control-Button-1>", lambda e: self.click(e.y, 'ctrl'))
+        lb.bind("<B1-Motion>", lambda e: self.drag(e.y))
+        lb.bind("<Button-4>", lambda e: self.scroll(-3))
+        lb.bind("<Button-5>", lambda e: self.scroll(3))
+        lb.bind("<MouseWheel>", lambda e: self.scroll(-3*(e.delta//120)))
+        lb.bind("<Up>", lambda e: self.move(-1, False))
+        lb.bind("<Down>", lambda e: self.move(1, False))
+        lb.bind("<Prior>", lambda e: self.move(-self.height, False))
+        lb.bind("<Next>", lambda e: self.move(self.height, False))
+        lb.bind("<Home>", lambda e: self.move(-self.model.count(), False))
+        lb.bind("<End>", lambda e: self.move(self.model.count(), False))
+        lb.bind("<Shift-Up>", lambda e: self.move(-1, True))
+        lb.bind("<Shift-Down>", lambda e: self.move(1, True))
+        lb.bind("<Shift-Prior>", lambda e: self.move(-self.height, True))
+        lb.bind("<Shift-Next>", lambda e: self.move(self.height, True))
+        lb.bind("<Shift-Home>",
+            lambda e: self.move(-self.model.count(), True))
+        lb.bind("<Shift-End>", lambda e: self.move(self.model.count(), True))
+        lb.bind("<Control-a>", self.evtSelectAll)
+        lb.bind("<Return>", self.evtReturn)
+
+    #---------------------------------------------------------------------#
+
+    def setModel(self, model, keep=False):
+
+        """Display the rows of model, keeping the position if keep"""
+
+        self.model = model
+        if not keep:
+            # Other rows : the selected indexes mean nothing anymore
+            self.top = 0
+            self.active = 0
+            self.anchor = 0
+            self.selection = set()
+        n = model.count()
+        self.selection = set([i for i in self.selection if i < n])
+        self.render()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def selectedRows(self):
+
+        """Return the selected rows, in list order"""
+
+        res = []
+        for i in sorted(self.selection):
+            res.extend(self.model.rows(i, 1))
+        return(res)
+
+    #---------------------------------------------------------------------#
+
+    def render(self):
+
+        """Fill the Listbox with the visible rows"""
+
+        n = self.model.count()
+        self.top = max(0, min(self.top, n - self.height))
+        rows = self.model.rows(self.top, self.height)
+        lb = self.ui_list
+        lb.delete(0, END)
+        if rows:
+            lb.insert(END, *[r[1] for r in rows])
+        for j in range(len(rows)):
+            if self.top + j in self.selection:
+                lb.selection_set(j)
+        if self.top <= self.active < self.top + len(rows):
+            lb.activate(self.active - self.top)
+        if n:
+            self.ui_scroll.set(self.top / n, (self.top + len(rows)) / n)
+        else:
+            self.ui_scroll.set(0, 1)
+        if self.shown:
+            self.shown(rows, self.active - self.top)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def see(self, i):
+
+        """Scroll to make row i visible"""
+
+        if i < self.top:
+            self.top = i
+        elif i >= self.top + self.height:
+            self.top = i - self.height + 1
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def yview(self, *args):
+
+        """Scrollbar command"""
+
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * self.model.count())
+        elif args[0] == 'scroll':
+            if args[2] == 'pages':
+                self.top += int(args[1]) * self.height
+            else:
+                self.top += int(args[1])
+        self.render()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def scroll(self, n):
+
+        """Scroll n rows"""
+
+        self.top += n
+        self.render()
+        return("break")
+
+    #---------------------------------------------------------------------#
+
+    def index(self, y):
+
+        """Return the index of the row at y (None if no row)"""
+
+        i = self.top + self.ui_list.nearest(y)
+        if i >= self.model.count():
+            return(None)
+        return(i)
+
+    #---------------------------------------------------------------------#
+
+    def click(self, y, mode):
+
+        """Select with the mouse"""
+
+        self.ui_list.focus_set()
+        i = self.index(y)
+        if i is None:
+            return("break")
+        if mode == 'ctrl':
+            if i in self.selection:
+                self.selection.discard(i)
+            else:
+                self.selection.add(i)
+            self.anchor = i
+        elif mode == 'shift':
+            self.selection = set(range(min(self.anchor, i),
+                max(self.anchor, i) + 1))
+        else:
+            self.selection = set([i])
+            self.anchor = i
+        self.active = i
+        self.render()
+        return("break")
+
+    #---------------------------------------------------------------------#
+
+    def drag(self, y):
+
+        """Extend the selection while dragging the mouse"""
+
+        if y < 0:
+            self.top -= 1
+        elif y > self.ui_list.winfo_height():
+            self.top += 1
+        i = self.index(y)
+        if i is not None:
+            self.selection = set(range(min(self.anchor, i),
+                max(self.anchor, i) + 1))
+            self.active = i
+        self.render()
+        return("break")
+
+    #---------------------------------------------------------------------#
+
+    def move(self, delta, extend):
+
+        """Move the active row with the keyboard"""
+
+        n = self.model.count()
+        if n == 0:
+            return("break")
+        self.active = max(0, min(self.active + delta, n - 1))
+        if extend:
+            self.selection = set(range(min(self.anchor, self.active),
+                max(self.anchor, self.active) + 1))
+        else:
+            self.selection = set([self.active])
+            self.anchor = self.active
+        self.see(self.active)
+        self.render()
+        return("break")
+
+    #---------------------------------------------------------------------#
+
+    def evtSelectAll(self, evt):
+        self.selection = set(range(self.model.count()))
+        self.render()
+        return("break")
+
+    def evtReturn(self, evt):
+        self.command()
+        return("break")
+
+    def evtConfigure(self, evt):
+        lb = self.ui_list
+        line = self.linespace + 1 + 2 * int(lb.cget('selectborderwidth'))
+        border = 2 * (int(lb.cget('borderwidth'))
+            + int(lb.cget('highlightthickness')))
+        self.height = max(1, (evt.height - border) // line)
+        self.render()
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Backend(object):
+
+    """Base class of the player backends
+
+    A backend plays one file at a time : load() starts a file, playing()
+    tells if it is still running. Backends able to (mplayer, mpv) keep
+    one player process alive between files and drive it over an IPC
+    channel, so there is no process to start for each movie.
+    """
+
+    name = None
+
+    def __init__(self, cfg):
+
+        """Initialisation of the Backend object"""
+
+        self.cfg = cfg
+        self.proc = None
+        self.file = None
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start the player process (if kept alive between files)"""
+
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def load(self, file, sub=None):
+
+        """Play file (with the subtitles sub)"""
+
+        return(False)
+
+    #---------------------------------------------------------------------#
+
+    def playing(self):
+
+        """Is a file playing ?"""
+
+        return(False)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop playing"""
+
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def seek(self, seconds):
+
+        """Seek forward (or backward if negative)"""
+
+        return(False)
+
+    #---------------------------------------------------------------------#
+
+    def status(self):
+
+        """Return the state of the backend"""
+
+        if self.playing():
+            return({'backend': self.name, 'file': self.file})
+        return({'backend': self.name, 'file': None})
+
+    #---------------------------------------------------------------------#
+
+    def close(self):
+
+        """Stop the player process"""
+
+        if self.alive():
+            try:
+                self.proc.wait(2)
+            except TimeoutExpired:
+                killpg(self.proc.pid, SIGTERM)
+        self.proc = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def spawn(self, args, stdout=None):
+
+        """Start a player process, in its own process group"""
+
+        if DEBUG:
+            print(args)
+        return(Popen(args, stdin=PIPE, stdout=stdout, start_new_session=True))
+
+    #---------------------------------------------------------------------#
+
+    def alive(self):
+
+        """Is the player process running ?"""
+
+        return(self.proc is not None and self.proc.poll() is None)
+
+    #---------------------------------------------------------------------#
+
+    def write(self, line):
+
+        """Send a line to the player process"""
+
+        try:
+            self.proc.stdin.write(line.encode('utf-8', 'surrogateescape'))
+            self.proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            error(e)
+            return(False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class OmxBackend(Backend):
+
+    """omxplayer : one process per file, controlled by its keyboard
+    shortcuts on stdin"""
+
+    name = 'omxplayer'
+    KEYS = {30: "\x1b[C", -30: "\x1b[D", 600: "\x1b[A", -600: "\x1b[B"}
+
+    def load(self, file, sub=None):
+
+        """Play file (with the subtitles sub)"""
+
+        if self.alive():
+            killpg(self.proc.pid, SIGTERM)
+        args = ['omxplayer'] + self.cfg.OPT.split() + ['-o', self.cfg.OUT]
+        if sub:
+            args += ['--subtitles', sub]
+        self.proc = self.spawn(args + [file])
+        self.file = file
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def playing(self):
+
+        """Is a file playing ?"""
+
+        return(self.alive())
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop playing"""
+
+        if self.alive():
+            self.write("q")
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def seek(self, seconds):
+
+        """Seek forward (or backward), omxplayer only has fixed steps"""
+
+        key = self.KEYS.get(seconds)
+        if key and self.alive():
+            self.write(key)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def close(self):
+
+        """Stop the player process"""
+
+        self.stop()
+        return(Backend.close(self))
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class MplayerBackend(Backend):
+
+    """mplayer in slave/idle mode : one process for all the files
+
+    A reader thread follows the output of mplayer to know when a file
+    starts and ends. A file loaded while another plays ends the latter
+    first : an EOF only counts once every file loaded has started."""
+
+    name = 'mplayer'
+
+    def __init__(self, cfg):
+
+        """Initialisation of the MplayerBackend object"""
+
+        Backend.__init__(self, cfg)
+        self.state = 'idle'
+        self.loaded = 0
+        self.pending = 0
+        self.lock = Lock()
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start mplayer (if not running)"""
+
+        if self.alive():
+            return(True)
+        args = ['mplayer', '-slave', '-idle', '-quiet', '-fs',
+            '-msglevel', 'global=6']
+        self.proc = self.spawn(args, PIPE)
+        t = Thread(target=self.readOutput, args=(self.proc,),
+            name="mplayer", daemon=True)
+        t.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def readOutput(self, proc):
+
+        """Reader thread"""
+
+        for line in proc.stdout:
+            with self.lock:
+                if line.startswith(b"Starting playback"):
+                    self.pending = max(0, self.pending - 1)
+                    if not self.pending:
+                        self.state = 'playing'
+                elif line.startswith(b"EOF code:") and not self.pending:
+                    self.state = 'idle'
+        self.state = 'idle'
+
+    #---------------------------------------------------------------------#
+
+    def load(self, file, sub=None):
+
+        """Play file (with the subtitles sub)"""
+
+        self.start()
+        with self.lock:
+            self.pending += 1
+            self.state = 'loading'
+        self.loaded = time()
+        self.file = file
+        self.write('loadfile "{0}"\n'.format(file.replace('"', '\\"')))
+        if sub:
+            self.write('sub_load "{0}"\n'.format(sub.replace('"', '\\"')))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def playing(self):
+
+        """Is a file playing ?"""
+
+        if not self.alive():
+            return(False)
+        with self.lock:
+            if self.state == 'loading':
+                if time() - self.loaded < 10:
+                    return(True)
+                # Files which cannot be opened never start
+                self.pending = 0
+                self.state = 'idle'
+            return(self.state == 'playing')
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop playing"""
+
+        if self.alive():
+            self.write("stop\n")
+        with self.lock:
+            self.pending = 0
+            self.state = 'idle'
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def seek(self, seconds):
+
+        """Seek forward (or backward if negative)"""
+
+        if self.playing():
+            self.write("seek {0:d} 0\n".format(seconds))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def close(self):
+
+        """Stop the player process"""
+
+        if self.alive():
+            self.write("quit\n")
+        return(Backend.close(self))
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class MpvBackend(Backend):
+
+    """mpv in idle mode : one process for all the files, controlled with
+    JSON commands on a Unix socket
+
+    A reader thread follows the events sent by mpv to know when a file
+    starts and ends."""
+
+    name = 'mpv'
+
+    def __init__(self, cfg):
+
+        """Initialisation of the MpvBackend object"""
+
+        Backend.__init__(self, cfg)
+        self.state = 'idle'
+        self.begun = False
+        self.loaded = 0
+        self.sub = None
+        self.sock = None
+        self.tmp = None
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start mpv (if not running) and connect to its socket"""
+
+        if self.alive():
+            return(True)
+        self.tmp = mkdtemp()
+        path = "{0}/mpv.sock".format(self.tmp)
+        args = ['mpv', '--idle=yes', '--fs', '--no-terminal',
+            '--input-ipc-server={0}'.format(path)]
+        self.proc = self.spawn(args)
+        self.sock = socket(AF_UNIX, SOCK_STREAM)
+        started = time()
+        while True:
+            try:
+                self.sock.connect(path)
+                break
+            except OSError:
+                if not self.alive() or time() - started > 5:
+                    raise
+                sleep(0.05)
+        t = Thread(target=self.readEvents, args=(self.sock,), name="mpv",
+            daemon=True)
+        t.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def readEvents(self, sock):
+
+        """Reader thread"""
+
+        for line in sock.makefile('rb'):
+            try:
+                evt = loads(line.decode('utf-8', 'replace')).get('event')
+            except ValueError:
+                continue
+            if evt == 'start-file':
+                self.begun = True
+            elif evt == 'file-loaded':
+                self.state = 'playing'
+                if self.sub:
+                    self.send("sub-add", self.sub)
+            elif evt == 'end-file' and self.begun:
+                # (not the end of a file stopped before this load)
+                self.state = 'idle'
+        self.state = 'idle'
+
+    #---------------------------------------------------------------------#
+
+    def send(self, *cmd):
+
+        """Send a command to mpv"""
+
+        try:
+            data = dumps({"command": list(cmd)}) + "\n"
+            self.sock.sendall(data.encode('utf-8'))
+        except OSError as e:
+            error(e)
+            return(False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def load(self, file, sub=None):
+
+        """Play file (with the subtitles sub)"""
+
+        self.start()
+        self.state = 'loading'
+        self.begun = False
+        self.loaded = time()
+        self.file = file
+        self.sub = sub
+        self.send("loadfile", file, "replace")
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def playing(self):
+
+        """Is a file playing ?"""
+
+        if not self.alive():
+            return(False)
+        if self.state == 'loading':
+            return(time() - self.loaded < 10)
+        return(self.state == 'playing')
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop playing"""
+
+        if self.alive():
+            self.send("stop")
+        self.state = 'idle'
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def seek(self, seconds):
+
+        """Seek forward (or backward if negative)"""
+
+        if self.playing():
+            self.send("seek", seconds, "relative")
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def close(self):
+
+        """Stop the player process"""
+
+        if self.alive():
+            self.send("quit")
+        Backend.close(self)
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        if self.tmp:
+            rmtree(self.tmp, ignore_errors=True)
+            self.tmp = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class StubBackend(Backend):
+
+    """Fake player for tests : every file plays for length seconds"""
+
+    name = 'stub'
+    length = 1.0
+
+    def __init__(self, cfg):
+
+        """Initialisation of the StubBackend object"""
+
+        Backend.__init__(self, cfg)
+        self.until = 0
+        self.history = []
+
+    #---------------------------------------------------------------------#
+
+    def load(self, file, sub=None):
+
+        """Play file (with the subtitles sub)"""
+
+        print("*** Stub playing {0} ({1}) ***".format(file, sub))
+        self.history.append(('load', file, sub))
+        self.file = file
+        self.until = time() + self.length
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def playing(self):
+
+        """Is a file playing ?"""
+
+        return(time() < self.until)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop playing"""
+
+        self.history.append(('stop',))
+        self.until = 0
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def seek(self, seconds):
+
+        """Seek forward (or backward if negative)"""
+
+        self.history.append(('seek', seconds))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Prefetcher(object):
+
+    """Read ahead of the next movie of the queue (and its subtitles)
+
+    The first PREFETCH MiB are read (and dropped : the data stays in the
+    page cache, so PREFETCH is also the memory budget) at PREFETCHBW MiB/s
+    at most. Reads slower than expected mean the share is busy serving
+    the movie playing : the prefetcher then backs off.
+    """
+
+    def __init__(self, cfg, delay=5):
+
+        """Initialisation of the Prefetcher object"""
+
+        self.size = max(0, cfg.PREFETCH) * 1048576
+        self.rate = max(1, cfg.PREFETCHBW) * 1048576
+        self.chunk = 1048576
+        self.delay = delay
+        self.target = None
+        self.lock = Lock()
+        self.wake = Event()
+        self.stopped = Event()
+        self.thread = None
+        self.warmed = 0
+        self.backoffs = 0
+
+    #---------------------------------------------------------------------#
+
+    def warm(self, files):
+
+        """Read ahead files (replacing the previous request)"""
+
+        if not self.size:
+            return(False)
+        with self.lock:
+            self.target = files
+        if not self.thread:
+            self.thread = Thread(target=self.run, name="prefetch",
+                daemon=True)
+            self.thread.start()
+        self.wake.set()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def cancel(self):
+
+        """Forget the current request"""
+
+        with self.lock:
+            self.target = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop the prefetch thread"""
+
+        self.cancel()
+        self.stopped.set()
+        self.wake.set()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def wanted(self, files):
+
+        """Is files still the current request ?"""
+
+        with self.lock:
+            return(self.target is files and not self.stopped.is_set())
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Prefetch thread"""
+
+        while not self.stopped.is_set():
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                files = self.target
+            if not files:
+                continue
+            # Let the movie playing start first
+            if self.stopped.wait(self.delay):
+                break
+            for path in files:
+                if not self.wanted(files) or not self.read(path, files):
+                    break
+
+    #---------------------------------------------------------------------#
+
+    def read(self, path, files):
+
+        """Read the first bytes of path, while files is wanted"""
+
+        try:
+            f = open(path, 'rb')
+        except OSError as e:
+            error(e)
+            return(True)
+        if DEBUG:
+            print("Prefetching {0}".format(path))
+        done = 0
+        pause = 1
+        started = time()
+        with f:
+            while done < self.size and self.wanted(files):
+                t = time()
+                try:
+                    data = f.read(min(self.chunk, self.size - done))
+                except OSError as e:
+                    error(e)
+                    break
+                if not data:
+                    break
+                done += len(data)
+                self.warmed += len(data)
+                if time() - t > 4 * self.chunk / self.rate:
+                    # The share is busy : the movie playing comes first
+                    self.backoffs += 1
+                    self.stopped.wait(pause)
+                    pause = min(pause * 2, 30)
+                else:
+                    pause = 1
+                wait = done / self.rate - (time() - started)
+                if wait > 0:
+                    self.stopped.wait(wait)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class RingBuffer(object):
+
+    """Bounded FIFO of bytes between a reader thread and a consumer
+
+    The data is kept as the chunks read (no copy), so a buffer only takes
+    the memory of what it holds, up to size bytes."""
+
+    def __init__(self, size):
+
+        """Initialisation of the RingBuffer object"""
+
+        self.chunks = deque()
+        self.size = size
+        self.count = 0
+        self.eof = False
+        self.closed = False
+        self.served = 0
+        self.underruns = 0
+        self.cond = Condition()
+
+    #---------------------------------------------------------------------#
+
+    def put(self, data):
+
+        """Append data, waiting for room (False if closed)"""
+
+        i = 0
+        with self.cond:
+            while i < len(data):
+                while self.count == self.size and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return(False)
+                n = min(len(data) - i, self.size - self.count)
+                if i == 0 and n == len(data):
+                    self.chunks.append(data)
+                else:
+                    self.chunks.append(data[i:i+n])
+                self.count += n
+                i += n
+                self.cond.notify_all()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def get(self, n):
+
+        """Return up to n bytes, waiting for data (b"" at the end)"""
+
+        with self.cond:
+            if self.count == 0 and self.served and not self.eof:
+                # The player is faster than the share
+                self.underruns += 1
+            while self.count == 0 and not self.eof and not self.closed:
+                self.cond.wait()
+            if self.count == 0:
+                return(b"")
+            data = self.chunks.popleft()
+            if len(data) > n:
+                self.chunks.appendleft(data[n:])
+                data = data[0:n]
+            self.count -= len(data)
+            self.served += len(data)
+            self.cond.notify_all()
+        return(data)
+
+    #---------------------------------------------------------------------#
+
+    def finish(self):
+
+        """No more data to put"""
+
+        with self.cond:
+            self.eof = True
+            self.cond.notify_all()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def close(self):
+
+        """Stop both sides"""
+
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class ProxyHandler(BaseHTTPRequestHandler):
+
+    """HTTP requests of the BufferProxy"""
+
+    def do_GET(self):
+        self.server.proxy.handle(self, True)
+
+    def do_HEAD(self):
+        self.server.proxy.handle(self, False)
+
+    def log_message(self, format, *args):
+        if DEBUG:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+#-------------------------------------------------------------------------#
+
+class BufferProxy(object):
+
+    """Loopback HTTP server playing files through a read-ahead buffer
+
+    For each request, a thread fills a buffer of up to PROXYBUF MiB with big
+    sequential reads of the file, so latency spikes of a network share
+    are absorbed before the player sees them. Range requests (seeks)
+    start a new buffer. latency (seconds added to every read) simulates
+    a slow share for tests.
+    """
+
+    def __init__(self, cfg, latency=0):
+
+        """Initialisation of the BufferProxy object"""
+
+        self.size = max(1, cfg.PROXYBUF) * 1048576
+        self.block = 1048576
+        self.latency = latency
+        self.server = None
+        self.paths = OrderedDict()
+        self.names = 0
+        self.buffers = set()
+        self.lock = Lock()
+        self.underruns = 0
+        self.sent = 0
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start the HTTP server (if not running)"""
+
+        if self.server:
+            return(True)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ProxyHandler)
+        self.server.daemon_threads = True
+        self.server.proxy = self
+        t = Thread(target=self.server.serve_forever, name="proxy",
+            daemon=True)
+        t.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop the HTTP server"""
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            for ring in self.buffers:
+                ring.close()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def url(self, path):
+
+        """Return the URL to play path through the proxy
+
+        Only the last two URLs are served (the movie playing and the one
+        replacing it), the older ones are answered 404."""
+
+        self.start()
+        with self.lock:
+            self.names += 1
+            name = "{0}/{1}".format(self.names, quote(basename(path)))
+            self.paths[name] = path
+            while len(self.paths) > 2:
+                self.paths.popitem(last=False)
+        return("http://127.0.0.1:{0}/{1}".format(
+            self.server.server_address[1], name))
+
+    #---------------------------------------------------------------------#
+
+    def handle(self, req, body):
+
+        """Answer a GET (body) or HEAD request"""
+
+        with self.lock:
+            path = self.paths.get(req.path[1:])
+        try:
+            size = stat(path).st_size
+        except (OSError, TypeError):
+            req.send_error(404)
+            return(False)
+        first = 0
+        last = size - 1
+        ranges = findall(r"bytes=(\d*)-(\d*)", req.headers.get('Range', ""))
+        ranges = [r for r in ranges if r[0] or r[1]]
+        if ranges and ranges[0][0]:
+            first = int(ranges[0][0])
+            if ranges[0][1]:
+                last = min(int(ranges[0][1]), size - 1)
+        elif ranges:
+            # Suffix range : the last N bytes
+            first = max(0, size - int(ranges[0][1]))
+        if ranges and (first > last or first >= size):
+            req.send_response(416)
+            req.send_header('Content-Range', "bytes */{0}".format(size))
+            req.send_header('Content-Length', "0")
+            req.end_headers()
+            return(False)
+        if ranges:
+            req.send_response(206)
+            req.send_header('Content-Range', "bytes {0}-{1}/{2}".format(
+                first, last, size))
+        else:
+            req.send_response(200)
+        req.send_header('Content-Type', "application/octet-stream")
+        req.send_header('Content-Length', str(last - first + 1))
+        req.send_header('Accept-Ranges', "bytes")
+        req.end_headers()
+        if body:
+            self.stream(req, path, first, last + 1)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stream(self, req, path, first, end):
+
+        """Send path from first to end through a ring buffer"""
+
+        ring = RingBuffer(min(self.size, max(1, end - first)))
+        with self.lock:
+            self.buffers.add(ring)
+        t = Thread(target=self.fill, args=(ring, path, first, end),
+            name="proxy-fill", daemon=True)
+        t.start()
+        try:
+            while True:
+                data = ring.get(65536)
+                if not data:
+                    break
+                req.wfile.write(data)
+        except OSError:
+            # The player closed the connection (seek, stop)
+            pass
+        ring.close()
+        with self.lock:
+            self.buffers.discard(ring)
+            self.underruns += ring.underruns
+            self.sent += ring.served
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def fill(self, ring, path, first, end):
+
+        """Reader thread of a ring buffer"""
+
+        try:
+            with open(path, 'rb') as f:
+                f.seek(first)
+                pos = first
+                while pos < end and not ring.closed:
+                    if self.latency:
+                        sleep(self.latency)
+                    data = f.read(min(self.block, end - pos))
+                    if not data or not ring.put(data):
+                        break
+                    pos += len(data)
+        except OSError as e:
+            error(e)
+        ring.finish()
+
+    #---------------------------------------------------------------------#
+
+    def stats(self):
+
+        """Return the proxy counters (fill : buffered MiB)"""
+
+        with self.lock:
+            fill = sum([ring.count for ring in self.buffers])
+            underruns = self.underruns + sum([ring.underruns
+                for ring in self.buffers])
+            return({'fill': fill / 1048576, 'underruns': underruns,
+                'sent': self.sent / 1048576, 'streams': len(self.buffers)})
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class MediaCache(object):
+
+    """Local copies of movies (SD card), used when the share is slow or
+    offline
+
+    A copy is named after a hash of the path of the movie. Its mtime is
+    the mtime of the movie (with the size, tells if the copy is still
+    valid) and its atime the last time it was played (LRU eviction, set
+    by the cache itself so the noatime mount option does not matter).
+    Copies are made by a background thread at CACHEBW MiB/s at most and
+    the oldest ones are removed to stay under CACHESIZE MiB.
+    """
+
+    def __init__(self, cfg):
+
+        """Initialisation of the MediaCache object"""
+
+        self.dir = cfg.CACHEDIR
+        self.cap = max(0, cfg.CACHESIZE) * 1048576
+        self.rate = max(1, cfg.CACHEBW) * 1048576
+        self.chunk = 1048576
+        self.todo = Queue()
+        self.thread = None
+        self.stopped = Event()
+        self.hits = 0
+        self.copied = 0
+        self.evicted = 0
+
+    #---------------------------------------------------------------------#
+
+    def cachePath(self, path):
+
+        """Return the path of the copy of path"""
+
+        ext = path.rpartition('.')[2][0:5]
+        name = sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()
+        return("{0}/{1}.{2}".format(self.dir, name, ext))
+
+    #---------------------------------------------------------------------#
+
+    def lookup(self, path, play=True):
+
+        """Return the valid copy of path, None if not cached (play :
+        the copy is going to be played)"""
+
+        if not self.cap:
+            return(None)
+        copy = self.cachePath(path)
+        try:
+            cst = stat(copy)
+        except OSError:
+            return(None)
+        try:
+            st = stat(path)
+            if st.st_size != cst.st_size or st.st_mtime != cst.st_mtime:
+                # The movie has changed
+                remove(copy)
+                return(None)
+        except OSError:
+            # Share offline : the copy is all we have
+            pass
+        if play:
+            utime(copy, (time(), cst.st_mtime))
+            self.hits += 1
+        return(copy)
+
+    #---------------------------------------------------------------------#
+
+    def add(self, paths):
+
+        """Copy paths in background (if not cached yet)"""
+
+        if not self.cap:
+            return(False)
+        for path in paths:
+            self.todo.put(path)
+        if not self.thread:
+            self.thread = Thread(target=self.run, name="cache", daemon=True)
+            self.thread.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop copying"""
+
+        self.stopped.set()
+        self.todo.put(None)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Copy thread"""
+
+        while not self.stopped.is_set():
+            path = self.todo.get()
+            if path is None:
+                break
+            copy = self.cachePath(path)
+            if isfile(copy):
+                continue
+            try:
+                self.copy(path, copy)
+            except OSError as e:
+                error(e)
+            if isfile(copy + ".part"):
+                remove(copy + ".part")
+
+    #---------------------------------------------------------------------#
+
+    def copy(self, path, copy):
+
+        """Copy path at the bandwidth limit, making room first"""
+
+        st = stat(path)
+        if st.st_size > self.cap or not self.evict(st.st_size):
+            return(False)
+        print("*** Caching {0} ***".format(path))
+        done = 0
+        started = time()
+        with open(path, 'rb') as src, open(copy + ".part", 'wb') as dst:
+            while not self.stopped.is_set():
+                data = src.read(self.chunk)
+                if not data:
+                    break
+                dst.write(data)
+                done += len(data)
+                wait = done / self.rate - (time() - started)
+                if wait > 0:
+                    self.stopped.wait(wait)
+        if self.stopped.is_set() or done != st.st_size:
+            return(False)
+        utime(copy + ".part", (time(), st.st_mtime))
+        rename(copy + ".part", copy)
+        self.copied += 1
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def evict(self, size):
+
+        """Remove the least recently played copies to make room for size
+        bytes"""
+
+        makedirs(self.dir, exist_ok=True)
+        copies = []
+        total = 0
+        for entry in scandir(self.dir):
+            # Hidden files are not copies (index)
+            if entry.is_file() and not entry.name.endswith(".part") \
+                and not entry.name.startswith("."):
+                st = entry.stat()
+                copies.append((st.st_atime, st.st_size, entry.path))
+                total += st.st_size
+        copies.sort()
+        while copies and total + size > self.cap:
+            atime, csize, path = copies.pop(0)
+            remove(path)
+            total -= csize
+            self.evicted += 1
+        return(total + size <= self.cap)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class SubCache(MediaCache):
+
+    """UTF-8 copies of the subtitles (omxplayer does not read Latin-1 or
+    CP1252 subtitles)
+
+    A copy is named after a hash of its content, so identical subtitles
+    share it. The index maps the path of the subtitles to its size, mtime
+    (tell if the copy is still valid) and copy. The subtitles are
+    converted by a background thread : play only looks the index up.
+    """
+
+    def __init__(self, cfg):
+
+        """Initialisation of the SubCache object"""
+
+        MediaCache.__init__(self, cfg)
+        self.dir = cfg.SUBDIR
+        self.cap = max(0, cfg.SUBSIZE) * 1048576
+        self.index = {}
+        self.dirty = False
+        self.converted = 0
+        if self.cap:
+            self.loadIndex()
+
+    #---------------------------------------------------------------------#
+
+    def cachePath(self, name):
+
+        """Return the path of the copy named name"""
+
+        return("{0}/{1}.srt".format(self.dir, name))
+
+    #---------------------------------------------------------------------#
+
+    def loadIndex(self):
+
+        """Read the index : size, mtime, copy and path of the subtitles"""
+
+        try:
+            with open(self.dir + "/.index", encoding='utf-8',
+                errors='surrogateescape') as f:
+                for line in f:
+                    item = line.rstrip("\n").split("\t", 3)
+                    if len(item) == 4:
+                        self.index[item[3]] = (int(item[0]), float(item[1]),
+                            item[2])
+        except (OSError, ValueError) as e:
+            if DEBUG:
+                print(e)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def saveIndex(self):
+
+        """Write the index (copies evicted are forgotten)"""
+
+        makedirs(self.dir, exist_ok=True)
+        tmp = self.dir + "/.index.part"
+        with open(tmp, 'w', encoding='utf-8', errors='surrogateescape') as f:
+            for path, item in list(self.index.items()):
+                if isfile(self.cachePath(item[2])):
+                    f.write("{0}\t{1!r}\t{2}\t{3}\n".format(item[0],
+                        item[1], item[2], path))
+        rename(tmp, self.dir + "/.index")
+        self.dirty = False
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def lookup(self, sub, play=True):
+
+        """Return the UTF-8 copy of sub, or sub itself while it is not
+        converted yet (then converted in background)"""
+
+        if not self.cap:
+            return(sub)
+        item = self.index.get(sub)
+        try:
+            st = stat(sub)
+            if item and item[0:2] != (st.st_size, st.st_mtime):
+                # The subtitles have changed
+                item = None
+        except OSError:
+            # Share offline : the copy is all we have
+            pass
+        if item:
+            copy = self.cachePath(item[2])
+            try:
+                if play:
+                    utime(copy)
+                    self.hits += 1
+                elif not isfile(copy):
+                    item = None
+            except OSError:
+                item = None
+        if not item:
+            self.add([sub])
+            return(sub)
+        return(copy)
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Conversion thread (the only one to change the index)"""
+
+        while not self.stopped.is_set():
+            sub = self.todo.get()
+            if sub is None:
+                break
+            try:
+                self.convert(sub)
+                if self.dirty and self.todo.empty():
+                    self.saveIndex()
+            except OSError as e:
+                error(e)
+
+    #---------------------------------------------------------------------#
+
+    def convert(self, sub):
+
+        """Convert sub to UTF-8 if not done yet"""
+
+        st = stat(sub)
+        item = self.index.get(sub)
+        if item and item[0:2] == (st.st_size, st.st_mtime) \
+            and isfile(self.cachePath(item[2])):
+            return(False)
+        with open(sub, 'rb') as f:
+            data = decodeText(f.read()).encode('utf-8')
+        name = sha1(data).hexdigest()
+        copy = self.cachePath(name)
+        if not isfile(copy):
+            if len(data) > self.cap or not self.evict(len(data)):
+                return(False)
+            if DEBUG:
+                print("Converting {0}".format(sub))
+            with open(copy + ".part", 'wb') as f:
+                f.write(data)
+            rename(copy + ".part", copy)
+            self.converted += 1
+        self.index[sub] = (st.st_size, st.st_mtime, name)
+        self.dirty = True
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class ThumbCache(MediaCache):
+
+    """Thumbnails of the movies : a sidecar poster (Movie.jpg, poster.jpg,
+    folder.jpg...) or else a frame of the movie, made by ffmpeg
+
+    The thumbnails are PPM files of width x height, named after a hash of
+    the path of the movie, with the mtime of the movie (an empty file :
+    no thumbnail). They are made and read by a background thread for the
+    rows displayed, and sent as ('thumb', path, data) events : the GUI
+    only turns the raw pixels into images. The images of the last rows
+    displayed are kept in memory.
+    """
+
+    width = 160
+    height = 120
+    memory = 64
+    SIDECARS = ['poster.jpg', 'folder.jpg', 'cover.jpg', 'poster.png',
+        'folder.png', 'cover.png']
+
+    def __init__(self, cfg, notify):
+
+        """Initialisation of the ThumbCache object"""
+
+        MediaCache.__init__(self, cfg)
+        self.dir = cfg.THUMBDIR
+        self.cap = max(0, cfg.THUMBSIZE) * 1048576
+        if not which('ffmpeg'):
+            self.cap = 0
+        self.notify = notify
+        self.lock = Lock()
+        self.wake = Event()
+        self.wanted = []
+        self.loading = set()
+        self.images = OrderedDict()
+        self.memHits = 0
+        self.memMisses = 0
+        self.generated = 0
+        self.failed = 0
+        self.spent = 0.0
+
+    #---------------------------------------------------------------------#
+
+    def cachePath(self, path):
+
+        """Return the path of the thumbnail of path"""
+
+        name = sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()
+        return("{0}/{1}.ppm".format(self.dir, name))
+
+    #---------------------------------------------------------------------#
+
+    def want(self, paths):
+
+        """Load the thumbnails of paths (the rows displayed), in this
+        order, forgetting the ones wanted before"""
+
+        if not self.cap:
+            return(False)
+        todo = []
+        for path in paths:
+            if path in self.images:
+                self.images.move_to_end(path)
+                self.memHits += 1
+            else:
+                self.memMisses += 1
+                todo.append(path)
+        with self.lock:
+            self.wanted = todo
+        self.wake.set()
+        if not self.thread:
+            self.thread = Thread(target=self.run, name="thumbs", daemon=True)
+            self.thread.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def pending(self):
+
+        """Are thumbnails being loaded ?"""
+
+        return(bool(self.wanted or self.loading))
+
+    #---------------------------------------------------------------------#
+
+    def keep(self, path, data):
+
+        """Keep the image of a loaded thumbnail (GUI thread, data None :
+        no thumbnail)"""
+
+        self.loading.discard(path)
+        image = None
+        if data:
+            image = PhotoImage(data=data, format='PPM')
+        self.images[path] = image
+        while len(self.images) > self.memory:
+            self.images.popitem(last=False)
+        return(image)
+
+    #---------------------------------------------------------------------#
+
+    def image(self, path):
+
+        """Return the image of path if in memory, None if not"""
+
+        return(self.images.get(path))
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop loading"""
+
+        self.stopped.set()
+        self.wake.set()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stats(self):
+
+        """Return the statistics of the cache"""
+
+        asked = self.memHits + self.memMisses
+        return({'memory': self.memHits / asked if asked else 0.0,
+            'disk': self.hits, 'generated': self.generated,
+            'failed': self.failed, 'evicted': self.evicted,
+            'rate': self.generated / self.spent if self.spent else 0.0})
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Thumbnails thread"""
+
+        while not self.stopped.is_set():
+            self.wake.wait()
+            self.wake.clear()
+            while not self.stopped.is_set():
+                with self.lock:
+                    if not self.wanted:
+                        break
+                    path = self.wanted.pop(0)
+                    self.loading.add(path)
+                data = None
+                try:
+                    data = self.load(path)
+                except OSError as e:
+                    if DEBUG:
+                        print(e)
+                self.notify(('thumb', path, data))
+
+    #---------------------------------------------------------------------#
+
+    def load(self, path):
+
+        """Return the thumbnail of path (base64 PPM), made if needed"""
+
+        st = stat(path)
+        thumb = self.cachePath(path)
+        try:
+            tst = stat(thumb)
+            valid = tst.st_mtime == st.st_mtime
+        except OSError:
+            valid = False
+        if valid:
+            self.hits += 1
+        else:
+            started = time()
+            if not self.make(path, thumb):
+                self.failed += 1
+                # Remembered as an empty thumbnail
+                open(thumb + ".part", 'wb').close()
+            else:
+                self.generated += 1
+                self.spent += time() - started
+            utime(thumb + ".part", (time(), st.st_mtime))
+            rename(thumb + ".part", thumb)
+        utime(thumb, (time(), st.st_mtime))
+        with open(thumb, 'rb') as f:
+            data = f.read()
+        if not data:
+            return(None)
+        return(b64encode(data).decode('ascii'))
+
+    #---------------------------------------------------------------------#
+
+    def make(self, path, thumb):
+
+        """Make the thumbnail of path in thumb.part, from a sidecar image
+        or a frame of the movie"""
+
+        self.evict(3 * self.width * self.height + 64)
+        dir = splitPath(path)[0]
+        stem = path.rpartition('.')[0]
+        sources = [stem + ".jpg", stem + ".png", stem + "-poster.jpg"]
+        sources.extend([dir + "/" + name for name in self.SIDECARS])
+        for source in sources:
+            if isfile(source):
+                if self.ffmpeg([source], thumb + ".part"):
+                    return(True)
+                break
+        # A frame after the opening credits, else the first one
+        for seek in [['-ss', '60'], []]:
+            if self.ffmpeg(seek + [path], thumb + ".part"):
+                return(True)
+        return(False)
+
+    #---------------------------------------------------------------------#
+
+    def ffmpeg(self, args, out):
+
+        """Write the first frame of the input args, fit in width x height,
+        in out (PPM)"""
+
+        box = "scale={0}:{1}:force_original_aspect_ratio=decrease,"
+        box += "pad={0}:{1}:(ow-iw)/2:(oh-ih)/2"
+        cmd = ['ffmpeg', '-v', 'error', '-y'] + args[0:-1]
+        cmd += ['-i', args[-1], '-frames:v', '1', '-vf',
+            box.format(self.width, self.height), '-f', 'image2',
+            '-c:v', 'ppm', out]
+        proc = Popen(cmd, stdin=DEVNULL, stdout=DEVNULL, stderr=DEVNULL)
+        try:
+            proc.wait(60)
+        except TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            return(False)
+        return(proc.returncode == 0 and isfile(out) and stat(out).st_size > 0)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Probe(object):
+
+    """Metadata of a movie : duration (s), container, video codec,
+    resolution and audio tracks ('codec:lang')
+
+    The probes run in the worker processes of the Prober."""
+
+    name = None
+
+    #---------------------------------------------------------------------#
+
+    def info(self, container):
+
+        """Return empty metadata"""
+
+        return({'duration': None, 'container': container, 'vcodec': None,
+            'width': None, 'height': None, 'audio': []})
+
+    #---------------------------------------------------------------------#
+
+    def probe(self, path):
+
+        """Return the metadata of path, None if unknown"""
+
+        return(None)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class FfProbe(Probe):
+
+    """Metadata read by ffprobe (any format known by ffmpeg)"""
+
+    name = 'ffprobe'
+    timeout = 60
+
+    #---------------------------------------------------------------------#
+
+    def probe(self, path):
+
+        """Return the metadata of path, None if unknown"""
+
+        cmd = ['ffprobe', '-v', 'error', '-show_format', '-show_streams',
+            '-of', 'json', path]
+        proc = Popen(cmd, stdout=PIPE, stderr=DEVNULL)
+        try:
+            out = proc.communicate(timeout=self.timeout)[0]
+        except TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return(None)
+        if proc.returncode != 0:
+            return(None)
+        data = loads(out.decode('utf-8', 'replace'))
+        format = data.get('format', {})
+        info = self.info(format.get('format_name', '').split(',')[0])
+        if format.get('duration'):
+            info['duration'] = float(format['duration'])
+        for stream in data.get('streams', []):
+            if stream.get('codec_type') == 'video' and not info['vcodec'] \
+                and not stream.get('disposition', {}).get('attached_pic'):
+                info['vcodec'] = stream.get('codec_name')
+                info['width'] = stream.get('width')
+                info['height'] = stream.get('height')
+            elif stream.get('codec_type') == 'audio':
+                lang = stream.get('tags', {}).get('language', 'und')
+                info['audio'].append("{0}:{1}".format(
+                    stream.get('codec_name'), lang))
+        return(info)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class HeaderProbe(Probe):
+
+    """Metadata read from the headers of MP4/MOV, Matroska/WebM and AVI
+    files, in pure Python (only a few KiB are read)"""
+
+    name = 'header'
+    AVIAUDIO = {0x1: 'pcm', 0x50: 'mp2', 0x55: 'mp3', 0xff: 'aac',
+        0x2000: 'ac3', 0x2001: 'dts'}
+
+    #---------------------------------------------------------------------#
+
+    def probe(self, path):
+
+        """Return the metadata of path, None if unknown"""
+
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            size = fstat(f.fileno()).st_size
+            if head[0:4] == b'\x1a\x45\xdf\xa3':
+                return(self.probeMkv(f, size))
+            elif head[0:4] == b'RIFF' and head[8:12] == b'AVI ':
+                return(self.probeAvi(f, size))
+            elif head[4:8] in [b'ftyp', b'moov', b'mdat', b'free', b'wide']:
+                return(self.probeMp4(f, size))
+            elif head[0:4] == b'\x00\x00\x01\xba':
+                return(self.info('mpeg'))
+            elif head[0:1] == b'\x47':
+                f.seek(188)
+                if f.read(1) == b'\x47':
+                    return(self.info('mpegts'))
+        return(None)
+
+    #---------------------------------------------------------------------#
+
+    def boxes(self, f, start, end):
+
+        """Yield (type, data start, end) of the MP4 boxes in [start, end)"""
+
+        pos = start
+        while pos + 8 <= end:
+            f.seek(pos)
+            head = f.read(16)
+            if len(head) < 8:
+                break
+            size, kind = unpack_from('>I4s', head)
+            data = pos + 8
+            if size == 1 and len(head) == 16:
+                size = unpack_from('>Q', head, 8)[0]
+                data = pos + 16
+            elif size == 0:
+                size = end - pos
+            if pos + size < data:
+                break
+            yield((kind, data, min(pos + size, end)))
+            pos += size
+
+    #---------------------------------------------------------------------#
+
+    def findBox(self, f, start, end, kinds):
+
+        """Return (data start, end) of the box at the path kinds"""
+
+        for kind, data, stop in self.boxes(f, start, end):
+            if kind == kinds[0]:
+                if len(kinds) == 1:
+                    return((data, stop))
+                return(self.findBox(f, data, stop, kinds[1:]))
+        return(None)
+
+    #---------------------------------------------------------------------#
+
+    def probeMp4(self, f, size):
+
+        """Metadata of a MP4/MOV file (moov box)"""
+
+        info = self.info('mp4')
+        for kind, data, end in self.boxes(f, 0, size):
+            if kind == b'ftyp':
+                f.seek(data)
+                if f.read(4) == b'qt  ':
+                    info['container'] = 'mov'
+            elif kind == b'moov':
+                for kind, start, stop in self.boxes(f, data, end):
+                    if kind == b'mvhd':
+                        f.seek(start)
+                        head = f.read(32)
+                        if head[0] == 1:
+                            scale, duration = unpack_from('>IQ', head, 20)
+                        else:
+                            scale, duration = unpack_from('>II', head, 12)
+                        if scale:
+                            info['duration'] = duration / scale
+                    elif kind == b'trak':
+                        self.mp4Track(f, start, stop, info)
+                break
+        return(info)
+
+    #---------------------------------------------------------------------#
+
+    def mp4Track(self, f, start, end, info):
+
+        """Add the metadata of a MP4 track (trak box) to info"""
+
+        box = self.findBox(f, start, end, [b'mdia', b'hdlr'])
+        if not box:
+            return(False)
+        f.seek(box[0] + 8)
+        handler = f.read(4)
+        codec = None
+        box = self.findBox(f, start, end, [b'mdia', b'minf', b'stbl', b'stsd'])
+        if box:
+            f.seek(box[0] + 12)
+            codec = f.read(4).decode('latin-1').strip()
+        if handler == b'vide' and not info['vcodec']:
+            info['vcodec'] = codec
+            box = self.findBox(f, start, end, [b'tkhd'])
+            if box:
+                f.seek(box[1] - 8)
+                width, height = unpack_from('>II', f.read(8))
+                info['width'] = width >> 16
+                info['height'] = height >> 16
+        elif handler == b'soun':
+            lang = 'und'
+            box = self.findBox(f, start, end, [b'mdia', b'mdhd'])
+            if box:
+                f.seek(box[0])
+                head = f.read(34)
+                code = unpack_from('>H', head, 32 if head[0] == 1 else 20)[0]
+                lang = "".join([chr(((code >> shift) & 31) + 0x60)
+                    for shift in [10, 5, 0]])
+            info['audio'].append("{0}:{1}".format(codec, lang))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def vint(self, f, marker):
+
+        """Read an EBML variable size integer (marker : keep the length
+        marker, as in the element ids), None if all ones (unknown size)"""
+
+        head = f.read(1)
+        if not head:
+            raise ValueError("Truncated EBML element")
+        mask = 0x80
+        length = 1
+        while length <= 8 and not head[0] & mask:
+            mask >>= 1
+            length += 1
+        if length > 8:
+            raise ValueError("Invalid EBML element")
+        value = head[0] if marker else head[0] & (mask - 1)
+        for byte in f.read(length - 1):
+            value = (value << 8) | byte
+        if not marker and value == (1 << (7 * length)) - 1:
+            return(None)
+        return(value)
+
+    #---------------------------------------------------------------------#
+
+    def elements(self, f, start, end):
+
+        """Yield (id, data start, end) of the EBML elements in [start, end)"""
+
+        pos = start
+        while pos < end:
+            f.seek(pos)
+            id = self.vint(f, True)
+            size = self.vint(f, False)
+            data = f.tell()
+            stop = end if size is None else min(data + size, end)
+            yield((id, data, stop))
+            pos = stop
+
+    #---------------------------------------------------------------------#
+
+    def ebml(self, f, start, end, kind):
+
+        """Read the value of an EBML element : uint, float or str"""
+
+        f.seek(start)
+        data = f.read(min(end - start, 256))
+        if kind == 'uint':
+            return(int.from_bytes(data, 'big'))
+        elif kind == 'float':
+            return(unpack_from('>f' if len(data) == 4 else '>d', data)[0])
+        return(data.rstrip(b'\x00').decode('utf-8', 'replace'))
+
+    #---------------------------------------------------------------------#
+
+    def probeMkv(self, f, size):
+
+        """Metadata of a Matroska/WebM file (Info and Tracks, which come
+        before the first Cluster)"""
+
+        info = self.info('matroska')
+        for id, data, end in self.elements(f, 0, size):
+            if id == 0x1A45DFA3:
+                for id, start, stop in self.elements(f, data, end):
+                    if id == 0x4282 and self.ebml(f, start, stop, 'str') \
+                        == 'webm':
+                        info['container'] = 'webm'
+            elif id == 0x18538067:
+                scale = 1000000
+                duration = None
+                for id, start, stop in self.elements(f, data, end):
+                    if id == 0x1549A966:
+                        for id, first, last in self.elements(f, start, stop):
+                            if id == 0x2AD7B1:
+                                scale = self.ebml(f, first, last, 'uint')
+                            elif id == 0x4489:
+                                duration = self.ebml(f, first, last, 'float')
+                    elif id == 0x1654AE6B:
+                        for id, first, last in self.elements(f, start, stop):
+                            if id == 0xAE:
+                                self.mkvTrack(f, first, last, info)
+                    elif id == 0x1F43B675:
+                        break
+                if duration:
+                    info['duration'] = duration * scale / 1000000000
+                break
+        return(info)
+
+    #---------------------------------------------------------------------#
+
+    def mkvTrack(self, f, start, end, info):
+
+        """Add the metadata of a Matroska track (TrackEntry) to info"""
+
+        kind = codec = width = height = None
+        lang = 'eng'
+        for id, data, stop in self.elements(f, start, end):
+            if id == 0x83:
+                kind = self.ebml(f, data, stop, 'uint')
+            elif id == 0x86:
+                codec = self.ebml(f, data, stop, 'str')
+            elif id == 0x22B59C:
+                lang = self.ebml(f, data, stop, 'str')
+            elif id == 0xE0:
+                for id, first, last in self.elements(f, data, stop):
+                    if id == 0xB0:
+                        width = self.ebml(f, first, last, 'uint')
+                    elif id == 0xBA:
+                        height = self.ebml(f, first, last, 'uint')
+        if kind == 1 and not info['vcodec']:
+            info['vcodec'] = codec
+            info['width'] = width
+            info['height'] = height
+        elif kind == 2:
+            info['audio'].append("{0}:{1}".format(codec, lang))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def chunks(self, data, start, end):
+
+        """Yield (id, data start, end) of the RIFF chunks in data"""
+
+        pos = start
+        while pos + 8 <= end:
+            id, size = unpack_from('<4sI', data, pos)
+            yield((id, pos + 8, min(pos + 8 + size, end)))
+            pos += 8 + size + (size & 1)
 
     #---------------------------------------------------------------------#
 
-    def createGui(self):
+    def probeAvi(self, f, size):
+
+        """Metadata of an AVI file (hdrl list)"""
+
+        info = self.info('avi')
+        f.seek(12)
+        head = f.read(12)
+        if len(head) < 12 or head[0:4] != b'LIST' or head[8:12] != b'hdrl':
+            return(info)
+        length = min(unpack_from('<I', head, 4)[0] - 4, 1048576)
+        data = f.read(length)
+        for id, start, end in self.chunks(data, 0, len(data)):
+            if id == b'avih' and end - start >= 40:
+                usec, frames = unpack_from('<I12xI', data, start)
+                info['duration'] = frames * usec / 1000000
+                info['width'], info['height'] = unpack_from('<II', data,
+                    start + 32)
+            elif id == b'LIST' and data[start:start+4] == b'strl':
+                kind = None
+                for id, first, last in self.chunks(data, start + 4, end):
+                    if id == b'strh':
+                        kind = data[first:first+4]
+                    elif id == b'strf' and kind == b'vids' \
+                        and not info['vcodec']:
+                        info['vcodec'] = data[first+16:first+20].decode(
+                            'latin-1').strip()
+                    elif id == b'strf' and kind == b'auds':
+                        tag = unpack_from('<H', data, first)[0]
+                        codec = self.AVIAUDIO.get(tag, "{0:#06x}".format(tag))
+                        info['audio'].append("{0}:und".format(codec))
+        return(info)
 
-        """Create the GUI for Config"""
+    #---------------------------------------------------------------------#
 
-        print("*** Creating Configuration GUI ***")
+#-------------------------------------------------------------------------#
+
+class StubProbe(Probe):
+
+    """Fake probe for tests : metadata made from the name and size"""
+
+    name = 'stub'
+
+    #---------------------------------------------------------------------#
+
+    def probe(self, path):
+
+        """Return the metadata of path, None if unknown"""
+
+        info = self.info(path.rpartition('.')[2].lower())
+        info['duration'] = stat(path).st_size / 1000
+        info['vcodec'] = 'stub'
+        info['width'] = 1920
+        info['height'] = 1080
+        info['audio'] = ['stub:und']
+        return(info)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Prober(object):
+
+    """Fingerprint the new or changed movies in background, on a pool of
+    JOBS threads, then probe their metadata on a pool of PROBEJOBS
+    processes
+
+    The results are stored in the prints and probes tables with the size
+    and mtime of the movie : a movie is not read again until it changes."""
+
+    def __init__(self, cfg):
+
+        """Initialisation of the Prober object"""
+
+        self.cfg = cfg
+        self.probe = newProbe(cfg.PROBE)
+        self.jobs = max(1, cfg.PROBEJOBS)
+        self.thread = None
+        self.again = False
+        self.cancelled = Event()
+        self.probed = 0
+        self.failed = 0
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Probe the movies not probed yet (again after the running pass)"""
+
+        if self.thread and self.thread.is_alive():
+            self.again = True
+            return(True)
+        self.cancelled.clear()
+        self.thread = Thread(target=self.run, name="prober", daemon=True)
+        self.thread.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def cancel(self):
+
+        """Stop probing"""
+
+        self.cancelled.set()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def run(self):
+
+        """Prober thread"""
+
+        while True:
+            self.again = False
+            try:
+                self.probeAll()
+            except Exception as e:
+                error(e)
+                break
+            if not self.again or self.cancelled.is_set():
+                break
+
+    #---------------------------------------------------------------------#
+
+    def probeAll(self):
+
+        """Probe the movies not probed yet, a few at a time"""
+
+        db = Db(self.cfg)
+        if not db.openDb():
+            return(False)
+        try:
+            with Db.writeLock:
+                db.delProbes()
+                db.commitDb()
+            self.printAll(db)
+            if self.probe:
+                self.probeMovies(db)
+        finally:
+            db.closeDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def printAll(self, db):
+
+        """Fingerprint the movies without fingerprint, a batch at a time"""
+
+        todo = db.getPrintTodo()
+        if not todo:
+            return(False)
+        print("*** Fingerprinting {0} movies ***".format(len(todo)))
+        started = time()
+        batch = self.cfg.DBBATCH
+        with ThreadPoolExecutor(max_workers=max(1, self.cfg.JOBS)) as pool:
+            for i in range(0, len(todo), batch):
+                if self.cancelled.is_set():
+                    break
+                items = todo[i:i+batch]
+                fps = list(pool.map(fingerprint, [item[0] for item in items]))
+                with Db.writeLock:
+                    for item, fp in zip(items, fps):
+                        if fp:
+                            db.setPrint(item[0], item[1], item[2], fp)
+                    db.commitDb()
+        print("*** Fingerprints : {0} movies in {1:.1f} s ***".format(
+            len(todo), time() - started))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def probeMovies(self, db):
+
+        """Probe the movies not probed yet, a few at a time"""
+
+        todo = db.getProbeTodo()
+        if not todo:
+            return(False)
+        print("*** Probing {0} movies with {1} ***".format(len(todo),
+            self.probe.name))
+        started = time()
+        done = self.probed + self.failed
+        rows = []
+        pending = {}
+        items = iter(todo)
+        # Not forked from this process : it runs threads (Tk, scans)
+        pool = ProcessPoolExecutor(max_workers=self.jobs,
+            mp_context=get_context("forkserver"))
+        try:
+            while not self.cancelled.is_set():
+                for item in items:
+                    future = pool.submit(probeFile, self.probe.name,
+                        item[0])
+                    pending[future] = item
+                    if len(pending) >= 2 * self.jobs:
+                        break
+                if not pending:
+                    break
+                for future in wait(pending,
+                    return_when=FIRST_COMPLETED)[0]:
+                    rows.append((pending.pop(future), future.result()))
+                if len(rows) >= self.cfg.DBBATCH:
+                    self.store(db, rows)
+                    rows = []
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.store(db, rows)
+        msg = "*** Probe : {0} movies in {1:.1f} s, {2} failed ***"
+        print(msg.format(self.probed + self.failed - done,
+            time() - started, self.failed))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def store(self, db, rows):
+
+        """Store [((path, size, mtime), info)] in DB"""
+
+        if not rows:
+            return(False)
+        with Db.writeLock:
+            for item, info in rows:
+                db.setProbe(item[0], item[1], item[2], info)
+                if info:
+                    self.probed += 1
+                else:
+                    self.failed += 1
+            db.commitDb()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+#-------------------------------------------------------------------------#
+
+class Player(object):
+
+    """Player class"""
+
+    def __init__(self):
+
+        """Initialisation of the Player object"""
+
+        self.cfg = None
+        self.db = None
         self.root = Tk()
-        self.root.title("Configuration")
-        self.root.attributes('-topmost', True)
-        font = Font(self.root, size=12, family='Sans')
-        # Middle Frame (config group)
-        self.ui_midframe = Frame(self.root, borderwidth=2)
-        self.ui_midframe.pack(fill=BOTH, expand=1)
-        # PATH
-        self.ui_pathlbl = Label(self.ui_midframe, text="Movies root folder",
-            justify=LEFT, anchor=W, font=font)
-        self.ui_pathlbl.grid(row=0, column=0, padx=2, pady=2)
-        self.ui_path = Entry(self.ui_midframe, font=font)
-        self.ui_path.grid(row=0, column=1, padx=2, pady=2)
-        # EXC
-        self.ui_exclbl = Label(self.ui_midframe, text="Directories to exclude",
-            justify=LEFT, anchor=W, font=font)
-        self.ui_exclbl.grid(row=1, column=0, padx=2, pady=2)
-        self.ui_exc = Entry(self.ui_midframe, font=font)
-        self.ui_exc.grid(row=1, column=1, padx=2, pady=2)
-        # EXT
-        self.ui_extlbl = Label(self.ui_midframe, text="Movies extensions",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_extlbl.grid(row=2, column=0, padx=2, pady=2)
-        self.ui_ext = Entry(self.ui_midframe, font=font)
-        self.ui_ext.grid(row=2, column=1, padx=2, pady=2)
-        # DB
-        self.ui_dblbl = Label(self.ui_midframe, text="Database name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_dblbl.grid(row=3, column=0, padx=2, pady=2)
-        self.ui_db = Entry(self.ui_midframe, font=font)
-        self.ui_db.grid(row=3, column=1, padx=2, pady=2)
-        # OUT
-        self.ui_outlbl = Label(self.ui_midframe, text="Audio output (local/hdmi)",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_outlbl.grid(row=4, column=0, padx=2, pady=2)
-        self.ui_out = Entry(self.ui_midframe, font=font)
-        self.ui_out.grid(row=4, column=1, padx=2, pady=2)
-        # OPT
-        self.ui_optlbl = Label(self.ui_midframe, text="Omxplayer extra options",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_optlbl.grid(row=5, column=0, padx=2, pady=2)
-        self.ui_opt = Entry(self.ui_midframe, font=font)
-        self.ui_opt.grid(row=5, column=1, padx=2, pady=2)
-        # URL1L
-        self.ui_url1llbl = Label(self.ui_midframe, text="Url 1 name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url1llbl.grid(row=6, column=0, padx=2, pady=2)
-        self.ui_url1l = Entry(self.ui_midframe, font=font)
-        self.ui_url1l.grid(row=6, column=1, padx=2, pady=2)
-        # URL1
-        self.ui_url1lbl = Label(self.ui_midframe, text="Url 1",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url1lbl.grid(row=7, column=0, padx=2, pady=2)
-        self.ui_url1 = Entry(self.ui_midframe, font=font)
-        self.ui_url1.grid(row=7, column=1, padx=2, pady=2)
-        # URL2L
-        self.ui_url2llbl = Label(self.ui_midframe, text="Url 2 name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url2llbl.grid(row=8, column=0, padx=2, pady=2)
-        self.ui_url2l = Entry(self.ui_midframe, font=font)
-        self.ui_url2l.grid(row=8, column=1, padx=2, pady=2)
-        # URL2
-        self.ui_url2lbl = Label(self.ui_midframe, text="Url 2",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url2lbl.grid(row=9, column=0, padx=2, pady=2)
-        self.ui_url2 = Entry(self.ui_midframe, font=font)
-        self.ui_url2.grid(row=9, column=1, padx=2, pady=2)
-        # URL3L
-        self.ui_url3llbl = Label(self.ui_midframe, text="Url 3 name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url3llbl.grid(row=10, column=0, padx=2, pady=2)
-        self.ui_url3l = Entry(self.ui_midframe, font=font)
-        self.ui_url3l.grid(row=10, column=1, padx=2, pady=2)
-        # URL3
-        self.ui_url3lbl = Label(self.ui_midframe, text="Url 3",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url3lbl.grid(row=11, column=0, padx=2, pady=2)
-        self.ui_url3 = Entry(self.ui_midframe, font=font)
-        self.ui_url3.grid(row=11, column=1, padx=2, pady=2)
-        # URL4L
-        self.ui_url4llbl = Label(self.ui_midframe, text="Url 4 name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url4llbl.grid(row=12, column=0, padx=2, pady=2)
-        self.ui_url4l = Entry(self.ui_midframe, font=font)
-        self.ui_url4l.grid(row=12, column=1, padx=2, pady=2)
-        # URL4
-        self.ui_url4lbl = Label(self.ui_midframe, text="Url 4",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url4lbl.grid(row=13, column=0, padx=2, pady=2)
-        self.ui_url4 = Entry(self.ui_midframe, font=font)
-        self.ui_url4.grid(row=13, column=1, padx=2, pady=2)
-        # URL5L
-        self.ui_url5llbl = Label(self.ui_midframe, text="Url 5 name",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url5llbl.grid(row=14, column=0, padx=2, pady=2)
-        self.ui_url5l = Entry(self.ui_midframe, font=font)
-        self.ui_url5l.grid(row=14, column=1, padx=2, pady=2)
-        # URL5
-        self.ui_url5lbl = Label(self.ui_midframe, text="Url 5",
-            justify=LEFT, anchor=W, font=font )
-        self.ui_url5lbl.grid(row=15, column=0, padx=2, pady=2)
-        self.ui_url5 = Entry(self.ui_midframe, font=font)
-        self.ui_url5.grid(row=15, column=1, padx=2, pady=2)
-        # Bottom Frame (buttons group)
-        self.ui_botframe = Frame(self.root, borderwidth=2)
-        self.ui_botframe.pack(anchor='s')
-        # Button Save
-        self.ui_butsave = Button(self.ui_botframe, text="Save",
-            command=self.save, font=font)
-        self.ui_butsave.grid(row=1, column=0, padx=2, pady=2)
-        # Button Close
-        self.ui_butquit = Button(self.ui_botframe, text="Close",
-            command=self.root.destroy, font=font)
-        self.ui_butquit.grid(row=1, column=1, padx=2, pady=2)
-        # Window position
-        self.root.update_idletasks()
-        w = self.root.winfo_reqwidth()
-        h = self.root.winfo_reqheight()
-        ws = self.root.winfo_screenwidth()
-        hs = self.root.winfo_screenheight()
-        x = (ws/2) - (w/2)
-        y = (hs/2) - (h/2)
-        self.root.geometry('%dx%d+%d+%d' % (w, h, x, y))
-        self.root.minsize(w, h)
-        self.root.maxsize(w, h)
+        self.URL1L = StringVar(master=self.root)
+        self.URL2L = StringVar(master=self.root)
+        self.URL3L = StringVar(master=self.root)
+        self.URL4L = StringVar(master=self.root)
+        self.URL5L = StringVar(master=self.root)
+        self.files = ListModel([])
+        self.watcher = None
+        self.scanner = None
+        self.fuzzy = None
+        self.fuzzyGen = 0
+        self.fuzzyWait = None
+        self.titles = None
+        self.cache = None
+        self.events = Queue()
+        self.afterId = None
+        self.typeId = None
+        self.playId = None
+        self.shownSrc = None
+        self.narrow = None
+        self.started = time()
+        self.backend = None
+        self.prefetcher = None
+        self.proxy = None
+        self.media = None
+        self.subs = None
+        self.prober = None
+        self.thumbs = None
+        self.thumbPath = None
+        self.queue = []
+        self.start()
+
+    #---------------------------------------------------------------------#
+
+    def start(self):
+
+        """Start the Player"""
+
+        print("*** Starting the Player ***")
+        # Configuration
+        self.cfg = Config()
+        ok = self.cfg.readConf() and self.cfg.checkConf()
+        # The config window needs the GUI (url buttons)
+        self.createGui()
+        while not ok:
+            self.cfg.display(self)
+            ok = self.cfg.checkConf()
+        self.backend = newBackend(self.cfg)
+        self.prefetcher = Prefetcher(self.cfg)
+        self.media = MediaCache(self.cfg)
+        self.subs = SubCache(self.cfg)
+        self.prober = Prober(self.cfg)
+        self.thumbs = ThumbCache(self.cfg, self.events.put)
+        if self.cfg.PROXY == 'on' or (self.cfg.PROXY == 'auto'
+            and isNetworkFs(self.cfg.PATH, Watcher.NETFS)):
+            self.proxy = BufferProxy(self.cfg)
+        # Database (opened once the list is displayed)
+        self.db = Db(self.cfg)
+        self.cache = ResultCache(self.cfg.CACHE)
+        self.display()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def stop(self):
+
+        """Stop the Player"""
+
+        msg = "Do you want to quit Raspyplayer ?"
+        if messagebox.askokcancel("Raspyplayer MC", msg):
+            print("*** Stopping the Player ***")
+            if self.watcher:
+                self.watcher.stop()
+            if self.scanner:
+                self.scanner.cancel()
+            self.prober.cancel()
+            msg = "*** Search cache : {hits} hits, {misses} misses, "
+            msg += "{evictions} evictions, {entries} entries, {rows} rows ***"
+            print(msg.format(**self.cache.stats()))
+            self.stopPlay()
+            self.backend.close()
+            self.prefetcher.stop()
+            msg = "*** Prefetch : {0} MiB read, {1} backoffs ***"
+            print(msg.format(self.prefetcher.warmed // 1048576,
+                self.prefetcher.backoffs))
+            self.media.stop()
+            msg = "*** Media cache : {0} hits, {1} copied, {2} evicted ***"
+            print(msg.format(self.media.hits, self.media.copied,
+                self.media.evicted))
+            self.subs.stop()
+            self.thumbs.stop()
+            msg = "*** Thumbnails : {memory:.0%} memory hits, {disk} disk hits, "
+            msg += "{generated} made ({rate:.1f}/s), {failed} without, "
+            msg += "{evicted} evicted ***"
+            print(msg.format(**self.thumbs.stats()))
+            msg = "*** Subtitles cache : {0} hits, {1} converted, "
+            msg += "{2} evicted ***"
+            print(msg.format(self.subs.hits, self.subs.converted,
+                self.subs.evicted))
+            if self.proxy:
+                self.proxy.stop()
+                msg = "*** Proxy : {sent:.0f} MiB sent, {underruns} underruns ***"
+                print(msg.format(**self.proxy.stats()))
+            if self.db.con:
+                self.saveSnapshot()
+                self.db.closeDb()
+            self.root.destroy()
+
+    #---------------------------------------------------------------------#
+
+    def scanDB(self, full=False):
+
+        """Add movies in DB (in background)"""
+
+        print("*** Adding movies in database")
+        self.scanner = Scanner(self.cfg, full, self.events.put)
+        t = Thread(target=self.runScanner, args=(self.scanner,),
+            name="scanner", daemon=True)
+        t.start()
+        self.showScan(True)
+        self.checkEvents()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def runScanner(self, scanner):
+
+        """Scanner thread"""
+
+        try:
+            self.events.put(('done', scanner.run()))
+        except Exception as e:
+            self.events.put(('failed', e))
+
+    #---------------------------------------------------------------------#
+
+    def cancelScan(self):
+
+        """Cancel the running scan"""
+
+        if self.scanner:
+            self.scanner.cancel()
+            self.ui_butcancel.configure(state=DISABLED)
         return(True)
 
     #---------------------------------------------------------------------#
 
-#-------------------------------------------------------------------------#
+    def loadAllMovies(self):
 
-class Db(object):
+        """Load movies from DB (as they are displayed)"""
 
-    """DataBase class"""
+        self.files = DbModel(self.db)
+        return(True)
 
-    def __init__(self, cfg):
+    #---------------------------------------------------------------------#
 
-        """Initialisation of the DB object"""
+    def loadSrcMovies(self, src):
 
-        self.cfg = cfg
-        self.db = "{0}/{1}".format(expanduser('~'), cfg.DB)
-        self.con = None
-        self.cur = None
-        self.new = False
+        """Load movies matching search pattern (False : exact results
+        only, the fuzzy index is not built yet)"""
+
+        rows = []
+        res = True
+        if self.cfg.SEARCH != 'fuzzy' or not self.fuzzy:
+            rows = self.narrowMovies(src)
+            if rows is None:
+                rows = list(self.db.iterMovies(src))
+                self.narrow = (self.db.getGeneration(), src, None, None,
+                    rows)
+        if self.cfg.SEARCH == 'fuzzy' or \
+            (self.cfg.SEARCH == 'auto' and not rows):
+            # Nothing found : maybe a typo
+            if self.fuzzy:
+                rows = self.fuzzy.search(src)
+            else:
+                # Built in background : searched again when done
+                self.log("Indexing the titles for the typo tolerant search...")
+                self.fuzzyWait = src
+                res = False
+        self.files = ListModel(rows)
+        return(res)
 
     #---------------------------------------------------------------------#
 
-    def openDb(self):
+    def narrowMovies(self, src):
+
+        """Filter in memory the results of a previous search extended by
+        src, None if the DB has to be searched"""
+
+        if not self.narrow:
+            return(None)
+        gen, prev, key, keys, rows = self.narrow
+        if gen != self.db.getGeneration() or not src.startswith(prev):
+            return(None)
+        new, terms = self.db.searchFilter(src)
+        if new != key:
+            # First narrowing of these results (or another kind of search)
+            key = new
+            keys = [key(file) for id, file, path in rows]
+        pairs = list(zip(keys, rows))
+        for term in terms:
+            pairs = [p for p in pairs if term in p[0]]
+        keys = [p[0] for p in pairs]
+        rows = [p[1] for p in pairs]
+        self.narrow = (gen, src, key, keys, rows)
+        if DEBUG:
+            print("Narrowed '{0}' to '{1}'".format(prev, src))
+        return(rows)
 
-        """Open the DB"""
+    #---------------------------------------------------------------------#
 
-        print("*** DB - Opening the database ***")
-        new = False
-        if not isfile(self.db):
-            new = True
-        self.con = connect(self.db)
-        self.cur = self.con.cursor()
-        if new:
-            self.createDb()
+    def buildFuzzy(self):
+
+        """(Re)build the fuzzy search index in background"""
+
+        self.fuzzy = None
+        self.fuzzyGen += 1
+        if self.cfg.SEARCH != 'exact':
+            t = Thread(target=self.runFuzzy, args=(self.fuzzyGen,),
+                name="fuzzy", daemon=True)
+            t.start()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def createDb(self):
+    def runFuzzy(self, gen):
 
-        """Create the DB"""
+        """Fuzzy index thread"""
 
-        print("*** DB - Creating the database ***")
-        self.execSql(self.cfg.DBCRT, False)
-        self.commitDb()
+        db = Db(self.cfg)
+        try:
+            db.openDb()
+            index = FuzzyIndex(list(db.iterMovies()))
+            db.closeDb()
+        except Exception as e:
+            error(e)
+            return(False)
+        if gen == self.fuzzyGen:
+            # Still up to date
+            self.fuzzy = index
+            self.events.put(('fuzzy', gen))
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def dropDb(self):
+    def buildTitles(self):
 
-        """Drop the DB"""
+        """Build the titles index (autocomplete) in background"""
 
-        print("*** DB - Dropping the database ***")
-        self.execSql(self.cfg.DBDRP, False)
+        t = Thread(target=self.runTitles, name="titles", daemon=True)
+        t.start()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def initDb(self):
+    def runTitles(self):
 
-        """Initialisation of the DB"""
+        """Titles index thread"""
 
-        print("*** DB - Initializing the database ***")
-        self.dropDb()
-        self.createDb()
+        db = Db(self.cfg)
+        try:
+            db.openDb()
+            gen = db.getGeneration()
+            self.titles = TitleIndex(list(db.iterMovies()), gen)
+            db.closeDb()
+        except Exception as e:
+            error(e)
+            return(False)
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def closeDb(self):
+    def showCompletions(self):
 
-        """Close the DB"""
+        """Show the titles starting with the search under the entry"""
 
-        print("*** DB - Closing the database ***")
-        self.cur.close()
-        self.con.close()
-        self.cur = None
-        self.con = None
+        src = self.ui_srcentry.get()
+        res = []
+        if src and self.titles:
+            self.titles.sync(self.db)
+            res = self.titles.prefix(src)
+        if not res or res == [src]:
+            self.hideCompletions()
+            return(False)
+        self.ui_completions.delete(0, END)
+        self.ui_completions.insert(END, *res)
+        self.ui_completions.configure(height=len(res))
+        x = self.ui_srcentry.winfo_rootx()
+        y = self.ui_srcentry.winfo_rooty() + self.ui_srcentry.winfo_height()
+        self.ui_complete.geometry("+{0}+{1}".format(x, y))
+        self.ui_complete.deiconify()
+        self.ui_complete.lift()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def commitDb(self):
+    def hideCompletions(self):
 
-        """Commit"""
+        """Hide the autocomplete list"""
 
-        print("*** DB - Commiting the database ***")
-        self.con.commit()
+        self.ui_complete.withdraw()
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def execSql(self, sql, bind):
+    def complete(self):
 
-        """Execute a SQL statement in DB"""
+        """Search the selected completion"""
 
-        if sql:
-            if bind:
-                if DEBUG:
-                    print(sql, bind)
-                self.cur.execute(sql, bind)
-            else:
-                if DEBUG:
-                    print(sql)
-                self.cur.execute(sql)
-            return(True)
-        else:
-            return(False)
+        sel = self.ui_completions.curselection()
+        if sel:
+            self.ui_srcentry.delete(0, END)
+            self.ui_srcentry.insert(0, self.ui_completions.get(sel[0]))
+            self.refreshFilesList()
+        self.hideCompletions()
+        self.ui_srcentry.focus_set()
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def getAllMovies(self):
+    def play(self, url, file):
 
-        """Return all movies from DB"""
+        """Play a movie"""
 
-        files = {}
-        self.execSql(self.cfg.DBALL, False)
-        for file, path in self.cur:
-            files[file] = path
-        return(files)
+        print("Playing {}".format(file))
+        sub = None
+        if not url:
+            sub = self.subtitles(file)
+            if sub:
+                sub = self.subs.lookup(sub)
+            copy = self.media.lookup(file)
+            if copy:
+                print("Playing the cached copy")
+                file = copy
+            elif self.proxy:
+                # Read through the local buffer
+                file = self.proxy.url(file)
+        self.backend.load(file, sub)
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def getSrcMovies(self, src):
+    def subtitles(self, file):
 
-        """Return movies from DB with search pattern"""
+        """Return the subtitles file of a movie, None if not found
 
-        files = {}
-        self.execSql(self.cfg.DBSRC, src)
-        for file, path in self.cur:
-            files[file] = path
-        return(files)
+        The subtitles come from the index built by the scan : first the
+        preferred languages, then the subtitles without language."""
+
+        if not (self.db and self.db.con):
+            sub = file.rpartition('.')[0] + ".srt"
+            if isfile(sub):
+                return(sub)
+            return(None)
+        subs = self.db.getSubs(file)
+        for lang in self.cfg.SUBLANG + [None]:
+            for sub in subs:
+                if sub[0] == lang:
+                    return(sub[1])
+        if subs:
+            return(subs[0][1])
+        return(None)
 
     #---------------------------------------------------------------------#
 
-    def addMovie(self, file, filepath):
+    def playList(self, items):
 
-        """Add a movie in DB"""
+        """Play (url, file) items one after the other, or queue them if
+        already playing"""
 
-        self.execSql(self.cfg.DBADD, (file, filepath))
+        self.queue.extend(items)
+        if not self.backend.playing():
+            self.playNext()
         return(True)
 
     #---------------------------------------------------------------------#
 
-#-------------------------------------------------------------------------#
+    def playNext(self):
 
-class Player(object):
+        """Play the next queued item, hide the play screen at the end"""
 
-    """Player class"""
+        if self.playId:
+            # Only one polling loop
+            self.root.after_cancel(self.playId)
+            self.playId = None
+        if not self.queue:
+            self.hidePlayScreen()
+            return(False)
+        url, file = self.queue.pop(0)
+        self.showPlayScreen(file)
+        try:
+            self.play(url, file)
+        except OSError as e:
+            error(e)
+        # Likely next : copy them in the media cache
+        self.media.add([f for u, f in self.queue if not u])
+        if self.queue and not self.queue[0][0] \
+            and not self.media.lookup(self.queue[0][1], False):
+            # Warm the next file while this one plays
+            next = self.queue[0][1]
+            sub = self.subtitles(next)
+            if sub and not self.subs.add([sub]):
+                # Small, read first
+                self.prefetcher.warm([sub, next])
+            else:
+                self.prefetcher.warm([next])
+        else:
+            self.prefetcher.cancel()
+        self.playId = self.root.after(250, self.checkPlay)
+        return(True)
 
-    def __init__(self):
+    #---------------------------------------------------------------------#
 
-        """Initialisation of the Player object"""
+    def checkPlay(self):
 
-        self.cfg = None
-        self.db = None
-        self.root = Tk()
-        self.URL1L = StringVar(master=self.root)
-        self.URL2L = StringVar(master=self.root)
-        self.URL3L = StringVar(master=self.root)
-        self.URL4L = StringVar(master=self.root)
-        self.URL5L = StringVar(master=self.root)
-        self.files = {}
-        self.start()
+        """Wait for the end of the movie without blocking the GUI"""
+
+        if self.backend.playing():
+            if DEBUG:
+                print(self.backend.status())
+            self.playId = self.root.after(250, self.checkPlay)
+        else:
+            self.playId = None
+            self.playNext()
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def start(self):
+    def stopPlay(self):
 
-        """Start the Player"""
+        """Stop playing and empty the queue"""
 
-        print("*** Starting the Player ***")
-        # Configuration
-        self.cfg = Config()
-        while not self.cfg.readConf() or not self.cfg.checkConf():
-            self.displayConfig()
-        if self.cfg.readConf() and self.cfg.checkConf():
-            # Database
-            self.db = Db(self.cfg)
-            if self.db.openDb():
-                self.display()
-                return(True)
-            else:
-                error("Database not open")
-                return(False)
-        else:
-            error("Cannot read configuration file")
-            return(False)
+        self.queue = []
+        self.prefetcher.cancel()
+        if self.backend.playing():
+            print("*** Stopping playback ***")
+            self.backend.stop()
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def stop(self):
+    def seekPlay(self, seconds):
 
-        """Stop the Player"""
+        """Seek in the movie playing"""
 
-        msg = "Do you want to quit Raspyplayer ?"
-        if messagebox.askokcancel("Raspyplayer MC", msg):
-            print("*** Stopping the Player ***")
-            self.db.closeDb()
-            self.root.destroy()
+        self.backend.seek(seconds)
+        return(True)
 
     #---------------------------------------------------------------------#
 
-    def scanDB(self):
+    def showPlayScreen(self, file):
 
-        """Add movies in DB"""
+        """Display the black play screen"""
 
-        print("*** Adding movies in database")
-        self.db.initDb()
-        scanFiles(self.db, self.cfg, self.cfg.PATH)
-        self.db.commitDb()
+        text = "Playing {0}...".format(basename(file))
+        if self.db and self.db.con:
+            info = self.db.getProbe(file)
+            if info:
+                text += "\n" + probeText(info)
+        self.ui_playlbl.configure(text=text)
+        self.ui_play.deiconify()
+        self.ui_play.focus_set()
+        self.ui_play.update_idletasks()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def loadAllMovies(self):
+    def showRows(self, rows, active):
 
-        """Load movies from DB"""
+        """Load the thumbnails of the rows displayed, show the active one"""
 
-        self.files = self.db.getAllMovies()
+        if not self.thumbs:
+            return(False)
+        paths = [row[2] for row in rows]
+        self.thumbs.want(paths)
+        self.thumbPath = None
+        if 0 <= active < len(paths):
+            self.thumbPath = paths[active]
+        self.showThumb()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def loadSrcMovies(self, src):
+    def showThumb(self):
 
-        """Load movies matching search pattern"""
+        """Display the thumbnail of the active row (if loaded)"""
 
-        self.files = self.db.getSrcMovies(src)
+        image = None
+        if self.thumbPath:
+            image = self.thumbs.image(self.thumbPath)
+        self.ui_thumb.configure(image=image or "")
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def play(self, url, file):
+    def hidePlayScreen(self):
 
-        """Play a movie"""
+        """Hide the play screen"""
 
-        print("Playing {}".format(file))
-        if self.cfg.useOmx():
-            if not url:
-                sub = file[0:-3] + "srt"
-                if isfile(sub):
-                    cmd = self.cfg.OMXCMD2.format(self.cfg.OPT, self.cfg.OUT, sub, file)
-                else:
-                    cmd = self.cfg.OMXCMD1.format(self.cfg.OPT, self.cfg.OUT, file)
-            else:
-                cmd = self.cfg.OMXCMD1.format(self.cfg.OPT, self.cfg.OUT, file)
-        else:
-            cmd = self.cfg.MPLRCMD.format(file)
-        if DEBUG:
-            print(cmd)
-        system(cmd)
+        self.ui_play.withdraw()
         return(True)
 
     #---------------------------------------------------------------------#
@@ -937,9 +6412,7 @@ class Player(object):
         """Direct play a file"""
         file = askopenfilename(title="Select a movie")
         if file:
-            ps = playScreen()
-            self.play(False, file)
-            ps.destroy()
+            self.playList([(False, file)])
         return(True)
         
     #---------------------------------------------------------------------#
@@ -958,6 +6431,10 @@ class Player(object):
         """Display Config Window"""
 
         self.cfg.display(self)
+        if self.watcher:
+            # Settings may have changed
+            self.watcher.stop()
+            self.startWatcher()
         self.askToRefreshDataBase()
         return(True)
 
@@ -967,12 +6444,8 @@ class Player(object):
 
         """Play selected files"""
 
-        sel = self.ui_files.curselection()
-        ps = playScreen()
-        for i in sel:
-            f = self.ui_files.get(i)
-            self.play(False, self.files[f])
-        ps.destroy()
+        sel = self.ui_files.selectedRows()
+        self.playList([(False, path) for id, file, path in sel])
         return(True)
 
     #---------------------------------------------------------------------#
@@ -981,9 +6454,7 @@ class Player(object):
 
         """Play selected url"""
 
-        ps = playScreen()
-        self.play(True, url)
-        ps.destroy()
+        self.playList([(True, url)])
         return(True)
 
     #---------------------------------------------------------------------#
@@ -992,63 +6463,322 @@ class Player(object):
 
         """Display the player"""
 
-        self.createGui()
         self.cfg.toggleUrl(self)
-        self.askToRefreshDataBase()
+        if self.loadSnapshot():
+            self.root.update()
+            print("*** First list displayed in {0:.3f} s (snapshot) ***".format(
+                time() - self.started))
+        self.root.after_idle(self.startDb)
         self.root.mainloop()
 
     #---------------------------------------------------------------------#
 
-    def askToRefreshDataBase(self):
+    def startDb(self):
+
+        """Open (and migrate) the DB in background, dbReady follows"""
+
+        t = Thread(target=self.prepareDb, name="open-db", daemon=True)
+        t.start()
+        self.checkEvents()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def prepareDb(self):
+
+        """Thread opening the DB : tuning, migrations, subtitles list"""
+
+        db = Db(self.cfg)
+        try:
+            if not db.openDb():
+                self.events.put(('db', False, []))
+                return(False)
+            subs = db.getAllSubs()
+            db.closeDb()
+        except Exception as e:
+            error(e)
+            self.events.put(('db', False, []))
+            return(False)
+        self.events.put(('db', True, subs))
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def dbReady(self, ok, subs):
+
+        """Start the work depending on the DB (once prepareDb is done)"""
+
+        # Migrated already : opening is quick
+        if not ok or not self.db.openDb():
+            error("Database not open")
+            self.log("Database not open")
+            return(False)
+        self.refreshFilesList(True)
+        print("*** Library displayed in {0:.3f} s ***".format(
+            time() - self.started))
+        self.startWatcher()
+        self.buildFuzzy()
+        self.buildTitles()
+        self.warmBackend()
+        self.subs.add(subs)
+        self.prober.start()
+        if self.cfg.RESCAN == 'auto':
+            # Not from checkEvents : scanDB restarts it
+            self.root.after_idle(self.refreshDataBase)
+        elif self.cfg.RESCAN == 'ask':
+            self.log("Press <F5> or Scan to refresh the movies database")
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def warmBackend(self):
+
+        """Start the player process now rather than for the first movie"""
+
+        try:
+            self.backend.start()
+        except OSError as e:
+            error(e)
+            return(False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def loadSnapshot(self):
+
+        """Display the first rows of the list saved by saveSnapshot"""
+
+        rows = []
+        try:
+            f = open(self.snapshotPath(), 'r')
+            for l in f.readlines():
+                l = l.replace("\n", "").split("\t")
+                if len(l) == 3:
+                    rows.append((str2int(l[0], 0), l[1], l[2]))
+            f.close()
+        except OSError:
+            return(False)
+        self.files = ListModel(rows)
+        self.ui_files.setModel(self.files)
+        return(len(rows) > 0)
+
+    #---------------------------------------------------------------------#
+
+    def saveSnapshot(self, n=100):
+
+        """Save the first n rows of the list, for the next start"""
+
+        try:
+            rows, next = self.db.getMoviesPage(None, None, n)
+            f = open(self.snapshotPath(), 'w')
+            for id, file, path in rows:
+                if not "\n" in path and not "\t" in path:
+                    f.write("{0}\t{1}\t{2}\n".format(id, file, path))
+            f.close()
+        except (OSError, OperationalError) as e:
+            error(e)
+            return(False)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def snapshotPath(self):
+
+        """Return the path of the list snapshot"""
+
+        return("{0}.list".format(self.db.db))
+
+    #---------------------------------------------------------------------#
+
+    def startWatcher(self):
+
+        """Start the library watcher (if enabled)"""
+
+        self.watcher = Watcher(self.cfg, self.watchNotify)
+        if not self.watcher.start():
+            self.watcher = None
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def watchNotify(self, n):
+
+        """Called by the watcher thread when rows changed"""
+
+        self.events.put(('watch', n))
+
+    #---------------------------------------------------------------------#
+
+    def checkEvents(self):
+
+        """Handle the events sent by the scanner, the watcher and the
+        background threads"""
+
+        if self.afterId:
+            self.root.after_cancel(self.afterId)
+        n = 0
+        while not self.events.empty():
+            evt = self.events.get()
+            if evt[0] == 'watch':
+                n += evt[1]
+            elif evt[0] == 'scan':
+                msg = "Scanning : {0} files ({1:.0f}/s) - {2}"
+                self.log(msg.format(evt[1], evt[2], evt[3] or ""))
+            elif evt[0] == 'done':
+                self.scanDone(evt[1])
+                n += evt[1]['added'] + evt[1]['changed'] + evt[1]['removed']
+                n += evt[1]['moved']
+            elif evt[0] == 'db':
+                self.dbReady(evt[1], evt[2])
+            elif evt[0] == 'fuzzy':
+                if self.fuzzyWait and self.fuzzyWait == self.shownSrc:
+                    # Search waiting for the index
+                    self.refreshFilesList()
+                self.fuzzyWait = None
+            elif evt[0] == 'thumb':
+                self.thumbs.keep(evt[1], evt[2])
+                if evt[1] == self.thumbPath:
+                    self.showThumb()
+            elif evt[0] == 'failed':
+                error(evt[1])
+                self.scanner = None
+                self.showScan(False)
+                self.log("Scan failed : {0}".format(evt[1]))
+        if n:
+            if DEBUG:
+                print("{0} rows changed".format(n))
+            self.buildFuzzy()
+            if self.titles:
+                self.titles.sync(self.db)
+            self.refreshFilesList(True)
+        if self.scanner or self.thumbs.pending() or not self.db.con \
+            or self.fuzzyWait:
+            self.afterId = self.root.after(200, self.checkEvents)
+        else:
+            self.afterId = self.root.after(1000, self.checkEvents)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def scanDone(self, res):
+
+        """End of a scan"""
+
+        self.scanner = None
+        self.showScan(False)
+        if res['cancelled']:
+            msg = "Scan cancelled"
+        else:
+            msg = "Scan done : {added} added, {changed} changed, "
+            msg += "{removed} removed, {moved} moved"
+            msg = msg.format(**res)
+        print("*** {0} ***".format(msg))
+        self.log(msg)
+        if not res['cancelled']:
+            self.saveSnapshot()
+            self.subs.add(self.db.getAllSubs())
+            self.prober.start()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def showScan(self, scanning):
+
+        """Toggle the widgets while scanning"""
+
+        if scanning:
+            self.ui_butscan.configure(state=DISABLED)
+            self.ui_butcancel.configure(state=NORMAL)
+            self.ui_butcancel.grid()
+        else:
+            self.ui_butscan.configure(state=NORMAL)
+            self.ui_butcancel.grid_remove()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def log(self, msg):
+
+        """Display a message in the status bar"""
+
+        self.ui_status.configure(text=msg)
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def askToRefreshDataBase(self, full=False):
 
         """Ask to refresh database"""
 
-        msg = "Do you want to refresh the movies database ?"
+        if full:
+            msg = "Do you want to rebuild the whole movies database ?"
+        else:
+            msg = "Do you want to refresh the movies database ?"
         if messagebox.askokcancel("Raspyplayer MC", msg):
-            self.refreshDataBase()
+            self.refreshDataBase(full)
         else:
             self.refreshFilesList()
         return(True)
 
     #---------------------------------------------------------------------#
 
-    def refreshDataBase(self):
+    def refreshDataBase(self, full=False):
 
         """Refresh the movies database"""
 
+        if self.scanner or not self.db.con:
+            # Already scanning or DB not open yet
+            return(False)
         if isdir(self.cfg.PATH):
-            self.scanDB()
-            self.refreshFilesList()
+            self.scanDB(full)
             return(True)
 
     #---------------------------------------------------------------------#
 
-    def refreshFilesList(self):
+    def typeDone(self):
+
+        """Refresh the list of files if the search has been modified"""
+
+        self.typeId = None
+        if self.ui_srcentry.get() != self.shownSrc:
+            self.refreshFilesList()
+            self.showCompletions()
+        return(True)
+
+    #---------------------------------------------------------------------#
+
+    def refreshFilesList(self, keep=False):
 
-        """Refresh the list of files"""
+        """Refresh the list of files (keeping the position if keep)"""
 
+        if not self.db.con:
+            # Not open yet
+            return(False)
         src = self.ui_srcentry.get()
-        # Empty variables :
-        self.files = {}
-        if self.ui_files.size() > 0:
-            self.ui_files.delete(0, END)
-        # Get files in DB :
-        if src == "" or src == "*":
+        self.shownSrc = src
+        # Get files in cache or DB :
+        if src == "*":
+            src = ""
+        if src == "":
+            # Read from the DB as displayed, no need to cache
             if DEBUG:
                 print("Get ALL")
             self.loadAllMovies()
         else:
-            if DEBUG:
-                print("Get '{}'".format(src))
-            self.loadSrcMovies(('%'+src+'%',))
-        # Sort results :
-        liste = list()
-        for f, p in self.files.items():
-            liste.append(f)
-        liste.sort(key=str.lower)
-        # Display result :
-        for file in liste:
-            self.ui_files.insert(END, file)
+            gen = self.db.getGeneration()
+            key = (self.cfg.SEARCH, src)
+            rows = self.cache.get(key, gen)
+            if rows is not None:
+                if DEBUG:
+                    print("Cached '{}'".format(src))
+                self.files = ListModel(rows)
+            else:
+                if DEBUG:
+                    print("Get '{}'".format(src))
+                if self.loadSrcMovies(src):
+                    self.cache.put(key, gen, self.files.data)
+        # Display result (already sorted by the DB) :
+        self.ui_files.setModel(self.files, keep)
         return(True)
 
     #---------------------------------------------------------------------#
@@ -1085,15 +6815,45 @@ class Player(object):
 
     #---------------------------------------------------------------------#
 
-    def evtPlay(self, evt):
-        self.playSelection()
-
     def evtRefresh(self, evt):
+        self.hideCompletions()
         self.refreshFilesList()
 
+    def evtType(self, evt):
+        # Search when the user stops typing
+        if evt.keysym in ["Return", "Escape", "Up", "Down"]:
+            return
+        if self.typeId:
+            self.root.after_cancel(self.typeId)
+        self.typeId = self.root.after(self.cfg.SRCDELAY, self.typeDone)
+
+    def evtComplete(self, evt):
+        self.complete()
+
+    def evtShowComplete(self, evt):
+        # Down from the entry goes to the autocomplete list
+        if self.ui_complete.winfo_viewable():
+            self.ui_completions.focus_set()
+            self.ui_completions.selection_set(0)
+            self.ui_completions.activate(0)
+
+    def evtHideComplete(self, evt):
+        self.hideCompletions()
+        self.ui_srcentry.focus_set()
+
+    def evtStop(self, evt):
+        self.stopPlay()
+
+    def evtCache(self, evt):
+        self.media.add([path for id, file, path in
+            self.ui_files.selectedRows()])
+
     def evtScan(self, evt):
         self.askToRefreshDataBase()
 
+    def evtFullScan(self, evt):
+        self.askToRefreshDataBase(True)
+
     def evtCfg(self, cfg):
         self.displayConfig()
 
@@ -1126,6 +6886,18 @@ class Player(object):
         self.ui_srcentry = Entry(self.ui_topframe, font=font)
         self.ui_srcentry.grid(row=1, column=1, padx=2, pady=2)
         self.ui_srcentry.bind("<Return>", self.evtRefresh)
+        self.ui_srcentry.bind("<KeyRelease>", self.evtType)
+        self.ui_srcentry.bind("<Down>", self.evtShowComplete)
+        self.ui_srcentry.bind("<Escape>", self.evtHideComplete)
+        # Autocomplete list (under the search entry)
+        self.ui_complete = Toplevel(self.root)
+        self.ui_complete.overrideredirect(True)
+        self.ui_complete.withdraw()
+        self.ui_completions = Listbox(self.ui_complete, font=font, width=0)
+        self.ui_completions.pack(fill=BOTH, expand=1)
+        self.ui_completions.bind("<Return>", self.evtComplete)
+        self.ui_completions.bind("<ButtonRelease-1>", self.evtComplete)
+        self.ui_completions.bind("<Escape>", self.evtHideComplete)
         # Button search
         self.ui_srcexec = Button(self.ui_topframe, text="Search",
             command=self.refreshFilesList, font=font)
@@ -1138,15 +6910,10 @@ class Player(object):
         # Middle Frame (files group)
         self.ui_midframe = Frame(self.ui_frame, borderwidth=2)
         self.ui_midframe.pack({"side": "left"}, fill=BOTH, expand=1)
-        # Files liste and scrollbar
-        self.ui_files = Listbox(self.ui_midframe,
-            selectmode=EXTENDED, font=font)
-        self.ui_files.pack(side=LEFT, fill=BOTH, expand=1)
-        self.ui_files.bind("<Return>", self.evtPlay)
-        self.ui_filesscroll = Scrollbar(self.ui_midframe,
-            command=self.ui_files.yview)
-        self.ui_files.configure(yscrollcommand=self.ui_filesscroll.set)
-        self.ui_filesscroll.pack(side=RIGHT, fill=Y)
+        # Files liste (only the visible rows are in the Listbox)
+        self.ui_files = VirtualList(self.ui_midframe, font,
+            self.playSelection, self.showRows)
+        self.ui_files.pack(fill=BOTH, expand=1)
 
         # Url Frame (url group)
         self.ui_urlframe = Frame(self.ui_frame, borderwidth=2)
@@ -1171,6 +6938,9 @@ class Player(object):
         self.ui_buturl5 = Button(self.ui_urlframe, textvariable=self.URL5L,
             command=self.playUrl5, font=font)
         self.ui_buturl5.grid(row=5, column=0, padx=2, pady=2)
+        # Thumbnail of the active movie
+        self.ui_thumb = Label(self.ui_urlframe)
+        self.ui_thumb.grid(row=6, column=0, padx=2, pady=2)
 
         # Bottom Frame (buttons group)
         self.ui_botframe = Frame(self.root, borderwidth=2)
@@ -1200,11 +6970,44 @@ class Player(object):
             command=self.stop, font=font)
         self.ui_butquit.grid(row=1, column=5, padx=2, pady=2)
 
+        # Status Frame (scan progress)
+        self.ui_statframe = Frame(self.root, borderwidth=2)
+        self.ui_statframe.pack({"side": "bottom"}, fill=BOTH)
+        # Button Cancel
+        self.ui_butcancel = Button(self.ui_statframe, text="Cancel",
+            command=self.cancelScan, font=font)
+        self.ui_butcancel.grid(row=1, column=0, padx=2, pady=2)
+        self.ui_butcancel.grid_remove()
+        # Label status
+        self.ui_status = Label(self.ui_statframe, justify=LEFT, anchor=W,
+            font=Font(self.root, size=12, family='Sans'))
+        self.ui_status.grid(row=1, column=1, padx=2, pady=2)
+
+        # Play screen (black, reused for every movie)
+        self.ui_play = Toplevel(self.root)
+        self.ui_play.title("Playing...")
+        self.ui_play.attributes('-fullscreen', True)
+        self.ui_play.configure(bg='black')
+        self.ui_playlbl = Label(self.ui_play, text="Playing...", bg='black',
+            fg='grey')
+        self.ui_playlbl.pack()
+        self.ui_play.bind("<Escape>", self.evtStop)
+        self.ui_play.bind("<F4>", self.evtStop)
+        self.ui_play.bind("<Right>", lambda e: self.seekPlay(30))
+        self.ui_play.bind("<Left>", lambda e: self.seekPlay(-30))
+        self.ui_play.bind("<Up>", lambda e: self.seekPlay(600))
+        self.ui_play.bind("<Down>", lambda e: self.seekPlay(-600))
+        self.ui_play.protocol("WM_DELETE_WINDOW", self.stopPlay)
+        self.ui_play.withdraw()
+
         # General bindings
         self.root.bind("<F1>", self.evtHelp)
         self.root.bind("<F2>", self.evtCfg)
         self.root.bind("<F3>", self.evtRefresh)
+        self.root.bind("<F4>", self.evtStop)
+        self.root.bind("<F6>", self.evtCache)
         self.root.bind("<F5>", self.evtScan)
+        self.root.bind("<Shift-F5>", self.evtFullScan)
         self.root.bind("<F12>", self.evtQuit)
         return(True)
 
@@ -1216,7 +7019,14 @@ class Player(object):
 # MAIN PROGRAM
 #-------------------------------------------------------------------------#
 
-player = Player()
+# The prober worker processes may import this file : only run as a script
+if __name__ == "__main__":
+    if len(argv) > 1 and argv[1] == "--bench-db":
+        benchDb(str2int(lst2str(argv[2:3]), 50000))
+    elif len(argv) > 1 and argv[1] == "--duplicates":
+        duplicates()
+    else:
+        player = Player()
 
 #-------------------------------------------------------------------------#
 # EOF
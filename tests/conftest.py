@@ -0,0 +1,56 @@
+#-------------------------------------------------------------------------#
+# conftest.py - Fixtures of the raspyplayer-mc tests.
+#-------------------------------------------------------------------------#
+
+import importlib
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src", "raspyplayer-mc.py")
+
+
+@pytest.fixture(scope="session")
+def rp(tmp_path_factory):
+
+    """The raspyplayer-mc module (the main program is not run)
+
+    It is imported as raspyplayer_mc through a link, so the processes of
+    the probe pool can import it too."""
+
+    path = tmp_path_factory.mktemp("src")
+    os.symlink(os.path.abspath(SRC), str(path / "raspyplayer_mc.py"))
+    sys.path.insert(0, str(path))
+    return(importlib.import_module("raspyplayer_mc"))
+
+
+@pytest.fixture
+def lib(tmp_path, monkeypatch):
+
+    """An empty movies root folder, with HOME (conf and DB) next to it"""
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    path = tmp_path / "lib"
+    path.mkdir()
+    return(path)
+
+
+@pytest.fixture
+def cfg(rp, lib):
+
+    """A config on the lib folder"""
+
+    cfg = rp.Config()
+    cfg.PATH = str(lib)
+    cfg.defaultValues()
+    return(cfg)
+
+
+def touch(path, data=b"1"):
+
+    """Create path (and its folders) with data"""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return(path)
@@ -0,0 +1,91 @@
+#-------------------------------------------------------------------------#
+# test_backends.py - Tests of the player backends.
+#-------------------------------------------------------------------------#
+
+import os
+import sys
+import time
+
+import pytest
+
+# mplayer -slave -idle as seen on its output : a file loaded while another
+# plays ends the latter (EOF) before it opens (0.3 s) and starts.
+FAKE_MPLAYER = """#!{0}
+import sys, threading, time
+lock = threading.Lock()
+playing = [0]
+def end(n):
+    time.sleep(0.6)
+    with lock:
+        if playing[0] == n:
+            playing[0] = 0
+            print("EOF code: 1", flush=True)
+loads = 0
+for line in sys.stdin:
+    if line.startswith("loadfile"):
+        loads += 1
+        with lock:
+            if playing[0]:
+                playing[0] = 0
+                print("EOF code: 1", flush=True)
+        time.sleep(0.3)
+        with lock:
+            playing[0] = loads
+            print("Starting playback...", flush=True)
+        threading.Thread(target=end, args=(loads,), daemon=True).start()
+    elif line.startswith("stop"):
+        with lock:
+            if playing[0]:
+                playing[0] = 0
+                print("EOF code: 4", flush=True)
+    elif line.startswith("quit"):
+        break
+"""
+
+
+@pytest.fixture
+def mplayer(rp, cfg, tmp_path, monkeypatch):
+    bin = tmp_path / "bin"
+    bin.mkdir()
+    path = bin / "mplayer"
+    path.write_text(FAKE_MPLAYER.format(sys.executable))
+    path.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin) + os.pathsep + os.environ["PATH"])
+    cfg.PLAYER = 'mplayer'
+    backend = rp.newBackend(cfg)
+    backend.start()
+    yield backend
+    backend.close()
+
+
+def wait(backend, playing, timeout=5):
+    deadline = time.time() + timeout
+    while backend.playing() != playing and time.time() < deadline:
+        time.sleep(0.02)
+    return(backend.playing() == playing)
+
+
+def test_mplayer_replaced_file(mplayer):
+    mplayer.load("/m/a.mkv")
+    assert mplayer.playing()
+    time.sleep(0.4)
+    assert mplayer.state == 'playing'
+    # The EOF of a.mkv must not end b.mkv
+    mplayer.load("/m/b.mkv")
+    for i in range(10):
+        assert mplayer.playing()
+        time.sleep(0.05)
+    assert mplayer.state == 'playing'
+    assert wait(mplayer, False)
+    assert mplayer.file == "/m/b.mkv"
+
+
+def test_mplayer_stop(mplayer):
+    mplayer.load("/m/a.mkv")
+    time.sleep(0.4)
+    mplayer.stop()
+    assert not mplayer.playing()
+    mplayer.load("/m/b.mkv")
+    time.sleep(0.4)
+    assert mplayer.state == 'playing'
+    assert wait(mplayer, False)
@@ -0,0 +1,153 @@
+#-------------------------------------------------------------------------#
+# test_db.py - Tests of the Db class.
+#-------------------------------------------------------------------------#
+
+import sqlite3
+
+import pytest
+
+from conftest import touch
+
+
+def movies(db):
+    return(sorted([row[1] for row in db.iterMovies()]))
+
+
+def test_migration_from_files_table(rp, cfg, lib, tmp_path):
+    touch(lib / "a" / "Kept.avi")
+    con = sqlite3.connect(str(tmp_path / ".raspyplayer.sqlite3"))
+    con.execute("CREATE TABLE files (file, path)")
+    con.execute("INSERT INTO files VALUES (?, ?)",
+        ("Kept.avi", str(lib / "a" / "Kept.avi")))
+    con.execute("INSERT INTO files VALUES (?, ?)",
+        ("Kept.avi", str(lib / "a" / "Kept.avi")))
+    con.execute("INSERT INTO files VALUES (?, ?)", ("Gone.avi", "/nope/Gone.avi"))
+    con.commit()
+    con.close()
+    db = rp.Db(cfg)
+    assert db.openDb()
+    db.execSql("PRAGMA user_version", False)
+    assert db.cur.fetchone()[0] == cfg.DBVERSION
+    # Duplicated rows of the old table are merged
+    assert movies(db) == ["Gone.avi", "Kept.avi"]
+    db.closeDb()
+    report = rp.Scanner(cfg).run()
+    assert report['removed'] == 1
+    db.openDb()
+    assert movies(db) == ["Kept.avi"]
+    db.closeDb()
+
+
+def test_keyset_pagination(rp, cfg, lib):
+    # Same file name in several folders : the id breaks the ties
+    for i in range(7):
+        touch(lib / str(i) / "Same.avi")
+        touch(lib / str(i) / "Movie {0}.mkv".format(i))
+    rp.Scanner(cfg).run()
+    db = rp.Db(cfg)
+    db.openDb()
+    rows = []
+    after = None
+    pages = 0
+    while True:
+        page, after = db.getMoviesPage(None, after, 3)
+        rows.extend(page)
+        pages += 1
+        if not after:
+            break
+    assert pages == 5
+    assert len(rows) == 14
+    assert len(set([row[0] for row in rows])) == 14
+    assert [row[1] for row in rows] == sorted([row[1] for row in rows])
+    model = rp.DbModel(db, page=4, pages=2)
+    assert model.count() == 14
+    assert model.rows(0, 14) == rows
+    # Back to a page dropped from the cache
+    assert model.rows(1, 2) == rows[1:3]
+    assert model.rows(12, 5) == rows[12:]
+    db.closeDb()
+
+
+def test_subs_folder(rp, cfg, lib):
+    touch(lib / "One" / "One.mkv")
+    touch(lib / "One" / "One.fr.srt")
+    touch(lib / "One" / "Subs" / "2_English.srt")
+    touch(lib / "One" / "Subs" / "One.de.srt")
+    touch(lib / "Two" / "A.mkv")
+    touch(lib / "Two" / "B.mkv")
+    touch(lib / "Two" / "Subs" / "A.en.srt")
+    touch(lib / "Two" / "Subs" / "3_French.srt")
+    rp.Scanner(cfg).run()
+    db = rp.Db(cfg)
+    db.openDb()
+    assert db.getSubs(str(lib / "One" / "One.mkv")) == [
+        ("fr", str(lib / "One" / "One.fr.srt")),
+        (None, str(lib / "One" / "Subs" / "2_English.srt")),
+        ("de", str(lib / "One" / "Subs" / "One.de.srt"))]
+    # Several movies : only the subtitles named after the movie
+    assert db.getSubs(str(lib / "Two" / "A.mkv")) == [
+        ("en", str(lib / "Two" / "Subs" / "A.en.srt"))]
+    assert db.getSubs(str(lib / "Two" / "B.mkv")) == []
+    db.closeDb()
+
+
+def test_search(rp, cfg, lib):
+    for i in range(9):
+        touch(lib / str(i % 2) / "The.Movie.{0}.2014.mkv".format(i))
+    touch(lib / "Other.avi")
+    rp.Scanner(cfg).run()
+    db = rp.Db(cfg)
+    db.openDb()
+    for src in ["movie 2014", "Movie.1", "Movie.3"]:
+        rows = list(db.iterMovies(src, page=2))
+        pages = []
+        after = None
+        while True:
+            page, after = db.getMoviesPage(src, after, 2)
+            pages.extend(page)
+            if not after:
+                break
+        assert rows == pages
+    assert len(list(db.iterMovies("movie 2014"))) == 9
+    assert [row[1] for row in db.iterMovies("movie 3")] == ["The.Movie.3.2014.mkv"]
+    # Without FTS5 : anywhere in the file name
+    db.fts = False
+    assert [row[1] for row in db.iterMovies("vie.3")] == ["The.Movie.3.2014.mkv"]
+    db.closeDb()
+
+
+def test_migration_steps(rp, cfg, tmp_path):
+    con = sqlite3.connect(str(tmp_path / ".raspyplayer.sqlite3"))
+    con.execute("CREATE TABLE files (file, path)")
+    con.execute("INSERT INTO files VALUES (?, ?)", ("A.avi", "/m/A.avi"))
+    con.commit()
+    db = rp.Db(cfg)
+    db.con = con
+    db.cur = con.cursor()
+    # Step 0 -> 1 makes the version 1 schema only
+    db.migrateDb0()
+    db.execSql("SELECT name FROM sqlite_master WHERE type = 'table'", False)
+    assert sorted([row[0] for row in db.cur.fetchall()]) == ["dirs", "files",
+        "meta"]
+    db.execSql("PRAGMA user_version", False)
+    assert db.cur.fetchone()[0] == 0
+    con.rollback()
+    con.close()
+    assert db.openDb()
+    assert [row[1] for row in db.iterMovies("a")] == ["A.avi"]
+    db.closeDb()
+
+
+def test_add_movies_failure(rp, cfg, lib):
+    db = rp.Db(cfg)
+    db.openDb()
+    db.touchDir("/m")
+    rows = [("A.avi", "/m/A.avi", 1, 1.0), ("B.avi", "/m/B.avi", 1, 1.0)]
+    db.addMovies(rows)
+    # UNIQUE (dir, file) : nothing added, nothing left for the next call
+    with pytest.raises(sqlite3.IntegrityError):
+        db.addMovies(rows)
+    db.addMovies([("C.avi", "/m/C.avi", 1, 1.0)])
+    db.commitDb()
+    assert movies(db) == ["A.avi", "B.avi", "C.avi"]
+    db.closeDb()
@@ -0,0 +1,132 @@
+#-------------------------------------------------------------------------#
+# test_gui.py - Tests of the GUI logic (without a display).
+#-------------------------------------------------------------------------#
+
+import pytest
+
+
+class FakeListbox(object):
+
+    """The Listbox methods used by VirtualList"""
+
+    def __init__(self):
+        self.items = []
+        self.selected = set()
+
+    def delete(self, first, last):
+        self.items = []
+        self.selected = set()
+
+    def insert(self, index, *items):
+        self.items.extend(items)
+
+    def selection_set(self, j):
+        self.selected.add(j)
+
+    def activate(self, j):
+        pass
+
+    def nearest(self, y):
+        return(min(y // 10, len(self.items) - 1))
+
+    def focus_set(self):
+        pass
+
+
+class FakeScrollbar(object):
+
+    def set(self, first, last):
+        pass
+
+
+@pytest.fixture
+def vlist(rp):
+    vlist = rp.VirtualList.__new__(rp.VirtualList)
+    vlist.ui_list = FakeListbox()
+    vlist.ui_scroll = FakeScrollbar()
+    vlist.model = rp.ListModel([])
+    vlist.command = None
+    vlist.shown = None
+    vlist.top = 0
+    vlist.height = 10
+    vlist.active = 0
+    vlist.anchor = 0
+    vlist.selection = set()
+    return(vlist)
+
+
+def rows(n, name):
+    return([(i, "{0}{1}.avi".format(name, i), "/m/{0}{1}.avi".format(name, i))
+        for i in range(n)])
+
+
+def test_new_model_clears_selection(rp, vlist):
+    vlist.setModel(rp.ListModel(rows(50, "a")))
+    vlist.click(15, None)
+    vlist.move(2, True)
+    assert [r[1] for r in vlist.selectedRows()] == ["a1.avi", "a2.avi",
+        "a3.avi"]
+    # Refresh of the same list : the selection stays
+    vlist.setModel(rp.ListModel(rows(50, "a")), True)
+    assert len(vlist.selectedRows()) == 3
+    assert vlist.ui_list.selected == set([1, 2, 3])
+    # New search : nothing selected
+    vlist.setModel(rp.ListModel(rows(50, "b")))
+    assert vlist.selectedRows() == []
+    assert vlist.ui_list.selected == set()
+
+
+def test_db_prepared_in_background(rp, cfg, lib, tmp_path):
+    import queue
+    import sqlite3
+    (lib / "Subs").mkdir()
+    (lib / "Subs" / "A.en.srt").write_bytes(b"1")
+    rp.Scanner(cfg).run()
+    con = sqlite3.connect(str(tmp_path / cfg.DB))
+    con.execute("PRAGMA user_version = 3")
+    con.execute("DROP TABLE probes")
+    con.commit()
+    con.close()
+    player = rp.Player.__new__(rp.Player)
+    player.cfg = cfg
+    player.events = queue.Queue()
+    player.db = rp.Db(cfg)
+    player.prepareDb()
+    # Migrated and closed by the thread, the GUI opens it on the event
+    assert player.events.get_nowait() == ('db', True,
+        [str(lib / "Subs" / "A.en.srt")])
+    assert player.db.con is None
+    db = rp.Db(cfg)
+    db.openDb()
+    db.execSql("PRAGMA user_version", False)
+    assert db.cur.fetchone()[0] == cfg.DBVERSION
+    db.closeDb()
+
+
+def test_fuzzy_index_not_built_inline(rp, cfg, lib):
+    import queue
+    (lib / "The.Matrix.1999.mkv").write_bytes(b"1")
+    (lib / "Alien.avi").write_bytes(b"1")
+    rp.Scanner(cfg).run()
+    player = rp.Player.__new__(rp.Player)
+    player.cfg = cfg
+    player.events = queue.Queue()
+    player.db = rp.Db(cfg)
+    player.db.openDb()
+    player.fuzzy = None
+    player.fuzzyGen = 1
+    player.fuzzyWait = None
+    player.narrow = None
+    logs = []
+    player.log = logs.append
+    # Typo before the index is built : exact results, nothing built
+    assert not player.loadSrcMovies("matirx")
+    assert player.files.count() == 0
+    assert player.fuzzy is None
+    assert player.fuzzyWait == "matirx"
+    assert len(logs) == 1
+    player.runFuzzy(1)
+    assert player.events.get_nowait() == ('fuzzy', 1)
+    assert player.loadSrcMovies("matirx")
+    assert [r[1] for r in player.files.rows(0, 5)] == ["The.Matrix.1999.mkv"]
+    player.db.closeDb()
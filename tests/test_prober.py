@@ -0,0 +1,40 @@
+#-------------------------------------------------------------------------#
+# test_prober.py - Tests of the Prober class.
+#-------------------------------------------------------------------------#
+
+import os
+
+from conftest import touch
+
+
+def test_stub_probe(rp, cfg, lib):
+    cfg.PROBE = 'stub'
+    cfg.PROBEJOBS = 2
+    for i in range(5):
+        touch(lib / "Movie {0}.mkv".format(i), b"1" * (1000 * (i + 1)))
+    touch(lib / "Other.avi", b"1" * 3000)
+    rp.Scanner(cfg).run()
+    prober = rp.Prober(cfg)
+    prober.probeAll()
+    assert (prober.probed, prober.failed) == (6, 0)
+    db = rp.Db(cfg)
+    db.openDb()
+    info = db.getProbe(str(lib / "Movie 2.mkv"))
+    assert info['duration'] == 3
+    assert info['container'] == 'mkv'
+    assert (info['vcodec'], info['width'], info['height']) == ('stub', 1920, 1080)
+    assert info['audio'] == ['stub:und']
+    assert db.getProbe(str(lib / "Other.avi"))['container'] == 'avi'
+    assert db.getProbeTodo() == []
+    db.closeDb()
+    # Only the movies changed are probed again
+    path = str(lib / "Movie 0.mkv")
+    touch(lib / "Movie 0.mkv", b"1" * 9000)
+    mtime = os.stat(path).st_mtime + 5
+    os.utime(path, (mtime, mtime))
+    rp.Scanner(cfg, True).run()
+    prober.probeAll()
+    assert (prober.probed, prober.failed) == (7, 0)
+    db.openDb()
+    assert db.getProbe(path)['duration'] == 9
+    db.closeDb()
@@ -0,0 +1,81 @@
+#-------------------------------------------------------------------------#
+# test_proxy.py - Tests of the BufferProxy class.
+#-------------------------------------------------------------------------#
+
+import os
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+@pytest.fixture
+def proxy(rp, cfg):
+    cfg.PROXYBUF = 1
+    proxy = rp.BufferProxy(cfg)
+    yield proxy
+    proxy.stop()
+
+
+@pytest.fixture
+def movie(lib):
+    data = os.urandom(3 * 1048576 + 1000)
+    path = lib / "A movie.mkv"
+    path.write_bytes(data)
+    return(str(path), data)
+
+
+def get(url, range=None):
+    headers = {}
+    if range:
+        headers['Range'] = range
+    req = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(req) as resp:
+        return(resp.status, resp.headers.get('Content-Range'), resp.read())
+
+
+def test_slow_share(proxy, movie):
+    path, data = movie
+    # Every read of the share waits : the player drains the buffer
+    proxy.latency = 0.05
+    assert get(proxy.url(path)) == (200, None, data)
+    # The server ends the stream just after the last bytes
+    deadline = time.time() + 5
+    while proxy.stats()['streams'] and time.time() < deadline:
+        time.sleep(0.01)
+    stats = proxy.stats()
+    assert stats['streams'] == 0
+    assert stats['sent'] * 1048576 == len(data)
+    assert 1 <= stats['underruns'] <= 4
+
+
+def test_ranges(proxy, movie):
+    path, data = movie
+    url = proxy.url(path)
+    size = len(data)
+    assert get(url, "bytes=1000-2999") == (206,
+        "bytes 1000-2999/{0}".format(size), data[1000:3000])
+    assert get(url, "bytes=3000000-") == (206,
+        "bytes 3000000-{0}/{1}".format(size - 1, size), data[3000000:])
+    # Suffix range : the last bytes
+    assert get(url, "bytes=-500") == (206,
+        "bytes {0}-{1}/{2}".format(size - 500, size - 1, size), data[-500:])
+    assert get(url, "bytes=-{0}".format(size + 10))[2] == data
+    for range in ["bytes={0}-".format(size), "bytes=-0", "bytes=20-10"]:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            get(url, range)
+        assert e.value.code == 416
+        assert e.value.headers['Content-Range'] == "bytes */{0}".format(size)
+
+
+def test_old_urls(proxy, movie, lib):
+    path, data = movie
+    urls = [proxy.url(path) for i in range(3)]
+    assert len(set(urls)) == 3
+    assert len(proxy.paths) == 2
+    with pytest.raises(urllib.error.HTTPError) as e:
+        get(urls[0])
+    assert e.value.code == 404
+    assert get(urls[1], "bytes=0-9")[2] == data[0:10]
+    assert get(urls[2], "bytes=0-9")[2] == data[0:10]
@@ -0,0 +1,127 @@
+#-------------------------------------------------------------------------#
+# test_scanner.py - Tests of the Scanner class.
+#-------------------------------------------------------------------------#
+
+import os
+
+import pytest
+
+from conftest import touch
+
+
+def movies(rp, cfg):
+    db = rp.Db(cfg)
+    db.openDb()
+    res = dict([(row[2], row[0]) for row in db.iterMovies()])
+    db.closeDb()
+    return(res)
+
+
+def test_incremental_scan(rp, cfg, lib):
+    touch(lib / "x.avi")
+    touch(lib / "a" / "y.mkv")
+    touch(lib / "a" / "b" / "z.mp4")
+    touch(lib / "a" / "b" / "n.txt")
+    report = rp.Scanner(cfg).run()
+    assert (report['added'], report['removed']) == (3, 0)
+    report = rp.Scanner(cfg).run()
+    assert (report['added'], report['changed'], report['removed']) == (0, 0, 0)
+    ids = movies(rp, cfg)
+    touch(lib / "a" / "b" / "new.avi")
+    os.remove(str(lib / "x.avi"))
+    report = rp.Scanner(cfg).run()
+    assert (report['added'], report['removed']) == (1, 1)
+    now = movies(rp, cfg)
+    assert sorted(now) == sorted([str(lib / "a" / "y.mkv"),
+        str(lib / "a" / "b" / "z.mp4"), str(lib / "a" / "b" / "new.avi")])
+    # Unchanged movies keep their id
+    assert now[str(lib / "a" / "y.mkv")] == ids[str(lib / "a" / "y.mkv")]
+    # A file changed in a folder not changed : only a full scan sees it
+    path = str(lib / "a" / "y.mkv")
+    mtime = os.stat(path).st_mtime + 5
+    os.utime(path, (mtime, mtime))
+    assert rp.Scanner(cfg).run()['changed'] == 0
+    assert rp.Scanner(cfg, True).run()['changed'] == 1
+
+
+def test_move_detection(rp, cfg, lib):
+    data = os.urandom(300000)
+    touch(lib / "a" / "One.mkv", data)
+    touch(lib / "a" / "Two.mkv", os.urandom(300000))
+    rp.Scanner(cfg).run()
+    rp.Prober(cfg).probeAll()
+    ids = movies(rp, cfg)
+    (lib / "c").mkdir()
+    os.rename(str(lib / "a" / "One.mkv"), str(lib / "c" / "One (2010).mkv"))
+    report = rp.Scanner(cfg).run()
+    assert (report['moved'], report['added'], report['removed']) == (1, 0, 0)
+    now = movies(rp, cfg)
+    assert now[str(lib / "c" / "One (2010).mkv")] == ids[str(lib / "a" / "One.mkv")]
+    assert now[str(lib / "a" / "Two.mkv")] == ids[str(lib / "a" / "Two.mkv")]
+
+
+@pytest.mark.parametrize("journal", ["WAL", "DELETE"])
+def test_scan_is_atomic(rp, cfg, lib, journal):
+    cfg.DBJOURNAL = journal
+    touch(lib / "a" / "Old.avi")
+    rp.Scanner(cfg).run()
+    old = str(lib / "a" / "Old.avi")
+    new = str(lib / "b" / "New.avi")
+    touch(lib / "b" / "New.avi")
+    os.remove(old)
+    scanner = rp.Scanner(cfg)
+    db = rp.Db(cfg)
+    db.openDb()
+    scanner.load(db)
+    db.beginDb()
+    scanner.apply(db, ('dir', str(lib / "b"), str(lib), 1.0))
+    scanner.apply(db, ('file', "New.avi", new, 1, 1.0))
+    scanner.flush(db)
+    # Readers see the last scan until the commit
+    assert list(movies(rp, cfg)) == [old]
+    scanner.seenDirs.update([str(lib), str(lib / "a")])
+    scanner.finish(db)
+    db.closeDb()
+    assert list(movies(rp, cfg)) == [new]
+
+
+def test_unreachable_root(rp, cfg, lib):
+    touch(lib / "a" / "One.avi")
+    touch(lib / "Two.avi")
+    rp.Scanner(cfg).run()
+    before = movies(rp, cfg)
+    # Share not mounted : the scan fails, the library stays
+    os.rename(str(lib), str(lib) + ".off")
+    with pytest.raises(OSError):
+        rp.Scanner(cfg).run()
+    assert movies(rp, cfg) == before
+    os.rename(str(lib) + ".off", str(lib))
+    assert rp.Scanner(cfg).run()['removed'] == 0
+
+
+def test_unreadable_folder(rp, cfg, lib, monkeypatch):
+    touch(lib / "a" / "One.avi")
+    touch(lib / "a" / "b" / "Two.avi")
+    touch(lib / "Three.avi")
+    rp.Scanner(cfg).run()
+    before = movies(rp, cfg)
+    scandir = rp.scandir
+
+    def failing(path):
+        if path == str(lib / "a"):
+            raise OSError(5, "Input/output error", path)
+        return(scandir(path))
+
+    monkeypatch.setattr(rp, "scandir", failing)
+    touch(lib / "Four.avi")
+    report = rp.Scanner(cfg, True).run()
+    assert (report['added'], report['removed']) == (1, 0)
+    assert sorted(movies(rp, cfg)) == sorted(list(before)
+        + [str(lib / "Four.avi")])
+    # Listed again once readable, even if its mtime did not change
+    monkeypatch.setattr(rp, "scandir", scandir)
+    st = os.stat(str(lib / "a"))
+    os.remove(str(lib / "a" / "One.avi"))
+    os.utime(str(lib / "a"), (st.st_atime, st.st_mtime))
+    report = rp.Scanner(cfg).run()
+    assert (report['added'], report['removed']) == (0, 1)